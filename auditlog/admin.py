@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AuditEvent
+from .models import AuditArchive, AuditDailyRollup, AuditEvent
 
 
 @admin.register(AuditEvent)
@@ -17,3 +17,19 @@ class AuditEventAdmin(admin.ModelAdmin):
     list_filter = ("action", "resource_type", "occurred_at")
     search_fields = ("resource_id", "actor__username", "actor__full_name", "correlation_id")
     autocomplete_fields = ("actor", "document")
+    # Drilling down by date lets Postgres prune partitions; no COUNT(*) over the whole table
+    date_hierarchy = "occurred_at"
+    show_full_result_count = False
+
+
+@admin.register(AuditDailyRollup)
+class AuditDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "action", "resource_type", "event_count", "actor_count")
+    list_filter = ("action", "resource_type")
+    date_hierarchy = "day"
+
+
+@admin.register(AuditArchive)
+class AuditArchiveAdmin(admin.ModelAdmin):
+    list_display = ("month", "row_count", "size_bytes", "bucket_name", "object_key", "created_at")
+    readonly_fields = ("month", "bucket_name", "object_key", "row_count", "size_bytes", "checksum_sha256")
@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from auditlog.models import AuditEvent
+from auditlog.partitions import add_months, ensure_partitions, month_bounds, month_start
+from auditlog.retention import archive_month, months_to_archive, rebuild_daily_rollups, retention_months
+
+
+class Command(BaseCommand):
+    help = "Roll up audit events per day, archive months past retention to MinIO and keep future partitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-months", type=int, default=None, help="Full months kept in audit_event (default: AUDIT_RETENTION_MONTHS)")
+        parser.add_argument("--months-ahead", type=int, default=2, help="Monthly partitions created ahead of time (Postgres)")
+        parser.add_argument("--rollup-since", default="", help="Recompute daily rollups from this date (YYYY-MM-DD)")
+        parser.add_argument("--skip-archive", action="store_true", help="Only refresh rollups and partitions")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the months that would be archived")
+
+    def handle(self, *args, **options):
+        keep_months = options["retention_months"] or retention_months()
+        months = months_to_archive(keep_months=keep_months)
+
+        self.stdout.write(self.style.NOTICE("Audit event retention"))
+        self.stdout.write(f"Retention: {keep_months} months")
+        if options["dry_run"]:
+            for month in months:
+                start, end = month_bounds(month)
+                count = AuditEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end).count()
+                self.stdout.write(f"Would archive {month:%Y-%m}: {count} events")
+            return
+
+        since = None
+        if options["rollup_since"]:
+            try:
+                since = date.fromisoformat(options["rollup_since"])
+            except ValueError:
+                raise CommandError("--rollup-since must be YYYY-MM-DD")
+        # Rollups first: archived months are never recomputed
+        rollup_rows = rebuild_daily_rollups(since=since)
+        self.stdout.write(f"Daily rollup rows: {rollup_rows}")
+
+        with transaction.atomic():
+            created = ensure_partitions(add_months(month_start(timezone.now()), max(0, options["months_ahead"])))
+        for name in created:
+            self.stdout.write(f"Created partition {name}")
+
+        if options["skip_archive"]:
+            return
+        for month in months:
+            archive = archive_month(month)
+            self.stdout.write(f"Archived {month:%Y-%m}: {archive.row_count} events -> {archive.bucket_name}/{archive.object_key}")
+
+        self.stdout.write(self.style.SUCCESS("Audit retention completed"))
+        self.stdout.write(f"Archived months: {len(months)}")
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(unique=True)),
+                ('bucket_name', models.CharField(max_length=120)),
+                ('object_key', models.CharField(max_length=255)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('checksum_sha256', models.CharField(blank=True, max_length=64)),
+            ],
+            options={
+                'db_table': 'audit_event_archive',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('action', models.CharField(max_length=64)),
+                ('resource_type', models.CharField(max_length=80)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('actor_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'audit_event_daily',
+                'indexes': [models.Index(fields=['action', 'day'], name='audit_daily_action_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='auditdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'action', 'resource_type'), name='audit_daily_uniq'),
+        ),
+    ]
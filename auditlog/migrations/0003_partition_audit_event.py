@@ -0,0 +1,106 @@
+# Monthly range partitioning of audit_event on occurred_at (PostgreSQL only).
+#
+# The table is rebuilt: rows are copied into a partitioned table with one
+# partition per UTC month that has data (plus the current and next month)
+# and a default partition. The primary key becomes (id, occurred_at), which
+# Postgres requires for partitioned tables; the ORM still addresses rows by id.
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations
+
+
+def _months(first, last):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        yield month
+        index = month.year * 12 + month.month
+        month = date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(cursor, table):
+    cursor.execute(f"CREATE INDEX audit_action_time_idx ON {table} (action, occurred_at)")
+    cursor.execute(f"CREATE INDEX audit_resource_idx ON {table} (resource_type, resource_id)")
+    cursor.execute(f"CREATE INDEX audit_event_occurred_at_idx ON {table} (occurred_at)")
+    cursor.execute(f"CREATE INDEX audit_event_correlation_id_idx ON {table} (correlation_id)")
+    cursor.execute(f"CREATE INDEX audit_event_actor_id_idx ON {table} (actor_id)")
+    cursor.execute(f"CREATE INDEX audit_event_document_id_idx ON {table} (document_id)")
+
+
+def _add_foreign_keys(cursor, table, apps):
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    document_table = apps.get_model("docrepo", "Document")._meta.db_table
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT audit_event_actor_id_fk FOREIGN KEY (actor_id) "
+        f"REFERENCES {user_table} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT audit_event_document_id_fk FOREIGN KEY (document_id) "
+        f"REFERENCES {document_table} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+
+
+def _rebuild(cursor, table, apps):
+    """Copy rows into `table`, swap it in for audit_event and restore indexes, FKs and the id sequence."""
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM audit_event")
+    cursor.execute("DROP TABLE audit_event")
+    cursor.execute(f"ALTER TABLE {table} RENAME TO audit_event")
+    _create_indexes(cursor, "audit_event")
+    _add_foreign_keys(cursor, "audit_event", apps)
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence('audit_event', 'id'), COALESCE((SELECT MAX(id) FROM audit_event), 0) + 1, false)"
+    )
+
+
+def partition_audit_event(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE audit_event_partitioned "
+            "(LIKE audit_event INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) "
+            "PARTITION BY RANGE (occurred_at)"
+        )
+        cursor.execute("ALTER TABLE audit_event_partitioned ADD PRIMARY KEY (id, occurred_at)")
+        cursor.execute("CREATE TABLE audit_event_default PARTITION OF audit_event_partitioned DEFAULT")
+
+        cursor.execute("SELECT MIN(occurred_at) AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC' FROM audit_event")
+        first, now = cursor.fetchone()
+        last = date(now.year + (now.month // 12), now.month % 12 + 1, 1)
+        for month in _months(first or now, last):
+            index = month.year * 12 + month.month
+            end = date(index // 12, index % 12 + 1, 1)
+            cursor.execute(
+                f"CREATE TABLE audit_event_p{month:%Y%m} PARTITION OF audit_event_partitioned "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+            )
+
+        _rebuild(cursor, "audit_event_partitioned", apps)
+
+
+def unpartition_audit_event(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE audit_event_plain "
+            "(LIKE audit_event INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY)"
+        )
+        cursor.execute("ALTER TABLE audit_event_plain ADD PRIMARY KEY (id)")
+        _rebuild(cursor, "audit_event_plain", apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auditlog", "0002_audit_rollups_and_partitions"),
+        ("docrepo", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_audit_event, unpartition_audit_event),
+    ]
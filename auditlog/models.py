@@ -40,3 +40,43 @@ class AuditEvent(TimestampedModel):
 
     def __str__(self):
         return f"{self.action} - {self.resource_type}"
+
+
+class AuditDailyRollup(TimestampedModel):
+    """Per-day event counts by action and resource type, kept after raw events are archived."""
+
+    day = models.DateField()
+    action = models.CharField(max_length=64)
+    resource_type = models.CharField(max_length=80)
+    event_count = models.PositiveIntegerField(default=0)
+    actor_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "audit_event_daily"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "action", "resource_type"], name="audit_daily_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["action", "day"], name="audit_daily_action_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.action} ({self.event_count})"
+
+
+class AuditArchive(TimestampedModel):
+    """One month of audit_event rows exported to MinIO and removed from the hot table."""
+
+    month = models.DateField(unique=True)
+    bucket_name = models.CharField(max_length=120)
+    object_key = models.CharField(max_length=255)
+    row_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    checksum_sha256 = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        db_table = "audit_event_archive"
+        ordering = ["-month"]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} -> {self.object_key}"
@@ -0,0 +1,112 @@
+"""Monthly range partitions of audit_event (PostgreSQL only).
+
+Migration 0003 turns audit_event into a table partitioned by occurred_at with
+one partition per UTC month (audit_event_pYYYYMM) plus audit_event_default
+for rows outside them. archive_audit_events keeps partitions created ahead
+of time and drops them once their month is archived. On other databases
+these helpers are no-ops and retention falls back to deleting rows.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection
+
+
+AUDIT_TABLE = "audit_event"
+DEFAULT_PARTITION = "audit_event_default"
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    """[start, end) of a UTC month, as aware datetimes."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end_month = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_p{month:%Y%m}"
+
+
+def partitioning_supported() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [AUDIT_TABLE])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions() -> set[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [AUDIT_TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def create_partition(month: date) -> bool:
+    """Create the partition for `month` if missing; True if it was created.
+
+    Rows of that month already sitting in the default partition are moved
+    into the new one, otherwise Postgres refuses to create it.
+    """
+    name = partition_name(month)
+    if name in existing_partitions():
+        return False
+    start, end = month_bounds(month)
+    quoted = connection.ops.quote_name(name)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {quoted} (LIKE {AUDIT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE occurred_at >= %s AND occurred_at < %s RETURNING *) "
+            f"INSERT INTO {quoted} SELECT * FROM moved",
+            [start, end],
+        )
+        # Partition bounds are DDL: literals, not query parameters
+        cursor.execute(
+            f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {quoted} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return True
+
+
+def ensure_partitions(through: date) -> list[str]:
+    """Create monthly partitions from the current month up to `through`."""
+    if not partitioning_supported():
+        return []
+    created = []
+    month = month_start(datetime.now(dt_timezone.utc))
+    while month <= month_start(through):
+        if create_partition(month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partition(month: date) -> bool:
+    """Detach and drop the partition of `month`; True if it existed."""
+    name = partition_name(month)
+    if not partitioning_supported() or name not in existing_partitions():
+        return False
+    quoted = connection.ops.quote_name(name)
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {quoted}")
+        cursor.execute(f"DROP TABLE {quoted}")
+    return True
@@ -0,0 +1,170 @@
+"""Audit retention: daily rollups and monthly archives of audit_event.
+
+Rollups (audit_event_daily) count events per local day, action and resource
+type so dashboards do not scan raw events. Months older than
+AUDIT_RETENTION_MONTHS are exported to MinIO as gzipped JSON lines
+(<AUDIT_ARCHIVE_PREFIX>YYYY-MM.jsonl.gz), recorded in audit_event_archive and
+removed from the hot table: on Postgres by dropping the month's partition.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import tempfile
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from auditlog.models import AuditArchive, AuditDailyRollup, AuditEvent
+from auditlog.partitions import add_months, drop_partition, month_bounds, month_start
+
+ARCHIVE_FIELDS = (
+    "id",
+    "occurred_at",
+    "action",
+    "resource_type",
+    "resource_id",
+    "actor_id",
+    "document_id",
+    "ip_address",
+    "user_agent",
+    "correlation_id",
+    "metadata",
+    "created_at",
+)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def retention_months() -> int:
+    return max(1, int(getattr(settings, "AUDIT_RETENTION_MONTHS", 12)))
+
+
+def archive_bucket() -> str:
+    return getattr(settings, "AUDIT_ARCHIVE_BUCKET", "") or "audit-archive"
+
+
+def archive_object_key(month: date) -> str:
+    prefix = getattr(settings, "AUDIT_ARCHIVE_PREFIX", "audit_event/")
+    return f"{prefix}{month:%Y-%m}.jsonl.gz"
+
+
+def _local_day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def _first_unarchived_day() -> date | None:
+    last_archived = AuditArchive.objects.aggregate(last=Max("month"))["last"]
+    if last_archived is None:
+        return None
+    return add_months(last_archived, 1)
+
+
+def rebuild_daily_rollups(since: date | None = None, until: date | None = None) -> int:
+    """Recompute rollups for [since, until] (local days); returns rows written.
+
+    By default starts at the last day already rolled up, which also picks up
+    events written late by the buffered audit writer. Days whose raw events
+    are already archived are never recomputed.
+    """
+    until = until or timezone.localdate()
+    if since is None:
+        since = AuditDailyRollup.objects.aggregate(last=Max("day"))["last"]
+    if since is None:
+        first_event = AuditEvent.objects.aggregate(first=Min("occurred_at"))["first"]
+        if first_event is None:
+            return 0
+        since = timezone.localtime(first_event).date()
+    floor = _first_unarchived_day()
+    if floor is not None and since < floor:
+        since = floor
+    if since > until:
+        return 0
+
+    grouped = (
+        AuditEvent.objects.filter(
+            occurred_at__gte=_local_day_start(since),
+            occurred_at__lt=_local_day_start(until + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate("occurred_at"))
+        .values("day", "action", "resource_type")
+        .annotate(event_count=Count("id"), actor_count=Count("actor", distinct=True))
+        .order_by()
+    )
+    rollups = [AuditDailyRollup(**row) for row in grouped]
+    with transaction.atomic():
+        AuditDailyRollup.objects.filter(day__gte=since, day__lte=until).delete()
+        AuditDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def months_to_archive(now: datetime | None = None, keep_months: int | None = None) -> list[date]:
+    """UTC months with events that are older than the retention window, oldest first.
+
+    Months already archived are skipped: their object in MinIO is never rewritten.
+    """
+    now = now or timezone.now()
+    cutoff = add_months(month_start(now.astimezone(dt_timezone.utc)), -(keep_months or retention_months()))
+    first_event = AuditEvent.objects.aggregate(first=Min("occurred_at"))["first"]
+    if first_event is None:
+        return []
+    archived = set(AuditArchive.objects.values_list("month", flat=True))
+    months = []
+    month = month_start(first_event.astimezone(dt_timezone.utc))
+    while month < cutoff:
+        start, end = month_bounds(month)
+        if month not in archived and AuditEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end).exists():
+            months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(month: date) -> AuditArchive:
+    """Export one UTC month to MinIO, then drop it from audit_event."""
+    from documents.utils import minio_client
+
+    start, end = month_bounds(month)
+    rows = (
+        AuditEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end)
+        .order_by("occurred_at", "id")
+        .values(*ARCHIVE_FIELDS)
+    )
+    bucket = archive_bucket()
+    object_key = archive_object_key(month)
+
+    with tempfile.TemporaryFile() as spool:
+        row_count = 0
+        with gzip.GzipFile(fileobj=spool, mode="wb") as compressed:
+            for row in rows.iterator(chunk_size=2000):
+                compressed.write((json.dumps(row, default=str, ensure_ascii=False) + "\n").encode("utf-8"))
+                row_count += 1
+        size_bytes = spool.tell()
+
+        spool.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: spool.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        spool.seek(0)
+
+        if not minio_client.bucket_exists(bucket):
+            minio_client.make_bucket(bucket)
+        minio_client.put_object(bucket, object_key, spool, length=size_bytes, content_type="application/gzip")
+
+    with transaction.atomic():
+        archive = AuditArchive.objects.create(
+            month=month,
+            bucket_name=bucket,
+            object_key=object_key,
+            row_count=row_count,
+            size_bytes=size_bytes,
+            checksum_sha256=digest.hexdigest(),
+        )
+        drop_partition(month)
+        # Rows left in the default partition, or every row on databases without partitions
+        AuditEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end).delete()
+    return archive
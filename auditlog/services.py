@@ -3,6 +3,7 @@ import uuid
 from typing import Any
 
 from auditlog.models import AuditEvent
+from auditlog.writer import write_audit_event
 
 
 logger = logging.getLogger(__name__)
@@ -55,7 +56,11 @@ def record_audit_event(
     metadata: dict[str, Any] | None = None,
     correlation_id: Any | None = None,
 ) -> AuditEvent | None:
-    """Best-effort audit event persistence that never breaks request flow."""
+    """Best-effort audit event persistence that never breaks request flow.
+
+    Outside a transaction the event is queued and written in batches by
+    auditlog.writer, so the returned instance may not have a pk yet.
+    """
     try:
         resolved_actor = None
         if actor is not None and getattr(actor, "is_authenticated", False):
@@ -69,13 +74,13 @@ def record_audit_event(
         resolved_correlation_id = _coerce_correlation_id(correlation_id or request_correlation)
 
         clean_resource_id = (resource_id or "").strip()[:64]
-        clean_metadata = metadata if isinstance(metadata, dict) else {}
+        clean_metadata = dict(metadata) if isinstance(metadata, dict) else {}
 
         user_agent = ""
         if request is not None:
             user_agent = str(request.META.get("HTTP_USER_AGENT") or "")[:300]
 
-        event = AuditEvent.objects.create(
+        event = AuditEvent(
             actor=resolved_actor,
             action=(action or "").strip()[:64],
             resource_type=(resource_type or "").strip()[:80],
@@ -86,6 +91,7 @@ def record_audit_event(
             correlation_id=resolved_correlation_id,
             metadata=clean_metadata,
         )
+        write_audit_event(event)
         return event
     except Exception:
         logger.exception("audit_event_persist_failed")
@@ -0,0 +1,165 @@
+"""Buffered audit event sink.
+
+Events recorded outside a transaction are queued in-process and written with
+bulk_create by a background thread, every AUDIT_BATCH_SIZE events or
+AUDIT_FLUSH_INTERVAL_SECONDS after the first queued one, whichever comes
+first. The queue is flushed at interpreter exit. When the queue is full the
+event is written synchronously by the caller, so bursts slow requests down
+instead of dropping audit rows.
+
+Events recorded inside an atomic block are saved synchronously: they may
+reference rows that only that transaction can see, and they must roll back
+with it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from auditlog.models import AuditEvent
+
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+def audit_async_enabled() -> bool:
+    return bool(getattr(settings, "AUDIT_ASYNC_ENABLED", True))
+
+
+class AuditEventWriter:
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.max_queue = max(1, int(max_queue))
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue)
+        self._thread: threading.Thread | None = None
+        self._pid = os.getpid()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the parent's thread and queued events do not exist here
+                self._reset()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-event-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, event: AuditEvent) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning("audit_event_queue_full")
+            self._write([event])
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Write everything queued so far; False if it did not finish within `timeout`."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return self._queue.unfinished_tasks == 0
+        self._queue.put(_FLUSH)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch: list[AuditEvent] = []
+            taken = 0
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stop = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+        connection.close()
+
+    def _write(self, batch: list[AuditEvent]) -> None:
+        close_old_connections()
+        try:
+            AuditEvent.objects.bulk_create(batch, batch_size=self.batch_size)
+            return
+        except Exception:
+            logger.exception("audit_event_bulk_write_failed")
+        # bulk_create is all-or-nothing: retry one by one so one bad row does not drop the batch
+        for event in batch:
+            try:
+                event.save(force_insert=True)
+            except Exception:
+                logger.exception("audit_event_persist_failed")
+
+
+_writer: AuditEventWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditEventWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditEventWriter(
+                    batch_size=getattr(settings, "AUDIT_BATCH_SIZE", 200),
+                    flush_interval=getattr(settings, "AUDIT_FLUSH_INTERVAL_SECONDS", 1.0),
+                    max_queue=getattr(settings, "AUDIT_QUEUE_MAX_EVENTS", 10000),
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def write_audit_event(event: AuditEvent) -> None:
+    """Persist `event` now (inside a transaction or with the writer disabled) or queue it."""
+    if not audit_async_enabled() or connection.in_atomic_block:
+        event.save(force_insert=True)
+        return
+    get_audit_writer().submit(event)
+
+
+def flush_audit_events(timeout: float | None = None) -> bool:
+    if _writer is None:
+        return True
+    return _writer.flush(timeout)
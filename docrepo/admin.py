@@ -3,6 +3,8 @@ from django.contrib import admin
 from .models import (
     ConstanciaAbonoDocument,
     Document,
+    DocumentFacet,
+    DocumentFacetBuild,
     EmployeeCode,
     IndexState,
     InsuranceDocument,
@@ -59,3 +61,15 @@ class ConstanciaAbonoDocumentAdmin(admin.ModelAdmin):
     list_display = ("document", "bank", "payroll_type", "payment_batch_ref", "employee_count")
     list_filter = ("bank", "payroll_type")
     search_fields = ("payment_batch_ref", "document__original_filename")
+
+
+@admin.register(DocumentFacet)
+class DocumentFacetAdmin(admin.ModelAdmin):
+    list_display = ("domain_code", "facet", "value", "document_count", "updated_at")
+    list_filter = ("domain_code", "facet")
+    search_fields = ("value",)
+
+
+@admin.register(DocumentFacetBuild)
+class DocumentFacetBuildAdmin(admin.ModelAdmin):
+    list_display = ("domain_code", "facet_rows", "built_at")
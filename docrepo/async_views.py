@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from documents import asyncstorage
+from documents.async_support import AsyncAPIView, json_error
+from documents.delivery import AsyncObjectDelivery
+from documents.downloadlog import DownloadLogBatch
+from documents.zipstream import ZIP_ERRORS_NAME, astream_zip, errors_manifest
+
+from .views import (
+    download_filename,
+    log_document_download,
+    plan_zip_download,
+    record_download_missing_object,
+    record_zip_download,
+    resolve_download_target,
+    zip_missing_object_error,
+)
+
+
+# ASGI variants of the v2 download endpoints. Permission checks and audit
+# events are the same helpers the sync views use, run in a thread; only the
+# MinIO transfer itself happens on the event loop.
+
+
+class AsyncDocumentDownloadV2View(AsyncAPIView):
+    async def get(self, request, document_id):
+        document, object_key, error = await sync_to_async(resolve_download_target)(request, document_id)
+        if error is not None:
+            return json_error(*error)
+
+        try:
+            delivery = await AsyncObjectDelivery(object_key, request=request).aopen()
+        except Exception:
+            return json_error(*await sync_to_async(record_download_missing_object)(request, document, object_key))
+
+        response = await delivery.aresponse(download_filename(document, object_key))
+        return await sync_to_async(log_document_download)(request, document, object_key, delivery, response)
+
+
+class AsyncDocumentsZipDownloadV2View(AsyncAPIView):
+    async def post(self, request):
+        plan, error = await sync_to_async(plan_zip_download)(request)
+        if error is not None:
+            return json_error(*error)
+
+        errors = plan.errors
+        results = asyncstorage.prefetch_objects(
+            ((document, object_key, archive_name), object_key)
+            for document, object_key, archive_name in plan.entries
+        )
+        download_log = DownloadLogBatch(request)
+
+        async def next_member():
+            async for (document, object_key, archive_name), content, error in results:
+                if error is None:
+                    download_log.add(object_key)
+                    return archive_name, content
+                errors.append(zip_missing_object_error(document, object_key))
+            return None
+
+        # Wait for the first member so an all-missing request still gets a 404.
+        first_member = await next_member()
+        if first_member is None:
+            return json_error({"error": "No se pudo agregar ningun documento al ZIP.", "details": errors}, 404)
+
+        pre_stream_errors = len(errors)
+        added = 0
+
+        async def members():
+            nonlocal added
+            member = first_member
+            while member is not None:
+                yield member
+                added += 1
+                member = await next_member()
+
+            if errors:
+                yield ZIP_ERRORS_NAME, errors_manifest(errors)
+
+        download_log.defer(lambda: record_zip_download(request, plan, added))
+
+        expected = len(plan.documents) - pre_stream_errors
+        response = StreamingHttpResponse(astream_zip(members()), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="documentos_{expected}.zip"'
+        response["X-Files-Zipped"] = str(expected)
+        response["X-Zip-Errors"] = str(pre_stream_errors)
+        return download_log.attach(response)
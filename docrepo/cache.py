@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Invalidation events. Each event owns a generation counter in the shared
+# state cache (DOCREPO_STATE_CACHE_ALIAS); region keys embed the generations
+# they depend on, so emitting an event orphans stale entries in every worker
+# without scanning the cache. Region values live in the default cache.
+INDEX_CHANGED = "index_changed"
+STORAGE_CHANGED = "storage_changed"
+
+INDEX_GENERATION_KEY = "docrepo:index_generation"
+INDEX_GENERATION_AT_KEY = "docrepo:index_generation_at"
+
+EVENT_GENERATION_KEYS = {
+    INDEX_CHANGED: INDEX_GENERATION_KEY,
+    STORAGE_CHANGED: "docrepo:storage_generation",
+}
+
+
+@dataclass(frozen=True)
+class CacheRegion:
+    name: str
+    events: tuple[str, ...]
+    default_timeout: int
+
+
+CACHE_REGIONS = {
+    region.name: region
+    for region in (
+        CacheRegion("folder_options", (INDEX_CHANGED,), 900),
+        CacheRegion("filter_options", (INDEX_CHANGED,), 3600),
+        CacheRegion("minio_listing", (STORAGE_CHANGED,), 60),
+    )
+}
+
+# Counters start at a random epoch instead of 1: if the state cache loses
+# them (flush, eviction, wiped directory) the restarted generation does not
+# repeat values already embedded in client ETags or cached region keys.
+GENERATION_EPOCH_BITS = 40
+GENERATION_EPOCH_STEP = 1 << 20
+
+_MISSING = object()
+
+
+def state_cache():
+    """Cache holding the generation counters; must be shared by every worker."""
+    return caches[getattr(settings, "DOCREPO_STATE_CACHE_ALIAS", "default")]
+
+
+def _start_generation(state, event: str) -> int:
+    """Initialise a missing counter at a fresh epoch; returns the stored value."""
+    key = EVENT_GENERATION_KEYS[event]
+    initial = secrets.randbelow(1 << GENERATION_EPOCH_BITS) * GENERATION_EPOCH_STEP + 1
+    if state.add(key, initial, None) and event == INDEX_CHANGED:
+        # The lost counter may hide a lost bump: Last-Modified restarts too
+        state.set(INDEX_GENERATION_AT_KEY, int(time.time()), None)
+    return int(state.get(key) or initial)
+
+
+def get_generation(event: str) -> int:
+    state = state_cache()
+    generation = state.get(EVENT_GENERATION_KEYS[event])
+    if generation is None:
+        return _start_generation(state, event)
+    return int(generation)
+
+
+def bump_generation(event: str) -> int:
+    key = EVENT_GENERATION_KEYS[event]
+    state = state_cache()
+    try:
+        generation = int(state.incr(key))
+    except ValueError:
+        _start_generation(state, event)
+        generation = int(state.incr(key))
+    except Exception:
+        logger.exception("docrepo_cache_generation_bump_failed event=%s", event)
+        return 0
+    if event == INDEX_CHANGED:
+        state.set(INDEX_GENERATION_AT_KEY, int(time.time()), None)
+    return generation
+
+
+def get_index_generation() -> int:
+    return get_generation(INDEX_CHANGED)
+
+
+def get_index_generation_timestamp() -> int:
+    """Epoch seconds of the last index change, used as Last-Modified."""
+    state = state_cache()
+    changed_at = state.get(INDEX_GENERATION_AT_KEY)
+    if changed_at is None:
+        state.add(INDEX_GENERATION_AT_KEY, int(time.time()), None)
+        changed_at = state.get(INDEX_GENERATION_AT_KEY) or int(time.time())
+    return int(changed_at)
+
+
+def bump_index_generation() -> int:
+    return bump_generation(INDEX_CHANGED)
+
+
+def emit_invalidation_event(*events: str) -> None:
+    """Invalidate every region that depends on `events` once the current transaction commits."""
+
+    def _bump():
+        for event in events:
+            bump_generation(event)
+
+    transaction.on_commit(_bump)
+
+
+def notify_index_changed() -> None:
+    emit_invalidation_event(INDEX_CHANGED)
+
+
+def region_timeout(region: str) -> int:
+    overrides = getattr(settings, "DOCREPO_CACHE_REGION_TIMEOUTS", {}) or {}
+    return int(overrides.get(region, CACHE_REGIONS[region].default_timeout))
+
+
+def region_key(region: str, *parts: Any) -> str:
+    generations = ".".join(str(get_generation(event)) for event in CACHE_REGIONS[region].events)
+    raw = "|".join(str(part or "") for part in parts)
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"docrepo:{region}:g{generations}:{digest}"
+
+
+def region_get_or_set(region: str, parts: tuple[Any, ...], producer: Callable[[], Any]) -> tuple[Any, bool]:
+    """Return `(value, hit)`; on a miss the value is produced and stored for the region timeout."""
+    key = region_key(region, *parts)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value, True
+
+    value = producer()
+    cache.set(key, value, region_timeout(region))
+    return value, False
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_state_cache_is_shared(app_configs, **kwargs):
+    """Generation counters in a per-process cache only invalidate the worker that bumped them."""
+    alias = getattr(settings, "DOCREPO_STATE_CACHE_ALIAS", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        Warning(
+            f"CACHES['{alias}'] uses {backend}: docrepo invalidation counters are not shared between workers.",
+            hint="Use a file, Redis or Memcached backend for DOCREPO_STATE_CACHE_ALIAS.",
+            id="docrepo.W001",
+        )
+    ]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Iterable
+
+from django.db import connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from catalogs.models import CatalogDomain
+
+from .cache import notify_index_changed
+from .models import Document, DocumentFacet, DocumentFacetBuild
+
+
+FacetKey = tuple[str, str, str]
+
+FACET_SOURCE_FIELDS = (
+    "domain__code",
+    "period__year",
+    "company__name",
+    "constancia_detail__bank__name",
+    "constancia_detail__payroll_type",
+    "constancia_detail__legacy_tipo_documento",
+    "insurance_detail__insurance_type__name",
+    "tregistro_detail__movement_type__name",
+)
+
+
+def _clean(value, max_len: int = 300) -> str:
+    return str(value or "").strip()[:max_len]
+
+
+def _facet_keys_from_row(row: tuple) -> set[FacetKey]:
+    (
+        domain_code,
+        year,
+        company_name,
+        bank_name,
+        payroll_type,
+        legacy_tipo,
+        insurance_type,
+        movement_type,
+    ) = row
+    Facet = DocumentFacet.FacetChoices
+    keys: set[FacetKey] = set()
+
+    if year:
+        keys.add((domain_code, Facet.YEAR, str(year)))
+    if _clean(company_name):
+        keys.add((domain_code, Facet.COMPANY, _clean(company_name)))
+    if _clean(bank_name):
+        keys.add((domain_code, Facet.BANK, _clean(bank_name)))
+    for tipo in (payroll_type, legacy_tipo, insurance_type, movement_type):
+        if _clean(tipo):
+            keys.add((domain_code, Facet.TIPO_DOCUMENTO, _clean(tipo)))
+
+    return keys
+
+
+def facet_keys_for_document(document_id) -> set[FacetKey]:
+    """Facet values an active document contributes; empty when inactive or missing."""
+    if document_id is None:
+        return set()
+    row = (
+        Document.objects.filter(pk=document_id, is_active=True)
+        .values_list(*FACET_SOURCE_FIELDS)
+        .first()
+    )
+    return _facet_keys_from_row(row) if row else set()
+
+
+def _increment(keys: Iterable[FacetKey], delta: int) -> None:
+    for domain_code, facet, value in keys:
+        DocumentFacet.objects.filter(domain_code=domain_code, facet=facet, value=value).update(
+            document_count=F("document_count") + delta
+        )
+
+
+def apply_facet_delta(before: set[FacetKey], after: set[FacetKey]) -> None:
+    """Move one document's contribution from `before` to `after` facet values."""
+    added = after - before
+    removed = before - after
+
+    if added:
+        DocumentFacet.objects.bulk_create(
+            [
+                DocumentFacet(domain_code=domain_code, facet=facet, value=value, document_count=0)
+                for domain_code, facet, value in added
+            ],
+            ignore_conflicts=True,
+        )
+        _increment(added, 1)
+
+    if removed:
+        _increment(removed, -1)
+        DocumentFacet.objects.filter(document_count__lte=0).delete()
+
+
+def built_facet_domains(domain_codes: Iterable[str]) -> set[str]:
+    """Subset of `domain_codes` whose facet counts can be trusted (rebuilt at least once).
+
+    Rows written incrementally before the first rebuild only cover documents
+    ingested since the table existed, so their presence proves nothing.
+    """
+    return set(
+        DocumentFacetBuild.objects.filter(domain_code__in=list(domain_codes)).values_list("domain_code", flat=True)
+    )
+
+
+@transaction.atomic
+def rebuild_facets(domain_code: str | None = None, chunk_size: int = 2000) -> int:
+    """Recompute facet counts from active documents and mark the domains as built.
+
+    Returns the number of facet rows.
+    """
+    queryset = Document.objects.filter(is_active=True)
+    stale = DocumentFacet.objects.all()
+    if domain_code:
+        queryset = queryset.filter(domain__code=domain_code)
+        stale = stale.filter(domain_code=domain_code)
+
+    counts: Counter[FacetKey] = Counter()
+    for row in queryset.values_list(*FACET_SOURCE_FIELDS).iterator(chunk_size=chunk_size):
+        counts.update(_facet_keys_from_row(row))
+
+    stale.delete()
+    DocumentFacet.objects.bulk_create(
+        [
+            DocumentFacet(domain_code=key_domain, facet=facet, value=value, document_count=count)
+            for (key_domain, facet, value), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+    if domain_code:
+        built_domains = {domain_code}
+    else:
+        built_domains = set(CatalogDomain.objects.values_list("code", flat=True))
+        built_domains.update(key_domain for key_domain, _, _ in counts)
+    rows_per_domain = Counter(key_domain for key_domain, _, _ in counts)
+    built_at = timezone.now()
+    for code in built_domains:
+        DocumentFacetBuild.objects.update_or_create(
+            domain_code=code,
+            defaults={"facet_rows": rows_per_domain[code], "built_at": built_at},
+        )
+    notify_index_changed()
+    return len(counts)
+
+
+def count_facets(queryset, fields: Iterable[tuple[str, str]]) -> dict[str, dict]:
+    """
+    Document counts per value of each `(name, orm_path)` facet over `queryset`.
+
+    PostgreSQL computes every facet in one pass with GROUPING SETS; other
+    backends run one GROUP BY per facet.
+    """
+    fields = list(fields)
+    counts: dict[str, dict] = {name: {} for name, _ in fields}
+    if not fields:
+        return counts
+
+    matched = Document.objects.filter(pk__in=queryset.prefetch_related(None).order_by().values("pk"))
+    connection = connections[matched.db]
+
+    if connection.vendor != "postgresql":
+        for name, path in fields:
+            rows = matched.values(facet_value=F(path)).annotate(document_count=Count("pk")).order_by()
+            for row in rows:
+                if row["facet_value"] not in (None, ""):
+                    counts[name][row["facet_value"]] = row["document_count"]
+        return counts
+
+    aliases = {f"facet_{index}": F(path) for index, (_, path) in enumerate(fields)}
+    inner_sql, params = matched.values(**aliases).query.sql_with_params()
+    columns = [connection.ops.quote_name(alias) for alias in aliases]
+    sql = (
+        f"SELECT {', '.join(columns)}, {', '.join(f'GROUPING({column})' for column in columns)}, COUNT(*) "
+        f"FROM ({inner_sql}) AS facet_rows "
+        f"GROUP BY GROUPING SETS ({', '.join(f'({column})' for column in columns)})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    width = len(fields)
+    for row in rows:
+        values, grouping, document_count = row[:width], row[width : 2 * width], row[-1]
+        for index, is_rolled_up in enumerate(grouping):
+            if not is_rolled_up and values[index] not in (None, ""):
+                counts[fields[index][0]][values[index]] = document_count
+    return counts
@@ -0,0 +1,105 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from docrepo.models import StorageObject
+from docrepo.services import record_content_hashes
+from documents.utils import minio_client
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class HashBackfillStats:
+    processed: int = 0
+    hashed: int = 0
+    changed_in_storage: int = 0
+    errors: int = 0
+
+
+def hash_object(object_key: str) -> tuple[str, str, str]:
+    """Stream the object from MinIO; return (md5, sha256, etag served)."""
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_key)
+    try:
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        for chunk in response.stream(HASH_CHUNK_SIZE):
+            md5.update(chunk)
+            sha256.update(chunk)
+        headers = getattr(response, "headers", None) or {}
+        return md5.hexdigest(), sha256.hexdigest(), str(headers.get("ETag") or "").strip('"')
+    finally:
+        response.close()
+        response.release_conn()
+
+
+class Command(BaseCommand):
+    help = "Compute content SHA-256 (and MD5) for docrepo storage objects that do not have one yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=0, help="Max objects to hash")
+        parser.add_argument("--batch-size", type=int, default=200, help="Rows fetched per DB round trip")
+        parser.add_argument("--workers", type=int, default=4, help="Objects downloaded and hashed in parallel")
+        parser.add_argument("--include-inactive", action="store_true", help="Also hash objects of inactive documents")
+        parser.add_argument("--dry-run", action="store_true", help="Only count pending objects")
+
+    def handle(self, *args, **options):
+        queryset = (
+            StorageObject.objects.select_related("document")
+            .filter(bucket_name=settings.MINIO_BUCKET)
+            .filter(Q(checksum_sha256__isnull=True) | Q(checksum_sha256=""))
+            .exclude(object_key="")
+        )
+        if not options["include_inactive"]:
+            queryset = queryset.filter(document__is_active=True)
+
+        pending = queryset.count()
+        self.stdout.write(self.style.NOTICE("Backfilling content hashes"))
+        self.stdout.write(f"Pending objects: {pending}")
+        if options["dry_run"] or pending == 0:
+            return
+
+        limit = max(0, int(options["limit"]))
+        batch_size = max(1, int(options["batch_size"]))
+        stats = HashBackfillStats()
+        last_pk = None
+
+        with ThreadPoolExecutor(max_workers=max(1, int(options["workers"]))) as pool:
+            while not limit or stats.processed < limit:
+                batch_qs = queryset.order_by("pk")
+                if last_pk is not None:
+                    batch_qs = batch_qs.filter(pk__gt=last_pk)
+                size = batch_size if not limit else min(batch_size, limit - stats.processed)
+                batch = list(batch_qs[:size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                futures = [pool.submit(hash_object, storage.object_key) for storage in batch]
+                for storage, future in zip(batch, futures):
+                    stats.processed += 1
+                    try:
+                        content_md5, checksum_sha256, served_etag = future.result()
+                    except Exception as exc:
+                        stats.errors += 1
+                        self.stderr.write(f"{storage.object_key}: {exc}")
+                        continue
+
+                    # Replaced in MinIO since the last sync: reindex will ingest the new content
+                    if served_etag and storage.etag and served_etag != storage.etag.strip('"'):
+                        stats.changed_in_storage += 1
+                        continue
+
+                    record_content_hashes(storage, content_md5=content_md5, checksum_sha256=checksum_sha256)
+                    stats.hashed += 1
+
+                self.stdout.write(f"Processed {stats.processed}/{pending}")
+
+        self.stdout.write(self.style.SUCCESS("Content hash backfill completed"))
+        self.stdout.write(f"Hashed: {stats.hashed}")
+        self.stdout.write(f"Changed in storage (skipped): {stats.changed_in_storage}")
+        self.stdout.write(f"Errors: {stats.errors}")
@@ -18,6 +18,7 @@ from catalogs.models import (
     CatalogTRegistroType,
 )
 from documents.models import PDFIndex
+from docrepo.facets import rebuild_facets
 from docrepo.models import (
     ConstanciaAbonoDocument,
     Document,
@@ -38,6 +39,7 @@ class BackfillStats:
     tregistro_docs: int = 0
     insurance_docs: int = 0
     constancia_docs: int = 0
+    facet_rows: int = 0
 
 
 class Command(BaseCommand):
@@ -93,6 +95,9 @@ class Command(BaseCommand):
                 else:
                     stats.constancia_docs += 1
 
+        if not dry_run:
+            stats.facet_rows = rebuild_facets()
+
         self.stdout.write(self.style.SUCCESS("Backfill completed"))
         self.stdout.write(f"Processed: {stats.processed}")
         self.stdout.write(f"Documents created: {stats.created_documents}")
@@ -101,6 +106,7 @@ class Command(BaseCommand):
         self.stdout.write(f"T-registro docs: {stats.tregistro_docs}")
         self.stdout.write(f"Insurance docs: {stats.insurance_docs}")
         self.stdout.write(f"Constancia docs: {stats.constancia_docs}")
+        self.stdout.write(f"Facet rows: {stats.facet_rows}")
 
     def _ensure_seed_catalogs(self):
         self._domain("CONSTANCIA_ABONO", "Constancia de abono")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from docrepo.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild docrepo_document_facet counts from active docrepo documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--domain",
+            choices=["ALL", "CONSTANCIA_ABONO", "SEGUROS", "TREGISTRO"],
+            default="ALL",
+            help="Limit rebuild to one domain",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per DB round trip")
+
+    def handle(self, *args, **options):
+        domain_filter = None if options["domain"] == "ALL" else options["domain"]
+
+        self.stdout.write(self.style.NOTICE("Rebuilding docrepo facets"))
+        self.stdout.write(f"Domain: {options['domain']}")
+
+        total_rows = rebuild_facets(domain_code=domain_filter, chunk_size=max(1, int(options["chunk_size"])))
+
+        self.stdout.write(self.style.SUCCESS("Facet rebuild completed"))
+        self.stdout.write(f"Facet rows: {total_rows}")
@@ -0,0 +1,21 @@
+# Prefix (LIKE 'parent/%') lookups for folder drill-down.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("docrepo", "0003_phase3_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="storageobject",
+            index=models.Index(
+                fields=["object_key"],
+                name="docrepo_storage_key_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
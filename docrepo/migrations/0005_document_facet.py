@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docrepo', '0004_storage_key_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('domain_code', models.CharField(max_length=40)),
+                ('facet', models.CharField(choices=[('YEAR', 'Year'), ('COMPANY', 'Company'), ('BANK', 'Bank'), ('TIPO_DOCUMENTO', 'Tipo documento')], max_length=20)),
+                ('value', models.CharField(max_length=300)),
+                ('document_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'docrepo_document_facet',
+                'indexes': [models.Index(fields=['domain_code', 'facet', 'document_count'], name='docrepo_facet_lookup_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentfacet',
+            constraint=models.UniqueConstraint(fields=('domain_code', 'facet', 'value'), name='docrepo_facet_dom_facet_val_uniq'),
+        ),
+    ]
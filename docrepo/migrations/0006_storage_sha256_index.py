@@ -0,0 +1,17 @@
+# Duplicate detection by content SHA-256.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("docrepo", "0005_document_facet"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="storageobject",
+            index=models.Index(fields=["bucket_name", "checksum_sha256"], name="docrepo_storage_sha256_idx"),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('docrepo', '0006_storage_sha256_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentFacetBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('domain_code', models.CharField(max_length=40, unique=True)),
+                ('facet_rows', models.PositiveIntegerField(default=0)),
+                ('built_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'docrepo_document_facet_build',
+            },
+        ),
+    ]
@@ -92,10 +92,16 @@ class StorageObject(TimestampedModel):
         indexes = [
             models.Index(fields=["bucket_name", "object_key"], name="docrepo_storage_bucket_key_idx"),
             models.Index(fields=["object_key"], name="docrepo_storage_obj_key_idx"),
+            models.Index(
+                fields=["object_key"],
+                name="docrepo_storage_key_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
             models.Index(fields=["bucket_name"], name="docrepo_storage_bucket_idx"),
             models.Index(fields=["etag"], name="docrepo_storage_etag_idx"),
             models.Index(fields=["size_bytes"], name="docrepo_storage_size_idx"),
             models.Index(fields=["bucket_name", "etag", "size_bytes"], name="docrepo_storage_dup_idx"),
+            models.Index(fields=["bucket_name", "checksum_sha256"], name="docrepo_storage_sha256_idx"),
         ]
 
     def __str__(self):
@@ -214,3 +220,42 @@ class ConstanciaAbonoDocument(TimestampedModel):
 
     def __str__(self):
         return f"CONSTANCIA - {self.document_id}"
+
+
+class DocumentFacet(TimestampedModel):
+    class FacetChoices(models.TextChoices):
+        YEAR = "YEAR", "Year"
+        COMPANY = "COMPANY", "Company"
+        BANK = "BANK", "Bank"
+        TIPO_DOCUMENTO = "TIPO_DOCUMENTO", "Tipo documento"
+
+    domain_code = models.CharField(max_length=40)
+    facet = models.CharField(max_length=20, choices=FacetChoices.choices)
+    value = models.CharField(max_length=300)
+    document_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "docrepo_document_facet"
+        constraints = [
+            models.UniqueConstraint(fields=["domain_code", "facet", "value"], name="docrepo_facet_dom_facet_val_uniq")
+        ]
+        indexes = [
+            models.Index(fields=["domain_code", "facet", "document_count"], name="docrepo_facet_lookup_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.domain_code} {self.facet}={self.value} ({self.document_count})"
+
+
+class DocumentFacetBuild(TimestampedModel):
+    """Domains whose facet counts were rebuilt from every active document."""
+
+    domain_code = models.CharField(max_length=40, unique=True)
+    facet_rows = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "docrepo_document_facet_build"
+
+    def __str__(self):
+        return f"{self.domain_code} built {self.built_at:%Y-%m-%d %H:%M}"
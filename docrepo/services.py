@@ -6,7 +6,7 @@ from dataclasses import dataclass
 from typing import Any
 
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.utils.text import slugify
 
@@ -21,7 +21,9 @@ from catalogs.models import (
     CatalogTRegistroType,
 )
 
+from .cache import notify_index_changed
 from .domain_inference import infer_domain_code
+from .facets import apply_facet_delta, facet_keys_for_document
 from .models import (
     ConstanciaAbonoDocument,
     Document,
@@ -47,6 +49,11 @@ def _safe_text(value: Any, max_len: int) -> str:
     return str(value or "").strip()[:max_len]
 
 
+def _is_multipart_etag(etag: Any) -> bool:
+    # "<md5 of part md5s>-<parts>" is not a content digest; keep the one recorded at upload.
+    return "-" in str(etag or "").strip('"')
+
+
 def _safe_int(value: Any, default: int) -> int:
     try:
         return int(str(value).strip())
@@ -216,6 +223,47 @@ def _clear_non_domain_details(document: Document, domain_code: str):
         ConstanciaAbonoDocument.objects.filter(document=document).delete()
 
 
+def _assign_content_hash(document: Document, checksum_sha256: str | None) -> None:
+    """Set content_hash_sha256 unless another document in the same scope already holds it.
+
+    The hash is unique per (domain, company, period); an explicit duplicate
+    re-ingest keeps its checksum on the StorageObject only.
+    """
+    checksum = _safe_text(checksum_sha256, 64)
+    if not checksum:
+        return
+    conflict = (
+        Document.objects.filter(
+            domain=document.domain,
+            company=document.company,
+            period=document.period,
+            content_hash_sha256=checksum,
+        )
+        .exclude(pk=document.pk)
+        .exists()
+    )
+    document.content_hash_sha256 = None if conflict else checksum
+
+
+def _save_document(document: Document, **save_kwargs: Any) -> None:
+    """Save `document`, dropping its content hash if a concurrent ingest claimed it first.
+
+    `_assign_content_hash` only sees committed rows: two uploads of the same
+    content can both pass the check, and the second save then violates
+    docrepo_doc_hash_scope_uniq. The save runs in a savepoint so the outer
+    transaction survives and the retry keeps the checksum on the StorageObject only.
+    """
+    if not document.content_hash_sha256:
+        document.save(**save_kwargs)
+        return
+    try:
+        with transaction.atomic():
+            document.save(**save_kwargs)
+    except IntegrityError:
+        document.content_hash_sha256 = None
+        document.save(**save_kwargs)
+
+
 @transaction.atomic
 def upsert_document_from_upload(
     *,
@@ -229,6 +277,8 @@ def upsert_document_from_upload(
     actor: Any | None = None,
     correction_reason: str = "",
     pdf_text: str | None = None,
+    content_md5: str | None = None,
+    checksum_sha256: str | None = None,
 ) -> UploadIngestionResult:
     object_key = _safe_text(object_key, 800)
     tipo_documento = _safe_text(metadata.get("tipo_documento") or "GENERAL", 300) or "GENERAL"
@@ -246,6 +296,7 @@ def upsert_document_from_upload(
 
     created_document = storage is None
     document = storage.document if storage else Document()
+    facets_before = set() if created_document else facet_keys_for_document(document.pk)
 
     now = timezone.now()
     document.domain = domain
@@ -253,7 +304,11 @@ def upsert_document_from_upload(
     document.period = period
     document.original_filename = _extract_filename(object_key)
     document.source_path_legacy = object_key
-    document.source_hash_md5 = _safe_text(etag, 64) or None
+    if content_md5:
+        document.source_hash_md5 = _safe_text(content_md5, 64)
+    elif not _is_multipart_etag(etag):
+        document.source_hash_md5 = _safe_text(etag, 64) or None
+    _assign_content_hash(document, checksum_sha256)
     document.correction_reason = _safe_text(correction_reason, 500)
     document.status = doc_status
     document.indexed_at = now if is_indexed else None
@@ -264,19 +319,19 @@ def upsert_document_from_upload(
             document.created_by = actor
         document.updated_by = actor
 
-    document.save()
+    _save_document(document)
 
-    StorageObject.objects.update_or_create(
-        document=document,
-        defaults={
-            "bucket_name": settings.MINIO_BUCKET,
-            "object_key": object_key,
-            "etag": _safe_text(etag, 255),
-            "size_bytes": max(int(size_bytes or 0), 0),
-            "last_modified": last_modified,
-            "content_type": "application/pdf",
-        },
-    )
+    storage_defaults = {
+        "bucket_name": settings.MINIO_BUCKET,
+        "object_key": object_key,
+        "etag": _safe_text(etag, 255),
+        "size_bytes": max(int(size_bytes or 0), 0),
+        "last_modified": last_modified,
+        "content_type": "application/pdf",
+    }
+    if checksum_sha256:
+        storage_defaults["checksum_sha256"] = _safe_text(checksum_sha256, 64)
+    StorageObject.objects.update_or_create(document=document, defaults=storage_defaults)
 
     normalized_codes = _parse_employee_codes(employee_codes)
 
@@ -372,6 +427,9 @@ def upsert_document_from_upload(
             },
         )
 
+    apply_facet_delta(facets_before, facet_keys_for_document(document.pk))
+    notify_index_changed()
+
     return UploadIngestionResult(
         document=document,
         domain_code=domain_code,
@@ -381,6 +439,23 @@ def upsert_document_from_upload(
     )
 
 
+@transaction.atomic
+def record_content_hashes(storage: StorageObject, *, content_md5: str, checksum_sha256: str) -> None:
+    """Store content hashes computed outside ingestion (backfill_content_hashes)."""
+    storage.checksum_sha256 = _safe_text(checksum_sha256, 64)
+    storage.save(update_fields=["checksum_sha256", "updated_at"])
+
+    document = storage.document
+    update_fields = ["updated_at"]
+    if document.is_active:
+        _assign_content_hash(document, checksum_sha256)
+        update_fields.append("content_hash_sha256")
+    if content_md5 and document.source_hash_md5 != content_md5:
+        document.source_hash_md5 = _safe_text(content_md5, 64)
+        update_fields.append("source_hash_md5")
+    _save_document(document, update_fields=update_fields)
+
+
 @transaction.atomic
 def deactivate_document_by_storage_key(
     *,
@@ -403,14 +478,17 @@ def deactivate_document_by_storage_key(
     if document is None:
         return None
 
+    facets_before = facet_keys_for_document(document.pk)
     archived_status = _status("ARCHIVED", "Archived", is_terminal=True)
     document.is_active = False
     document.status = archived_status
+    # Free the (domain, company, period, hash) slot for a later re-upload of the same content
+    document.content_hash_sha256 = None
 
     if actor is not None and getattr(actor, "is_authenticated", False):
         document.updated_by = actor
 
-    document.save(update_fields=["is_active", "status", "updated_by", "updated_at"])
+    document.save(update_fields=["is_active", "status", "content_hash_sha256", "updated_by", "updated_at"])
 
     IndexState.objects.filter(document=document).update(
         is_indexed=False,
@@ -420,4 +498,7 @@ def deactivate_document_by_storage_key(
         updated_at=timezone.now(),
     )
 
+    apply_facet_delta(facets_before, set())
+    notify_index_changed()
+
     return document
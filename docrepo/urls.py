@@ -1,14 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
     ConstanciasV2SearchView,
     DocumentDownloadV2View,
+    DocumentPreviewV2View,
     DocumentsZipDownloadV2View,
     FilterOptionsV2View,
     SegurosV2SearchView,
     TRegistroV2SearchView,
 )
 
+if settings.ASYNC_STORAGE_VIEWS:
+    from .async_views import (  # noqa: F811
+        AsyncDocumentDownloadV2View as DocumentDownloadV2View,
+        AsyncDocumentsZipDownloadV2View as DocumentsZipDownloadV2View,
+    )
+
 
 urlpatterns = [
     path("filter-options", FilterOptionsV2View.as_view(), name="v2_filter_options"),
@@ -20,4 +28,5 @@ urlpatterns = [
     path("constancias/search/legacy/", ConstanciasV2SearchView.as_view(), name="v2_search_constancias_legacy"),
     path("documents/download-zip", DocumentsZipDownloadV2View.as_view(), name="v2_documents_download_zip"),
     path("documents/<uuid:document_id>/download", DocumentDownloadV2View.as_view(), name="v2_document_download"),
+    path("documents/<uuid:document_id>/preview", DocumentPreviewV2View.as_view(), name="v2_document_preview"),
 ]
@@ -1,23 +1,33 @@
+import logging
 import re
 import time
-import zipfile
-from io import BytesIO
+from dataclasses import dataclass, field
 from typing import Any
 
 from django.conf import settings
-from django.http import HttpResponse, StreamingHttpResponse
+from django.http import StreamingHttpResponse
 from django.db.models import Q
+from minio.error import S3Error
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from auditlog.services import record_audit_event
-from documents.models import DownloadLog, PDFIndex
+from documents.conditional import conditional_on_index
+from documents.delivery import ObjectDelivery
+from documents.downloadlog import DownloadLogBatch
+from documents.models import PDFIndex
 from documents.permissions import allowed_domains_for_user
-from documents.utils import minio_client
+from documents.previews import PreviewNotAvailable, parse_preview_params, render_preview
+from documents.throttling import PreviewRateThrottle
+from documents.zipstream import ZIP_ERRORS_NAME, build_archive_names, errors_manifest, fetch_minio_object, prefetch_objects, stream_zip
 
 from .domain_inference import infer_domain_code
-from .models import Document
+from .facets import built_facet_domains, count_facets
+from .models import Document, DocumentFacet
+
+
+logger = logging.getLogger(__name__)
 
 
 MONTH_MAP = {
@@ -138,6 +148,12 @@ class BaseV2SearchView(APIView):
     permission_classes = [IsAuthenticated]
     domain_code: str = ""
     detail_select_related: tuple[str, ...] = ()
+    facet_fields: tuple[tuple[str, str], ...] = (
+        ("años", "period__year"),
+        ("meses", "period__month"),
+        ("razones_sociales", "company__name"),
+    )
+    domain_facet_fields: tuple[tuple[str, str], ...] = ()
 
     def get(self, request):
         return self.post(request)
@@ -212,6 +228,9 @@ class BaseV2SearchView(APIView):
             "codigos_no_encontrados": [code for code in employee_codes if code not in found_codes],
         }
 
+        if _as_bool(payload.get("facets")):
+            response_data["facets"] = self._build_facets(queryset)
+
         comparison = self._build_dual_read_comparison(payload, employee_codes, documents)
         if comparison is not None:
             response_data["comparison"] = comparison
@@ -261,6 +280,17 @@ class BaseV2SearchView(APIView):
 
         return queryset.filter(query).distinct().order_by("-indexed_at", "-created_at")
 
+    def _build_facets(self, queryset):
+        counts = count_facets(queryset, (*self.facet_fields, *self.domain_facet_fields))
+        facets = {}
+        for name, values in counts.items():
+            entries = [
+                {"value": f"{value:02d}" if name == "meses" else str(value), "count": count}
+                for value, count in values.items()
+            ]
+            facets[name] = sorted(entries, key=lambda entry: (-entry["count"], entry["value"]))
+        return facets
+
     def _serialize_document(self, document: Document):
         storage = getattr(document, "storage_object", None)
         index_state = getattr(document, "index_state", None)
@@ -369,9 +399,14 @@ class BaseV2SearchView(APIView):
         return {}
 
 
+def _allowed_domains_scope(request) -> str:
+    return ",".join(sorted(allowed_domains_for_user(request.user)))
+
+
 class FilterOptionsV2View(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional_on_index(scope=_allowed_domains_scope)
     def get(self, request):
         domain_filter = str(request.query_params.get("domain") or "").strip().upper()
         valid_domains = {"SEGUROS", "TREGISTRO", "CONSTANCIA_ABONO"}
@@ -383,9 +418,56 @@ class FilterOptionsV2View(APIView):
         if domain_filter in valid_domains and domain_filter not in allowed_domains:
             return Response({"error": "No tiene permisos para consultar este dominio documental."}, status=403)
 
-        queryset = Document.objects.filter(is_active=True, domain__code__in=allowed_domains)
-        if domain_filter in valid_domains:
-            queryset = queryset.filter(domain__code=domain_filter)
+        domains = [domain_filter] if domain_filter in valid_domains else sorted(allowed_domains)
+        options = self._facet_filter_options(domains)
+        if options is None:
+            options = self._live_filter_options(domains)
+
+        return Response(
+            {
+                **options,
+                "meses": MONTH_OPTIONS,
+                "source": "docrepo_v2",
+                "domain": domain_filter if domain_filter in valid_domains else "ALL",
+            }
+        )
+
+    def _facet_filter_options(self, domains: list[str]) -> dict[str, Any] | None:
+        if built_facet_domains(domains) != set(domains):
+            # Facet counts not rebuilt for every domain yet (run rebuild_docrepo_facets).
+            return None
+
+        rows = list(
+            DocumentFacet.objects.filter(domain_code__in=domains, document_count__gt=0).values_list(
+                "facet", "value", "document_count"
+            )
+        )
+
+        Facet = DocumentFacet.FacetChoices
+        counts: dict[str, dict[str, int]] = {facet: {} for facet in Facet.values}
+        for facet, value, document_count in rows:
+            bucket = counts.setdefault(facet, {})
+            bucket[value] = bucket.get(value, 0) + document_count
+
+        def by_name(facet: str) -> list[str]:
+            return sorted(counts[facet], key=str.casefold)
+
+        years = sorted(counts[Facet.YEAR], key=lambda year: _safe_int(year) or 0, reverse=True)
+        return {
+            "años": years,
+            "razones_sociales": by_name(Facet.COMPANY),
+            "bancos": by_name(Facet.BANK),
+            "tipos_documento": by_name(Facet.TIPO_DOCUMENTO),
+            "counts": {
+                "años": counts[Facet.YEAR],
+                "razones_sociales": counts[Facet.COMPANY],
+                "bancos": counts[Facet.BANK],
+                "tipos_documento": counts[Facet.TIPO_DOCUMENTO],
+            },
+        }
+
+    def _live_filter_options(self, domains: list[str]) -> dict[str, Any]:
+        queryset = Document.objects.filter(is_active=True, domain__code__in=domains)
 
         years = [
             str(year)
@@ -429,198 +511,315 @@ class FilterOptionsV2View(APIView):
             if value:
                 tipos_documento_values.add(value.strip())
 
-        tipos_documento = sorted(tipos_documento_values, key=str.casefold)
+        return {
+            "años": years,
+            "razones_sociales": razones_sociales,
+            "bancos": bancos,
+            "tipos_documento": sorted(tipos_documento_values, key=str.casefold),
+            "counts": {},
+        }
 
-        return Response(
-            {
-                "años": years,
-                "razones_sociales": razones_sociales,
-                "bancos": bancos,
-                "tipos_documento": tipos_documento,
-                "meses": MONTH_OPTIONS,
-                "source": "docrepo_v2",
-                "domain": domain_filter if domain_filter in valid_domains else "ALL",
-            }
+
+def document_object_key(document: Document) -> str:
+    storage = getattr(document, "storage_object", None)
+    if storage is not None and storage.object_key:
+        return storage.object_key
+    return document.source_path_legacy or ""
+
+
+def resolve_download_target(request, document_id) -> tuple[Document | None, str, tuple[dict[str, str], int] | None]:
+    """Permission checks for a single download; returns `(document, object_key, error)`.
+
+    Shared by the sync and async download views. Failures are audited here.
+    """
+    document = Document.objects.select_related("domain", "storage_object").filter(id=document_id, is_active=True).first()
+    if document is None:
+        record_audit_event(
+            action="DOC_DOWNLOAD_FAILED",
+            resource_type="document",
+            resource_id=str(document_id),
+            request=request,
+            metadata={"reason": "document_not_found", "status_code": 404},
+        )
+        return None, "", ({"error": "Documento no encontrado."}, 404)
+
+    if document.domain.code not in allowed_domains_for_user(request.user):
+        return None, "", ({"error": "No tiene permisos para descargar este documento."}, 403)
+
+    object_key = document_object_key(document)
+    if not object_key:
+        record_audit_event(
+            action="DOC_DOWNLOAD_FAILED",
+            resource_type="document",
+            resource_id=str(document.id),
+            request=request,
+            document=document,
+            metadata={"reason": "storage_reference_missing", "status_code": 404},
         )
+        return None, "", ({"error": "Documento sin referencia de storage."}, 404)
+
+    return document, object_key, None
+
+
+def record_download_missing_object(request, document: Document, object_key: str) -> tuple[dict[str, str], int]:
+    record_audit_event(
+        action="DOC_DOWNLOAD_FAILED",
+        resource_type="document",
+        resource_id=str(document.id),
+        request=request,
+        document=document,
+        metadata={"reason": "storage_object_not_found", "status_code": 404, "object_key": object_key},
+    )
+    return {"error": "Archivo no encontrado en storage."}, 404
+
+
+def log_document_download(request, document: Document, object_key: str, delivery, response):
+    """Attach the DownloadLog row and audit event to `response`; both are written once the transfer ends.
+
+    PDF viewers fetch a document with many Range requests: only a full
+    response or the range starting at byte 0 counts as a download, and a 416
+    is never logged.
+    """
+    download_log = DownloadLogBatch(request)
+    if delivery.counts_as_download:
+        download_log.add(object_key)
+        download_log.defer(
+            lambda: record_audit_event(
+                action="DOC_DOWNLOAD_SUCCEEDED",
+                resource_type="document",
+                resource_id=str(document.id),
+                request=request,
+                actor=request.user,
+                document=document,
+                metadata={
+                    "status_code": response.status_code,
+                    "object_key": object_key,
+                    "domain": document.domain.code,
+                    "delivery": delivery.mode,
+                    "byte_range": delivery.content_range,
+                },
+            )
+        )
+    return download_log.attach(response)
+
+
+def storage_etag(document: Document, object_key: str) -> str:
+    """ETag recorded at ingest for `object_key`; lets the object cache skip a MinIO stat."""
+    storage = getattr(document, "storage_object", None)
+    if storage is not None and storage.object_key == object_key:
+        return storage.etag or ""
+    return ""
+
+
+def download_filename(document: Document, object_key: str) -> str:
+    return object_key.split("/")[-1] or f"{document.id}.pdf"
 
 
 class DocumentDownloadV2View(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request, document_id):
+        document, object_key, error = resolve_download_target(request, document_id)
+        if error is not None:
+            return Response(error[0], status=error[1])
+
+        try:
+            delivery = ObjectDelivery(object_key, request=request).open()
+        except Exception:
+            payload, status = record_download_missing_object(request, document, object_key)
+            return Response(payload, status=status)
+
+        response = delivery.response(download_filename(document, object_key))
+        return log_document_download(request, document, object_key, delivery, response)
+
+
+class DocumentPreviewV2View(APIView):
+    """Thumbnail of page 1, of `?page=N` or of the first page containing `?codigo=`."""
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [PreviewRateThrottle]
+
     def get(self, request, document_id):
         document = Document.objects.select_related("domain", "storage_object").filter(id=document_id, is_active=True).first()
         if document is None:
-            record_audit_event(
-                action="DOC_DOWNLOAD_FAILED",
-                resource_type="document",
-                resource_id=str(document_id),
-                request=request,
-                metadata={"reason": "document_not_found", "status_code": 404},
-            )
             return Response({"error": "Documento no encontrado."}, status=404)
-
         if document.domain.code not in allowed_domains_for_user(request.user):
-            return Response({"error": "No tiene permisos para descargar este documento."}, status=403)
-
-        storage = getattr(document, "storage_object", None)
-        object_key = ""
-        if storage is not None and storage.object_key:
-            object_key = storage.object_key
-        elif document.source_path_legacy:
-            object_key = document.source_path_legacy
+            return Response({"error": "No tiene permisos para ver este documento."}, status=403)
 
+        object_key = document_object_key(document)
         if not object_key:
-            record_audit_event(
-                action="DOC_DOWNLOAD_FAILED",
-                resource_type="document",
-                resource_id=str(document.id),
-                request=request,
-                document=document,
-                metadata={"reason": "storage_reference_missing", "status_code": 404},
-            )
             return Response({"error": "Documento sin referencia de storage."}, status=404)
 
         try:
-            response = minio_client.get_object(settings.MINIO_BUCKET, object_key)
-        except Exception:
+            page_index, codigo, width, fmt = parse_preview_params(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        try:
+            preview = render_preview(
+                object_key,
+                page_index=page_index,
+                codigo=codigo,
+                width=width,
+                fmt=fmt,
+                etag=storage_etag(document, object_key),
+            )
+        except PreviewNotAvailable:
+            return Response({"error": "La pagina solicitada no existe en el documento."}, status=404)
+        except S3Error as exc:
+            if exc.code != "NoSuchKey":
+                logger.warning("Preview failed for %s: %s", object_key, exc)
+                return Response({"error": "No se pudo generar la vista previa."}, status=503)
+            return Response({"error": "Archivo no encontrado en storage."}, status=404)
+        except Exception as exc:
+            logger.warning("Preview failed for %s: %s", object_key, exc)
+            return Response({"error": "No se pudo generar la vista previa."}, status=503)
+
+        response = preview.response(request)
+        # A 304 revalidation shows nothing new; only rendered images are audited
+        if response.status_code == 200:
             record_audit_event(
-                action="DOC_DOWNLOAD_FAILED",
+                action="DOC_PREVIEW_RENDERED",
                 resource_type="document",
                 resource_id=str(document.id),
                 request=request,
+                actor=request.user,
                 document=document,
-                metadata={"reason": "storage_object_not_found", "status_code": 404, "object_key": object_key},
+                metadata={
+                    "object_key": object_key,
+                    "domain": document.domain.code,
+                    "page": preview.page_index + 1,
+                    "width": width,
+                    "format": fmt,
+                },
             )
-            return Response({"error": "Archivo no encontrado en storage."}, status=404)
+        return response
 
-        DownloadLog.objects.create(
-            user=request.user,
-            filename=object_key,
-            ip_address=request.META.get("REMOTE_ADDR"),
-        )
 
-        record_audit_event(
-            action="DOC_DOWNLOAD_SUCCEEDED",
-            resource_type="document",
-            resource_id=str(document.id),
-            request=request,
-            actor=request.user,
-            document=document,
-            metadata={
-                "status_code": 200,
-                "object_key": object_key,
-                "domain": document.domain.code,
-            },
-        )
+@dataclass
+class ZipDownloadPlan:
+    document_ids: list[str]
+    documents: list[Document]
+    # (document, object_key, archive_name) in archive order
+    entries: list[tuple[Document, str, str]]
+    errors: list[dict[str, str]] = field(default_factory=list)
+
+
+def plan_zip_download(request) -> tuple[ZipDownloadPlan | None, tuple[dict[str, Any], int] | None]:
+    """Validate a ZIP request and resolve the documents the user may download."""
+    document_ids = request.data.get("document_ids") or request.data.get("ids") or []
+    if not isinstance(document_ids, list):
+        return None, ({"error": "document_ids debe ser una lista."}, 400)
+
+    document_ids = [str(doc_id).strip() for doc_id in document_ids if str(doc_id).strip()]
+    if not document_ids:
+        return None, ({"error": "No hay documentos para descargar."}, 400)
+
+    max_zip_files = int(getattr(settings, "DOCREPO_MAX_ZIP_FILES", 500))
+    if len(document_ids) > max_zip_files:
+        return None, ({"error": f"El ZIP admite como maximo {max_zip_files} documentos."}, 400)
+
+    documents = list(
+        Document.objects.select_related("domain", "storage_object")
+        .filter(id__in=document_ids, is_active=True, domain__code__in=allowed_domains_for_user(request.user))
+        .order_by("domain__code", "created_at")
+    )
+    if not documents:
+        return None, ({"error": "No se encontraron documentos validos."}, 404)
+
+    errors: list[dict[str, str]] = []
+    planned: list[tuple[Document, str]] = []
+    for document in documents:
+        object_key = document_object_key(document)
+        if not object_key:
+            errors.append({"document_id": str(document.id), "error": "storage_reference_missing"})
+            continue
+        planned.append((document, object_key))
+
+    archive_names = build_archive_names(
+        object_key.strip("/").replace("\\", "/").rsplit("/", 1)[-1] or f"{document.id}.pdf"
+        for document, object_key in planned
+    )
+    entries = [
+        (document, object_key, archive_name)
+        for (document, object_key), archive_name in zip(planned, archive_names)
+    ]
+    return ZipDownloadPlan(document_ids=document_ids, documents=documents, entries=entries, errors=errors), None
+
+
+def record_zip_download(request, plan: ZipDownloadPlan, added: int) -> None:
+    record_audit_event(
+        action="DOC_ZIP_DOWNLOAD_SUCCEEDED",
+        resource_type="document",
+        resource_id=f"zip:{added}",
+        request=request,
+        actor=request.user,
+        metadata={
+            "status_code": 200,
+            "documents_requested": len(plan.document_ids),
+            "files_zipped": added,
+            "errors": plan.errors[:20],
+        },
+    )
 
-        safe_filename = object_key.split("/")[-1] or f"{document.id}.pdf"
-        return StreamingHttpResponse(
-            response.stream(amt=8192),
-            content_type="application/pdf",
-            headers={"Content-Disposition": f'attachment; filename="{safe_filename}"'},
-        )
+
+def zip_missing_object_error(document: Document, object_key: str) -> dict[str, str]:
+    return {"document_id": str(document.id), "object_key": object_key, "error": "storage_object_not_found"}
 
 
 class DocumentsZipDownloadV2View(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        document_ids = request.data.get("document_ids") or request.data.get("ids") or []
-        if not isinstance(document_ids, list):
-            return Response({"error": "document_ids debe ser una lista."}, status=400)
-
-        document_ids = [str(doc_id).strip() for doc_id in document_ids if str(doc_id).strip()]
-        if not document_ids:
-            return Response({"error": "No hay documentos para descargar."}, status=400)
-
-        max_zip_files = int(getattr(settings, "DOCREPO_MAX_ZIP_FILES", 500))
-        if len(document_ids) > max_zip_files:
-            return Response({"error": f"El ZIP admite como maximo {max_zip_files} documentos."}, status=400)
-
-        documents = list(
-            Document.objects.select_related("domain", "storage_object")
-            .filter(id__in=document_ids, is_active=True, domain__code__in=allowed_domains_for_user(request.user))
-            .order_by("domain__code", "created_at")
+        plan, error = plan_zip_download(request)
+        if error is not None:
+            return Response(error[0], status=error[1])
+
+        errors = plan.errors
+        etags = {object_key: storage_etag(document, object_key) for document, object_key, _ in plan.entries}
+        results = prefetch_objects(
+            (((document, object_key, archive_name), object_key) for document, object_key, archive_name in plan.entries),
+            fetch=lambda object_key: fetch_minio_object(object_key, etag=etags.get(object_key)),
         )
-        if not documents:
-            return Response({"error": "No se encontraron documentos validos."}, status=404)
+        download_log = DownloadLogBatch(request)
+
+        def next_member():
+            for (document, object_key, archive_name), content, error in results:
+                if error is None:
+                    download_log.add(object_key)
+                    return archive_name, content
+                errors.append(zip_missing_object_error(document, object_key))
+            return None
 
-        buffer = BytesIO()
+        # Wait for the first member so an all-missing request still gets a 404.
+        first_member = next_member()
+        if first_member is None:
+            return Response({"error": "No se pudo agregar ningun documento al ZIP.", "details": errors}, status=404)
+
+        pre_stream_errors = len(errors)
         added = 0
-        errors: list[dict[str, str]] = []
-        used_names: set[str] = set()
-        basename_counts: dict[str, int] = {}
-        basename_seen: dict[str, int] = {}
-
-        for document in documents:
-            storage = getattr(document, "storage_object", None)
-            object_key = storage.object_key if storage and storage.object_key else document.source_path_legacy
-            archive_name = object_key.strip("/").replace("\\", "/").rsplit("/", 1)[-1] if object_key else f"{document.id}.pdf"
-            basename_counts[archive_name] = basename_counts.get(archive_name, 0) + 1
-
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
-            for document in documents:
-                storage = getattr(document, "storage_object", None)
-                object_key = storage.object_key if storage and storage.object_key else document.source_path_legacy
-                if not object_key:
-                    errors.append({"document_id": str(document.id), "error": "storage_reference_missing"})
-                    continue
-
-                try:
-                    minio_response = minio_client.get_object(settings.MINIO_BUCKET, object_key)
-                    content = minio_response.read()
-                    minio_response.close()
-                    minio_response.release_conn()
-                except Exception:
-                    errors.append({"document_id": str(document.id), "object_key": object_key, "error": "storage_object_not_found"})
-                    continue
-
-                base_name = object_key.strip("/").replace("\\", "/").rsplit("/", 1)[-1]
-                if not base_name:
-                    base_name = f"{document.id}.pdf"
-                if basename_counts.get(base_name, 0) > 1:
-                    basename_seen[base_name] = basename_seen.get(base_name, 0) + 1
-                    archive_name = f"{basename_seen[base_name]:03d}_{base_name}"
-                else:
-                    archive_name = base_name
-                while archive_name in used_names:
-                    basename_seen[base_name] = basename_seen.get(base_name, 0) + 1
-                    archive_name = f"{basename_seen[base_name]:03d}_{base_name}"
-                used_names.add(archive_name)
-
-                archive.writestr(archive_name, content)
+
+        def members():
+            nonlocal added
+            member = first_member
+            while member is not None:
+                yield member
                 added += 1
+                member = next_member()
 
-                DownloadLog.objects.create(
-                    user=request.user,
-                    filename=object_key,
-                    ip_address=request.META.get("REMOTE_ADDR"),
-                )
+            if errors:
+                yield ZIP_ERRORS_NAME, errors_manifest(errors)
 
-        if added == 0:
-            return Response({"error": "No se pudo agregar ningun documento al ZIP.", "details": errors}, status=404)
+        # Deferred before streaming so a client disconnect still records what was sent.
+        download_log.defer(lambda: record_zip_download(request, plan, added))
 
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type="application/zip")
-        response["Content-Disposition"] = f'attachment; filename="documentos_{added}.zip"'
-        response["X-Files-Zipped"] = str(added)
-        response["X-Zip-Errors"] = str(len(errors))
-
-        record_audit_event(
-            action="DOC_ZIP_DOWNLOAD_SUCCEEDED",
-            resource_type="document",
-            resource_id=f"zip:{added}",
-            request=request,
-            actor=request.user,
-            metadata={
-                "status_code": 200,
-                "documents_requested": len(document_ids),
-                "files_zipped": added,
-                "errors": errors[:20],
-            },
-        )
-
-        return response
+        # Counts known when streaming starts; later failures are listed in ERRORES.txt.
+        expected = len(plan.documents) - pre_stream_errors
+        response = StreamingHttpResponse(stream_zip(members()), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="documentos_{expected}.zip"'
+        response["X-Files-Zipped"] = str(expected)
+        response["X-Zip-Errors"] = str(pre_stream_errors)
+        return download_log.attach(response)
 
 
 class SegurosV2SearchView(BaseV2SearchView):
@@ -630,6 +829,10 @@ class SegurosV2SearchView(BaseV2SearchView):
         "insurance_detail__insurance_type",
         "insurance_detail__insurance_subtype",
     )
+    domain_facet_fields = (
+        ("tipos_seguro", "insurance_detail__insurance_type__name"),
+        ("subtipos_seguro", "insurance_detail__insurance_subtype__name"),
+    )
 
     def _domain_query(self, payload: dict[str, Any]):
         query = Q()
@@ -683,6 +886,7 @@ class TRegistroV2SearchView(BaseV2SearchView):
         "tregistro_detail",
         "tregistro_detail__movement_type",
     )
+    domain_facet_fields = (("tipos_movimiento", "tregistro_detail__movement_type__name"),)
 
     def _domain_query(self, payload: dict[str, Any]):
         query = Q()
@@ -731,6 +935,10 @@ class ConstanciasV2SearchView(BaseV2SearchView):
         "constancia_detail",
         "constancia_detail__bank",
     )
+    domain_facet_fields = (
+        ("bancos", "constancia_detail__bank__name"),
+        ("payroll_types", "constancia_detail__payroll_type"),
+    )
 
     def _domain_query(self, payload: dict[str, Any]):
         query = Q()
@@ -0,0 +1,94 @@
+"""
+Base para vistas async (ASGI) de transferencia de archivos.
+
+DRF no ejecuta handlers async, así que AsyncAPIView es una vista Django
+async que aplica la misma autenticación (JWT), permisos y throttling que
+APIView, en un hilo y antes de entrar al handler. El handler recibe el
+Request de DRF (request.user, request.data, request.META).
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+def json_error(payload, status):
+    return JsonResponse(payload, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+async def _aiter_file(handle, chunk_size=FILE_CHUNK_SIZE):
+    read = sync_to_async(handle.read, thread_sensitive=False)
+    while True:
+        chunk = await read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def async_file_response(response):
+    """
+    Pasa una FileResponse a iteración async. Bajo ASGI Django junta en memoria
+    los iteradores sync antes de enviarlos; así el archivo sale por bloques.
+    """
+    response.streaming_content = _aiter_file(response.file_to_stream)
+    return response
+
+
+class AsyncAPIView(View):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = []
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Igual que APIView: sin CSRF de sesión, la autenticación es por JWT
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_authenticators(self):
+        return [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+    def _initial(self, request):
+        """Autenticación, permisos, throttling y parseo del body. Devuelve (drf_request, respuesta_error)."""
+        drf_request = Request(
+            request,
+            parsers=[JSONParser(), FormParser(), MultiPartParser()],
+            authenticators=self.get_authenticators(),
+        )
+        try:
+            drf_request.user
+            for permission in (permission_class() for permission_class in self.permission_classes):
+                if not permission.has_permission(drf_request, self):
+                    if drf_request.successful_authenticator is None:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied()
+
+            for throttle in (throttle_class() for throttle_class in self.throttle_classes):
+                if not throttle.allow_request(drf_request, self):
+                    raise exceptions.Throttled(throttle.wait())
+
+            drf_request.data
+        except exceptions.APIException as exc:
+            response = json_error({'detail': str(exc.detail)}, exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = str(int(exc.wait))
+            return None, response
+
+        return drf_request, None
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        drf_request, error_response = await sync_to_async(self._initial)(request)
+        if error_response is not None:
+            return error_response
+        return await handler(drf_request, *args, **kwargs)
@@ -0,0 +1,157 @@
+"""
+Variantes async (ASGI) de los endpoints de descarga y merge.
+
+Mismas URLs, permisos, auditoría y formato de respuesta que las vistas de
+documents.views; se activan con ASYNC_STORAGE_VIEWS=True y un servidor ASGI
+(gunicorn con workers de uvicorn). Los bytes se leen de MinIO con el cliente
+S3 asíncrono, así que una transferencia lenta no retiene un hilo del worker.
+"""
+
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+
+from . import asyncstorage
+from .async_support import AsyncAPIView, async_file_response, json_error
+from .delivery import AsyncObjectDelivery
+from .downloadlog import DownloadLogBatch
+from .mergecache import (
+    atee_to_merge_cache, merge_cache_enabled, merge_cache_key, object_versions, open_cached_merge,
+    store_merge_result,
+)
+from .pdfmerge import aspool_minio_object, merge_spool_directory, merge_spooled_pdfs
+from .throttling import MergeRateThrottle
+from .views import MergePdfsView, download_forbidden
+from .zipstream import ZIP_ERRORS_NAME, astream_zip, build_archive_names, errors_manifest
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDownloadView(AsyncAPIView):
+    async def get(self, request, filename):
+        try:
+            if await sync_to_async(download_forbidden)(request.user, filename):
+                return json_error({'error': 'No tiene permisos para descargar este documento.'}, 403)
+
+            delivery = await AsyncObjectDelivery(filename, request=request).aopen()
+        except Exception:
+            return json_error({'error': 'Archivo no encontrado'}, 404)
+
+        download_log = DownloadLogBatch(request)
+        if delivery.counts_as_download:
+            download_log.add(filename)
+        response = await delivery.aresponse(filename.split('/')[-1])
+        return await sync_to_async(download_log.attach)(response)
+
+
+class AsyncMergePdfsView(AsyncAPIView):
+    throttle_classes = [MergeRateThrottle]
+
+    async def post(self, request):
+        paths, output_format, safe_name, error = MergePdfsView.parse_request(request.data)
+        if error is not None:
+            return json_error(*error)
+
+        try:
+            cache_key = None
+            object_etags = None
+            if merge_cache_enabled():
+                object_etags = await sync_to_async(object_versions, thread_sensitive=False)(paths)
+            if object_etags is not None:
+                cache_key = merge_cache_key(paths, object_etags, output_format)
+                cached = open_cached_merge(cache_key, output_format)
+                if cached is not None:
+                    download_log = MergePdfsView.merge_download_log(request, output_format, safe_name, len(paths))
+                    response = async_file_response(MergePdfsView.cached_response(cached, output_format, safe_name, len(paths)))
+                    return await sync_to_async(download_log.attach)(response)
+
+            if output_format == 'zip':
+                return await self._zip_response(request, paths, safe_name, cache_key)
+            return await self._pdf_response(request, paths, safe_name, cache_key)
+        except Exception as e:
+            logger.error(f"✗ Error fusionando PDFs: {e}")
+            return json_error({'error': f'Error al fusionar PDFs: {str(e)}'}, 500)
+
+    async def _zip_response(self, request, paths, safe_name, cache_key):
+        errors = []
+        archive_names = build_archive_names(
+            os.path.basename(str(path).strip('/')) or 'documento.pdf' for path in paths
+        )
+        results = asyncstorage.prefetch_objects(((path, name), path) for path, name in zip(paths, archive_names))
+
+        async def next_member():
+            async for (path, archive_name), content, error in results:
+                if error is None:
+                    return archive_name, content
+                logger.error(f"✗ Error descargando {path}: {error}")
+                errors.append({'path': path, 'error': str(error)})
+            return None
+
+        # Se espera el primer archivo válido antes de responder, para poder devolver 400
+        first_member = await next_member()
+        if first_member is None:
+            return json_error({'error': 'No se pudo procesar ningún archivo.', 'errors': errors}, 400)
+
+        pre_stream_errors = len(errors)
+        files_zipped = 0
+
+        async def members():
+            nonlocal files_zipped
+            member = first_member
+            while member is not None:
+                yield member
+                files_zipped += 1
+                member = await next_member()
+
+            if errors:
+                yield ZIP_ERRORS_NAME, errors_manifest(errors)
+
+        download_log = DownloadLogBatch(request)
+        download_log.add(lambda: f"ZIP:{files_zipped}_archivos_{safe_name}.zip")
+
+        body = astream_zip(members())
+        if cache_key:
+            body = atee_to_merge_cache(cache_key, 'zip', body, is_complete=lambda: not errors)
+
+        response = StreamingHttpResponse(body, content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{safe_name}.zip"'
+        response['X-Files-Zipped'] = str(len(paths) - pre_stream_errors)
+        response['X-Zip-Errors'] = str(pre_stream_errors)
+        if cache_key:
+            response['X-Merge-Cache'] = 'MISS'
+        return download_log.attach(response)
+
+    async def _pdf_response(self, request, paths, safe_name, cache_key):
+        with merge_spool_directory() as directory:
+            spooled = [
+                result
+                async for result in asyncstorage.prefetch_objects(
+                    ((path, path) for path in paths),
+                    fetch=lambda object_key: aspool_minio_object(object_key, directory),
+                )
+            ]
+            # PyMuPDF es CPU: la fusión corre en un hilo aparte
+            output, files_merged, errors = await sync_to_async(merge_spooled_pdfs, thread_sensitive=False)(
+                spooled, directory,
+            )
+
+        if not files_merged:
+            return json_error({'error': 'No se pudo procesar ningún archivo.', 'errors': errors}, 400)
+
+        logger.info(f"✓ PDF combinado: {len(files_merged)} archivos, {len(errors)} errores")
+        if cache_key and not errors:
+            await sync_to_async(store_merge_result, thread_sensitive=False)(cache_key, 'pdf', output)
+
+        download_log = MergePdfsView.merge_download_log(request, 'pdf', safe_name, len(files_merged))
+
+        response = async_file_response(
+            FileResponse(output, content_type='application/pdf', as_attachment=True, filename=f"{safe_name}.pdf")
+        )
+        response['X-Files-Merged'] = str(len(files_merged))
+        response['X-Merge-Errors'] = str(len(errors))
+        if cache_key:
+            response['X-Merge-Cache'] = 'MISS'
+        return await sync_to_async(download_log.attach)(response)
@@ -10,6 +10,7 @@ from auditlog.services import record_audit_event
 
 from .permissions import allowed_domains_for_user, can_manage_files
 from .throttling import LoginRateThrottle
+from .tokens import PermissionRefreshToken
 
 
 class AuthLoginView(APIView):
@@ -76,7 +77,7 @@ class AuthLoginView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        refresh = RefreshToken.for_user(user)
+        refresh = PermissionRefreshToken.for_user(user)
         user_role = "admin" if user.is_staff else "user"
         record_audit_event(
             action="AUTH_LOGIN_SUCCEEDED",
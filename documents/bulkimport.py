@@ -0,0 +1,271 @@
+"""
+Importación masiva de PDFs desde un directorio local o un ZIP
+(comando import_pdfs).
+
+Por lotes:
+1. Análisis en un pool de procesos: hashes, texto y códigos con PyMuPDF,
+   metadata con infer_upload_metadata y ruta con build_auto_storage_prefix
+   (o la carpeta indicada). Los procesos reciben solo (origen, nombre).
+2. Duplicados: una consulta por lote sobre StorageObject.checksum_sha256.
+3. Puts multiparte concurrentes a MinIO en un pool de hilos.
+4. Ingesta en docrepo (y espejo legacy) dentro de una transacción por lote.
+5. Checkpoint: cada archivo terminado se agrega a un JSONL; al relanzar el
+   comando se saltan los que ya figuran ahí.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import zipfile
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from docrepo.models import StorageObject
+from docrepo.services import upsert_document_from_upload
+from .models import PDFIndex
+from .uploadstream import upload_part_size
+from .utils import build_auto_storage_prefix, extract_metadata, extract_text_from_pdf_bytes, infer_upload_metadata, minio_client
+
+
+ImportEntry = namedtuple('ImportEntry', [
+    'name', 'size', 'md5', 'sha256', 'text', 'codigos', 'metadata', 'domain_code', 'object_key',
+])
+
+logger = logging.getLogger(__name__)
+
+STATUS_IMPORTED = 'imported'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_ERROR = 'error'
+
+
+class DirectorySource:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def names(self):
+        found = []
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith('.pdf'):
+                    found.append(os.path.relpath(os.path.join(root, filename), self.path).replace(os.sep, '/'))
+        return found
+
+    def open(self, name):
+        return open(os.path.join(self.path, name), 'rb')
+
+
+class ZipSource:
+    """Cada open() abre su propio ZipFile: se usa desde varios hilos y procesos."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def names(self):
+        with zipfile.ZipFile(self.path) as archive:
+            return sorted(
+                info.filename for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.pdf')
+            )
+
+    def open(self, name):
+        archive = zipfile.ZipFile(self.path)
+        try:
+            member = archive.open(name)
+        except Exception:
+            archive.close()
+            raise
+        # ZipExtFile no cierra el ZipFile; se cierra junto con el miembro
+        original_close = member.close
+
+        def close():
+            original_close()
+            archive.close()
+
+        member.close = close
+        return member
+
+
+def open_source(path):
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    raise ValueError(f'{path} no es un directorio ni un archivo ZIP')
+
+
+def analyze_entry(source_path, name, folder='', hints=None):
+    """Corre en el pool de procesos: todo lo que no toca MinIO ni la base de datos."""
+    with open_source(source_path).open(name) as handle:
+        content = handle.read()
+
+    text, codigos = extract_text_from_pdf_bytes(content)
+    filename = name.rsplit('/', 1)[-1]
+    hints = hints or {}
+
+    if folder:
+        object_key = f"{folder.rstrip('/')}/{filename}"
+        metadata = extract_metadata(object_key)
+        metadata.update({key: value for key, value in hints.items() if str(value or '').strip()})
+        domain_code = ''
+    else:
+        # La ruta relativa suele traer empresa/mes/banco en las carpetas
+        metadata = infer_upload_metadata(name, text, hints)
+        domain_code = metadata.get('domain_code', '')
+        object_key = f"{build_auto_storage_prefix(metadata, domain_code)}/{filename}"
+
+    return ImportEntry(
+        name=name,
+        size=len(content),
+        md5=hashlib.md5(content).hexdigest(),
+        sha256=hashlib.sha256(content).hexdigest(),
+        text=text,
+        codigos=list(codigos or []),
+        metadata=metadata,
+        domain_code=domain_code,
+        object_key=object_key,
+    )
+
+
+def existing_hashes(sha256_hashes):
+    """{sha256: object_key} de los hashes del lote que ya existen activos en docrepo."""
+    if not sha256_hashes:
+        return {}
+    rows = StorageObject.objects.filter(
+        bucket_name=settings.MINIO_BUCKET,
+        document__is_active=True,
+        checksum_sha256__in=list(sha256_hashes),
+    ).values_list('checksum_sha256', 'object_key')
+    return dict(rows)
+
+
+def existing_object_keys(object_keys):
+    """Claves del lote ya ocupadas por otro contenido (no se sobrescriben)."""
+    if not object_keys:
+        return set()
+    return set(
+        StorageObject.objects.filter(
+            bucket_name=settings.MINIO_BUCKET,
+            document__is_active=True,
+            object_key__in=list(object_keys),
+        ).values_list('object_key', flat=True)
+    )
+
+
+def put_entry(source_path, entry):
+    """Corre en el pool de hilos: put multiparte y stat del objeto."""
+    with open_source(source_path).open(entry.name) as handle:
+        minio_client.put_object(
+            settings.MINIO_BUCKET,
+            entry.object_key,
+            handle,
+            length=entry.size,
+            content_type='application/pdf',
+            part_size=upload_part_size(),
+        )
+    return minio_client.stat_object(settings.MINIO_BUCKET, entry.object_key)
+
+
+def discard_stored_entry(entry):
+    """Borra de MinIO el objeto de una entrada que no se pudo ingestar; devuelve si se borró."""
+    try:
+        minio_client.remove_object(settings.MINIO_BUCKET, entry.object_key)
+        return True
+    except Exception as e:
+        logger.warning(f"No se pudo borrar {entry.object_key} tras fallar su ingesta: {e}")
+        return False
+
+
+def ingest_batch(stored, actor=None):
+    """
+    Upsert en docrepo de [(entry, stat)] en una sola transacción. Cada
+    documento va en su propio savepoint: uno que falla no revierte el lote y
+    su objeto se borra de MinIO. Un fallo del espejo legacy solo se registra
+    en el log, como en FilesUploadView. Devuelve {name: error} de los que no
+    se ingestaron.
+    """
+    dual_write_legacy = getattr(settings, 'DOCREPO_DUAL_WRITE_LEGACY_ENABLED', True)
+    failed = {}
+    with transaction.atomic():
+        for entry, stat in stored:
+            etag = (getattr(stat, 'etag', None) or '').strip('"') or entry.md5
+            last_modified = getattr(stat, 'last_modified', None)
+            indexed = bool(entry.text)
+            try:
+                with transaction.atomic():
+                    upsert_document_from_upload(
+                        object_key=entry.object_key,
+                        metadata=entry.metadata,
+                        size_bytes=entry.size,
+                        etag=etag,
+                        last_modified=last_modified,
+                        employee_codes=entry.codigos,
+                        is_indexed=indexed,
+                        actor=actor,
+                        pdf_text=entry.text,
+                        content_md5=entry.md5,
+                        checksum_sha256=entry.sha256,
+                    )
+            except Exception as e:
+                failed[entry.name] = str(e)
+                if not discard_stored_entry(entry):
+                    failed[entry.name] += f' (el objeto {entry.object_key} quedó en MinIO sin documento)'
+                continue
+
+            if dual_write_legacy:
+                try:
+                    with transaction.atomic():
+                        PDFIndex.objects.update_or_create(
+                            minio_object_name=entry.object_key,
+                            defaults={
+                                'razon_social': entry.metadata['razon_social'],
+                                'banco': entry.metadata['banco'],
+                                'mes': entry.metadata['mes'],
+                                'año': entry.metadata['año'],
+                                'tipo_documento': entry.metadata['tipo_documento'],
+                                'size_bytes': entry.size,
+                                'md5_hash': etag,
+                                'codigos_empleado': ','.join(entry.codigos),
+                                'last_modified': last_modified,
+                                'is_indexed': indexed,
+                            },
+                        )
+                except Exception as legacy_error:
+                    logger.warning(f"Legacy mirror sync failed for {entry.object_key}: {legacy_error}")
+    return failed
+
+
+class ImportCheckpoint:
+    """JSONL con un registro por archivo terminado (importado, duplicado o error)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # última línea cortada por una interrupción
+                    self.done[record['name']] = record
+
+    def is_done(self, name, retry_errors=False):
+        record = self.done.get(name)
+        if record is None:
+            return False
+        return not (retry_errors and record.get('status') == STATUS_ERROR)
+
+    def record(self, records):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self.done[record['name']] = record
+            handle.flush()
+            os.fsync(handle.fileno())
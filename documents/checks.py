@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .ratelimit import rate_limit_cache_alias, rate_limit_cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_rate_limit_cache(app_configs, **kwargs):
+    if getattr(settings, 'RATE_LIMIT_BACKEND', 'cache') != 'cache':
+        return []
+    if rate_limit_cache_is_shared():
+        return []
+    alias = rate_limit_cache_alias()
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return [
+        Warning(
+            f"CACHES['{alias}'] uses {backend}: the IP rate limit falls back to per-process counters.",
+            hint="Set RATE_LIMIT_CACHE_BACKEND to Redis or Memcached to share the limit between workers.",
+            id='documents.W001',
+        )
+    ]
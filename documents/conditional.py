@@ -0,0 +1,82 @@
+"""
+Conditional GET (ETag / Last-Modified) para endpoints de lectura del índice.
+
+El validador se calcula sin tocar la base de datos: generación del índice
+docrepo + ruta + parámetros de consulta + alcance del usuario. Cualquier
+ingesta, movimiento o baja incrementa la generación e invalida los ETags.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from docrepo.cache import get_index_generation, get_index_generation_timestamp
+
+
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+
+def _query_items(request):
+    params = getattr(request, 'query_params', None)
+    if params is None:
+        params = getattr(request, 'GET', {})
+    if hasattr(params, 'lists'):
+        return sorted((key, tuple(values)) for key, values in params.lists())
+    return sorted((key, str(value)) for key, value in params.items())
+
+
+def index_validators(request, scope=''):
+    generation = get_index_generation()
+    raw = '|'.join([
+        str(generation),
+        str(getattr(request, 'path', '')),
+        repr(_query_items(request)),
+        str(scope or ''),
+    ])
+    etag = 'W/"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return etag, get_index_generation_timestamp()
+
+
+def _has_preconditions(request):
+    meta = getattr(request, 'META', None) or {}
+    return bool(meta.get('HTTP_IF_NONE_MATCH') or meta.get('HTTP_IF_MODIFIED_SINCE'))
+
+
+def conditional_on_index(scope=None):
+    """
+    Decora un `get` de APIView: responde 304 si el cliente ya tiene la versión
+    vigente y, si no, agrega ETag/Last-Modified a la respuesta 200.
+
+    `scope(request)` permite separar validadores cuando la respuesta depende
+    del usuario (por ejemplo, dominios permitidos).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = index_validators(request, scope(request) if scope else '')
+
+            validator_headers = HttpResponse()
+            validator_headers['ETag'] = etag
+            validator_headers['Last-Modified'] = http_date(last_modified)
+            validator_headers['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+
+            if _has_preconditions(request):
+                conditional = get_conditional_response(
+                    request,
+                    etag=etag,
+                    last_modified=last_modified,
+                    response=validator_headers,
+                )
+                if conditional is not validator_headers:
+                    return conditional
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+                    response[header] = validator_headers[header]
+            return response
+        return wrapper
+    return decorator
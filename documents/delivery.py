@@ -0,0 +1,284 @@
+"""
+Entrega de objetos de MinIO al cliente.
+
+Modos (settings.DOWNLOAD_DELIVERY_MODE):
+- 'proxy': Django transmite los bytes (comportamiento original).
+- 'presigned': redirección 302 a una URL firmada de MinIO.
+- 'accel': cabecera X-Accel-Redirect hacia una location interna de nginx
+  que hace proxy a MinIO con la misma URL firmada.
+
+En los modos sin proxy Django solo autoriza y audita; los bytes no pasan por
+los workers de gunicorn (MinIO/nginx atienden Range por su cuenta). En modo
+proxy se respetan Range/If-Range con GET parciales a MinIO (offset/length),
+o leyendo el tramo del caché local de objetos si está activo.
+"""
+
+import re
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from minio import Minio
+
+from . import asyncstorage
+from .objectcache import object_cache_enabled, open_object
+from .utils import minio_client
+
+
+DELIVERY_MODES = {'proxy', 'presigned', 'accel'}
+PROXY_CHUNK_SIZE = 8192
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def delivery_mode():
+    mode = str(getattr(settings, 'DOWNLOAD_DELIVERY_MODE', 'proxy') or 'proxy').strip().lower()
+    return mode if mode in DELIVERY_MODES else 'proxy'
+
+
+@lru_cache(maxsize=1)
+def _public_minio_client():
+    """Cliente para firmar URLs con el host que ve el navegador (la firma incluye el host)."""
+    endpoint = str(getattr(settings, 'MINIO_PUBLIC_ENDPOINT', '') or '').strip()
+    if not endpoint:
+        return minio_client
+    return Minio(
+        endpoint=endpoint.replace('http://', '').replace('https://', ''),
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=getattr(settings, 'MINIO_PUBLIC_USE_SSL', True),
+        # Con región fija la firma no consulta la ubicación del bucket por red
+        region=settings.MINIO_REGION or 'us-east-1',
+    )
+
+
+def parse_range_header(header, size):
+    """
+    Devuelve (inicio, fin) inclusivo para un único rango `bytes=`. None si la
+    cabecera no aplica (sintaxis inválida o varios rangos: se sirve completo).
+    """
+    match = _RANGE_RE.match((header or '').replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Sufijo: los últimos N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - suffix), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _file_chunks(handle, start, length):
+    try:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(PROXY_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def _content_disposition(filename):
+    return f'attachment; filename="{filename}"'
+
+
+class ObjectDelivery:
+    """
+    Uso: `delivery = ObjectDelivery(key).open()` (lanza excepción si el objeto
+    no existe), registrar auditoría y luego `return delivery.response(nombre)`.
+    """
+
+    def __init__(self, object_key, content_type='application/pdf', mode=None, request=None):
+        self.object_key = object_key
+        self.content_type = content_type
+        self.mode = mode or delivery_mode()
+        self.meta = getattr(request, 'META', None) or {}
+        self.size = None
+        self.etag = ''
+        self.last_modified = None
+        self.byte_range = None
+        self.unsatisfiable = False
+        self._stream = None
+        self._file = None
+
+    def open(self):
+        if self.mode != 'proxy':
+            minio_client.stat_object(settings.MINIO_BUCKET, self.object_key)
+            return self
+
+        range_header = self.meta.get('HTTP_RANGE', '')
+        use_cache = object_cache_enabled()
+        if not range_header and not use_cache:
+            self._stream = minio_client.get_object(settings.MINIO_BUCKET, self.object_key)
+            headers = getattr(self._stream, 'headers', None) or {}
+            if headers.get('Content-Length', '').isdigit():
+                self.size = int(headers['Content-Length'])
+            self.etag = (headers.get('ETag') or '').strip('"')
+            self.last_modified = parse_http_date_safe(headers.get('Last-Modified') or '')
+            return self
+
+        # Con Range (o caché local) hace falta el tamaño y el ETag antes de leer
+        stat = minio_client.stat_object(settings.MINIO_BUCKET, self.object_key)
+        self.size = int(stat.size)
+        self.etag = (stat.etag or '').strip('"')
+        if stat.last_modified is not None:
+            self.last_modified = int(stat.last_modified.timestamp())
+
+        if range_header and self._if_range_matches(self.meta.get('HTTP_IF_RANGE', '')):
+            try:
+                self.byte_range = parse_range_header(range_header, self.size)
+            except RangeNotSatisfiable:
+                self.unsatisfiable = True
+                return self
+
+        if use_cache:
+            self._file = open_object(self.object_key, etag=self.etag)
+        elif self.byte_range is None:
+            self._stream = minio_client.get_object(settings.MINIO_BUCKET, self.object_key)
+        else:
+            start, end = self.byte_range
+            self._stream = minio_client.get_object(
+                settings.MINIO_BUCKET, self.object_key, offset=start, length=end - start + 1,
+            )
+        return self
+
+    @property
+    def counts_as_download(self):
+        """Un 416 no entrega nada; de las peticiones con Range solo cuenta la que empieza en 0."""
+        if self.unsatisfiable:
+            return False
+        return self.byte_range is None or self.byte_range[0] == 0
+
+    @property
+    def content_range(self):
+        if self.byte_range is None:
+            return ''
+        start, end = self.byte_range
+        return f'bytes {start}-{end}/{self.size}'
+
+    def _if_range_matches(self, if_range):
+        """Sin If-Range siempre aplica; con ETag (comparación fuerte) o fecha debe coincidir exactamente."""
+        if_range = (if_range or '').strip()
+        if not if_range:
+            return True
+        if if_range.startswith('W/'):
+            return False
+        if if_range.startswith('"'):
+            return bool(self.etag) and if_range.strip('"') == self.etag
+        if_range_date = parse_http_date_safe(if_range)
+        return if_range_date is not None and if_range_date == self.last_modified
+
+    def _validator_headers(self, response):
+        response['Accept-Ranges'] = 'bytes'
+        if self.etag:
+            response['ETag'] = f'"{self.etag}"'
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+    def _presigned_url(self, client, filename):
+        ttl = int(getattr(settings, 'DOWNLOAD_PRESIGNED_TTL_SECONDS', 300))
+        return client.presigned_get_object(
+            settings.MINIO_BUCKET,
+            self.object_key,
+            expires=timedelta(seconds=ttl),
+            response_headers={
+                'response-content-disposition': _content_disposition(filename),
+                'response-content-type': self.content_type,
+            },
+        )
+
+    def _body(self):
+        if self._file is None:
+            return self._stream.stream(amt=PROXY_CHUNK_SIZE)
+        start, end = self.byte_range or (0, self.size - 1)
+        return _file_chunks(self._file, start, end - start + 1)
+
+    def response(self, filename):
+        if self.mode == 'presigned':
+            return HttpResponseRedirect(self._presigned_url(_public_minio_client(), filename))
+
+        if self.mode == 'accel':
+            signed = urlsplit(self._presigned_url(minio_client, filename))
+            prefix = str(getattr(settings, 'DOWNLOAD_ACCEL_PREFIX', '/_minio_internal')).rstrip('/')
+            response = HttpResponse(content_type=self.content_type)
+            response['X-Accel-Redirect'] = f"{prefix}{signed.path}?{signed.query}"
+            response['Content-Disposition'] = _content_disposition(filename)
+            return response
+
+        if self.unsatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{self.size}'
+            return self._validator_headers(response)
+
+        response = StreamingHttpResponse(
+            self._body(),
+            content_type=self.content_type,
+            headers={'Content-Disposition': _content_disposition(filename)},
+        )
+        if self.byte_range is not None:
+            start, end = self.byte_range
+            response.status_code = 206
+            response['Content-Range'] = self.content_range
+            response['Content-Length'] = str(end - start + 1)
+        elif self.size is not None:
+            response['Content-Length'] = str(self.size)
+        return self._validator_headers(response)
+
+
+class AsyncObjectDelivery(ObjectDelivery):
+    """
+    Variante para vistas async: `await delivery.aopen()`. En modo proxy el
+    objeto se lee con el cliente S3 asíncrono (incluido Range); los modos sin
+    proxy solo firman URLs y reutilizan la ruta sync en un hilo.
+    """
+
+    async def aopen(self):
+        if self.mode != 'proxy':
+            await sync_to_async(super().open, thread_sensitive=False)()
+            return self
+
+        stat = await asyncstorage.stat_object(self.object_key)
+        self.size = stat['size']
+        self.etag = stat['etag']
+        self.last_modified = stat['last_modified']
+
+        range_header = self.meta.get('HTTP_RANGE', '')
+        if range_header and self._if_range_matches(self.meta.get('HTTP_IF_RANGE', '')):
+            try:
+                self.byte_range = parse_range_header(range_header, self.size)
+            except RangeNotSatisfiable:
+                self.unsatisfiable = True
+        return self
+
+    async def aresponse(self, filename):
+        if self.mode != 'proxy':
+            # Firmar la URL puede consultar la región del bucket por red
+            return await sync_to_async(super().response, thread_sensitive=False)(filename)
+        return self.response(filename)
+
+    def _body(self):
+        start, end = self.byte_range or (0, self.size - 1)
+        return asyncstorage.iter_object(self.object_key, offset=start, length=end - start + 1)
@@ -0,0 +1,88 @@
+"""
+Registro de descargas por lotes.
+
+Una petición acumula sus filas de DownloadLog (y cualquier escritura de
+auditoría asociada) y las escribe juntas con un solo bulk_create cuando
+termina la respuesta: al cerrarse el stream en las respuestas streaming, o de
+inmediato en las demás. Así el bucle de transferencia no hace un INSERT por
+archivo.
+"""
+
+import logging
+
+from .models import DownloadLog
+
+
+logger = logging.getLogger(__name__)
+
+
+class _FlushOnClose:
+    """Iterable para streaming_content: Django llama a close() al terminar (o cortarse) el envío."""
+
+    def __init__(self, iterable, on_close):
+        self._iterable = iterable
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        self._on_close()
+
+
+class _AsyncFlushOnClose(_FlushOnClose):
+    """Igual que _FlushOnClose para streaming_content asíncrono (ASGI llama a close() en un hilo)."""
+
+    __iter__ = None
+
+    def __aiter__(self):
+        return self._iterable.__aiter__()
+
+
+class DownloadLogBatch:
+    def __init__(self, request):
+        user = getattr(request, 'user', None)
+        self.user = user if getattr(user, 'is_authenticated', False) else None
+        self.ip_address = (getattr(request, 'META', None) or {}).get('REMOTE_ADDR') or None
+        self._entries = []
+        self._deferred = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, filename):
+        """`filename` puede ser un callable: se resuelve al escribir (p. ej. con el conteo final de un ZIP)."""
+        self._entries.append(filename)
+
+    def defer(self, callback):
+        """Ejecuta `callback` (p. ej. record_audit_event) en el mismo momento que el lote."""
+        self._deferred.append(callback)
+
+    def flush(self):
+        """Escribe lo pendiente; es idempotente y nunca interrumpe la descarga."""
+        filenames, self._entries = self._entries, []
+        deferred, self._deferred = self._deferred, []
+        entries = [
+            DownloadLog(user=self.user, filename=filename() if callable(filename) else filename, ip_address=self.ip_address)
+            for filename in filenames
+        ]
+        if entries:
+            try:
+                DownloadLog.objects.bulk_create(entries)
+            except Exception as e:
+                logger.warning(f"No se pudo registrar {len(entries)} descargas: {e}")
+        for callback in deferred:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Fallo una escritura diferida de descarga: {e}")
+        return len(entries)
+
+    def attach(self, response):
+        """Programa el flush para cuando termine `response` y la devuelve."""
+        if getattr(response, 'streaming', False):
+            wrapper = _AsyncFlushOnClose if getattr(response, 'is_async', False) else _FlushOnClose
+            response.streaming_content = wrapper(response.streaming_content, self.flush)
+        else:
+            self.flush()
+        return response
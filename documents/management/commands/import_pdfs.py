@@ -0,0 +1,217 @@
+import csv
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auditlog.services import record_audit_event
+from docrepo.cache import STORAGE_CHANGED, emit_invalidation_event
+from documents.bulkimport import (
+    STATUS_DUPLICATE,
+    STATUS_ERROR,
+    STATUS_IMPORTED,
+    ImportCheckpoint,
+    analyze_entry,
+    existing_hashes,
+    existing_object_keys,
+    ingest_batch,
+    open_source,
+    put_entry,
+)
+from documents.workers import pdf_worker_processes, upload_workers
+
+
+class Command(BaseCommand):
+    help = 'Import PDFs from a local directory or ZIP archive into MinIO and the document index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or .zip file with the PDFs')
+        parser.add_argument('--folder', default='', help='Store every file under this MinIO folder instead of the inferred path')
+        parser.add_argument('--year', default='', help='Metadata hint: año')
+        parser.add_argument('--month', default='', help='Metadata hint: mes')
+        parser.add_argument('--company', default='', help='Metadata hint: razón social')
+        parser.add_argument('--bank', default='', help='Metadata hint: banco')
+        parser.add_argument('--tipo', default='', help='Metadata hint: tipo de documento')
+        parser.add_argument('--processes', type=int, default=None, help='Processes analyzing PDFs (default: PDF_WORKER_PROCESSES, 0 = in this process)')
+        parser.add_argument('--upload-workers', type=int, default=None, help='Concurrent MinIO uploads (default: UPLOAD_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Files analyzed, uploaded and committed per batch')
+        parser.add_argument('--checkpoint', default='', help='Checkpoint file (default: <source>.import.jsonl)')
+        parser.add_argument('--retry-errors', action='store_true', help='Retry files that failed in a previous run')
+        parser.add_argument('--dry-run', action='store_true', help='Analyze and report only; nothing is uploaded or indexed')
+        parser.add_argument('--report', default='', help='Write a CSV with the outcome of every file')
+
+    def handle(self, *args, **options):
+        source_path = os.path.abspath(options['source'])
+        try:
+            source = open_source(source_path)
+        except (ValueError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        dry_run = options['dry_run']
+        folder = options['folder'].strip().strip('/')
+        hints = {
+            'año': options['year'],
+            'mes': options['month'],
+            'razon_social': options['company'],
+            'banco': options['bank'],
+            'tipo_documento': options['tipo'],
+        }
+        processes = pdf_worker_processes() if options['processes'] is None else max(0, options['processes'])
+        workers = upload_workers() if options['upload_workers'] is None else max(1, options['upload_workers'])
+        batch_size = max(1, options['batch_size'])
+
+        # El dry-run no deja checkpoint: un import posterior debe procesarlo todo
+        checkpoint = None
+        if not dry_run:
+            checkpoint = ImportCheckpoint(options['checkpoint'] or f'{source_path}.import.jsonl')
+
+        names = source.names()
+        pending = [name for name in names if checkpoint is None or not checkpoint.is_done(name, options['retry_errors'])]
+        self.stdout.write(self.style.NOTICE(f'Importing PDFs from {source_path} (dry-run: {dry_run})'))
+        self.stdout.write(f'PDFs found: {len(names)}, already done: {len(names) - len(pending)}, pending: {len(pending)}')
+
+        started = time.monotonic()
+        statuses = Counter()
+        domains = Counter()
+        total_bytes = 0
+        report_rows = []
+        seen_hashes = {}
+
+        analyzer = ProcessPoolExecutor(max_workers=processes) if processes > 0 else None
+        uploader = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for offset in range(0, len(pending), batch_size):
+                batch = pending[offset:offset + batch_size]
+                records = []
+
+                entries = []
+                for name, result in zip(batch, self._analyze(analyzer, source_path, batch, folder, hints)):
+                    if isinstance(result, Exception):
+                        records.append(self._record(name, STATUS_ERROR, error=f'No se pudo leer el PDF: {result}'))
+                    else:
+                        entries.append(result)
+
+                known = existing_hashes({entry.sha256 for entry in entries})
+                taken = existing_object_keys({entry.object_key for entry in entries})
+                to_store = []
+                for entry in entries:
+                    duplicate_of = known.get(entry.sha256) or seen_hashes.get(entry.sha256)
+                    if duplicate_of:
+                        records.append(self._record(entry.name, STATUS_DUPLICATE, entry, duplicate_of=duplicate_of))
+                    elif entry.object_key in taken:
+                        records.append(self._record(entry.name, STATUS_ERROR, entry, error='La ruta destino ya existe con otro contenido'))
+                    else:
+                        seen_hashes[entry.sha256] = entry.object_key
+                        taken.add(entry.object_key)
+                        to_store.append(entry)
+
+                if dry_run:
+                    records.extend(self._record(entry.name, STATUS_IMPORTED, entry) for entry in to_store)
+                else:
+                    stored = []
+                    futures = [(entry, uploader.submit(put_entry, source_path, entry)) for entry in to_store]
+                    for entry, future in futures:
+                        try:
+                            stored.append((entry, future.result()))
+                        except Exception as exc:
+                            records.append(self._record(entry.name, STATUS_ERROR, entry, error=f'Error subiendo a MinIO: {exc}'))
+
+                    failed = ingest_batch(stored) if stored else {}
+                    for entry, _stat in stored:
+                        if entry.name in failed:
+                            records.append(self._record(entry.name, STATUS_ERROR, entry, error=failed[entry.name]))
+                        else:
+                            records.append(self._record(entry.name, STATUS_IMPORTED, entry))
+                    if len(stored) > len(failed):
+                        emit_invalidation_event(STORAGE_CHANGED)
+                    checkpoint.record(records)
+
+                for record in records:
+                    statuses[record['status']] += 1
+                    if record['status'] == STATUS_IMPORTED:
+                        domains[record['domain_code'] or 'GENERAL'] += 1
+                        total_bytes += record['size']
+                    elif record['status'] == STATUS_ERROR:
+                        self.stderr.write(f"{record['name']}: {record['error']}")
+                report_rows.extend(records)
+                self.stdout.write(f'Processed {min(offset + batch_size, len(pending))}/{len(pending)}')
+        finally:
+            uploader.shutdown()
+            if analyzer is not None:
+                analyzer.shutdown()
+
+        elapsed = round(time.monotonic() - started, 2)
+        summary = {
+            'source': source_path,
+            'dry_run': dry_run,
+            'found': len(names),
+            'skipped_checkpoint': len(names) - len(pending),
+            'imported': statuses[STATUS_IMPORTED],
+            'duplicates': statuses[STATUS_DUPLICATE],
+            'errors': statuses[STATUS_ERROR],
+            'bytes': total_bytes,
+            'domains': dict(domains),
+            'time_seconds': elapsed,
+        }
+
+        if options['report']:
+            self._write_report(options['report'], report_rows)
+
+        imported_label = 'Would import' if dry_run else 'Imported'
+        self.stdout.write(self.style.SUCCESS('PDF import completed' if not dry_run else 'PDF import dry-run completed'))
+        self.stdout.write(f'{imported_label}: {summary["imported"]} ({total_bytes} bytes)')
+        for domain_code, count in sorted(domains.items()):
+            self.stdout.write(f'  {domain_code}: {count}')
+        self.stdout.write(f'Duplicates: {summary["duplicates"]}')
+        self.stdout.write(f'Errors: {summary["errors"]}')
+        self.stdout.write(f'Time: {elapsed}s')
+
+        if not dry_run and pending:
+            record_audit_event(
+                action='FILE_BULK_IMPORTED',
+                resource_type='file',
+                resource_id=os.path.basename(source_path),
+                metadata=summary,
+            )
+
+    def _analyze(self, analyzer, source_path, batch, folder, hints):
+        """Resultados en el orden del lote; un PDF ilegible devuelve su excepción en vez de cortar el lote."""
+        if analyzer is None:
+            results = []
+            for name in batch:
+                try:
+                    results.append(analyze_entry(source_path, name, folder, hints))
+                except Exception as exc:
+                    results.append(exc)
+            return results
+
+        futures = [analyzer.submit(analyze_entry, source_path, name, folder, hints) for name in batch]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def _record(self, name, status, entry=None, error='', duplicate_of=''):
+        return {
+            'name': name,
+            'status': status,
+            'object_key': entry.object_key if entry else '',
+            'domain_code': entry.domain_code if entry else '',
+            'size': entry.size if entry else 0,
+            'sha256': entry.sha256 if entry else '',
+            'duplicate_of': duplicate_of,
+            'error': error,
+        }
+
+    def _write_report(self, path, rows):
+        fields = ['name', 'status', 'object_key', 'domain_code', 'size', 'sha256', 'duplicate_of', 'error']
+        with open(path, 'w', encoding='utf-8', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        self.stdout.write(f'Report written to {path}')
@@ -0,0 +1,149 @@
+"""
+Caché en disco de resultados de fusión (PDF combinado o ZIP).
+
+La clave es un digest de la lista ORDENADA de (object_key, etag) más el
+formato de salida: si cualquier objeto cambia en MinIO cambia su ETag y con
+él la clave. Solo se guardan resultados completos (sin errores). Cada entrada
+vence MERGE_CACHE_TTL_SECONDS después de creada y el directorio se mantiene
+bajo MERGE_CACHE_MAX_BYTES borrando las entradas más antiguas.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+
+from .objectcache import evict_directory
+from .utils import minio_client
+from .zipstream import prefetch_objects
+
+
+logger = logging.getLogger(__name__)
+
+MERGE_CACHE_FORMATS = ('pdf', 'zip')
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+def merge_cache_max_bytes():
+    return max(0, int(getattr(settings, 'MERGE_CACHE_MAX_BYTES', 0) or 0))
+
+
+def merge_cache_enabled():
+    return merge_cache_max_bytes() > 0
+
+
+def merge_cache_ttl():
+    return int(getattr(settings, 'MERGE_CACHE_TTL_SECONDS', 600))
+
+
+def merge_cache_dir():
+    directory = getattr(settings, 'MERGE_CACHE_DIR', None) or os.path.join(tempfile.gettempdir(), 'pdf_merge_cache')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _entry_path(cache_key, output_format):
+    return os.path.join(merge_cache_dir(), f"{cache_key}.{output_format}")
+
+
+def _stat_etag(object_key):
+    return (minio_client.stat_object(settings.MINIO_BUCKET, object_key).etag or '').strip('"')
+
+
+def object_versions(paths):
+    """ETag actual de cada path (stat en paralelo). None si alguno no existe: ese resultado no se cachea."""
+    etags = {}
+    for path, etag, error in prefetch_objects(((path, path) for path in paths), fetch=_stat_etag):
+        if error is not None:
+            return None
+        etags[path] = etag
+    return etags
+
+
+def merge_cache_key(paths, etags, output_format):
+    raw = json.dumps([output_format, [[path, etags[path]] for path in paths]], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def open_cached_merge(cache_key, output_format):
+    """Archivo abierto con el resultado cacheado, o None si no existe o venció."""
+    entry_path = _entry_path(cache_key, output_format)
+    try:
+        handle = open(entry_path, 'rb')
+    except FileNotFoundError:
+        return None
+
+    if time.time() - os.fstat(handle.fileno()).st_mtime > merge_cache_ttl():
+        handle.close()
+        try:
+            os.unlink(entry_path)
+        except FileNotFoundError:
+            pass
+        return None
+    return handle
+
+
+def _publish(tmp_path, cache_key, output_format):
+    if os.path.getsize(tmp_path) > merge_cache_max_bytes():
+        os.unlink(tmp_path)
+        return
+    os.replace(tmp_path, _entry_path(cache_key, output_format))
+    evict_directory(merge_cache_dir(), merge_cache_max_bytes(), suffixes=tuple(f'.{fmt}' for fmt in MERGE_CACHE_FORMATS))
+
+
+def store_merge_result(cache_key, output_format, handle):
+    """Copia `handle` (resultado recién generado) al caché y lo deja de nuevo al inicio."""
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=merge_cache_dir())
+    try:
+        with os.fdopen(fd, 'wb') as tmp_handle:
+            handle.seek(0)
+            shutil.copyfileobj(handle, tmp_handle, COPY_CHUNK_SIZE)
+        _publish(tmp_path, cache_key, output_format)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el merge en caché: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    finally:
+        handle.seek(0)
+
+
+def tee_to_merge_cache(cache_key, output_format, chunks, is_complete):
+    """
+    Reenvía `chunks` y en paralelo los escribe a un temporal del caché; si el
+    stream termina y `is_complete()` es verdadero, el temporal se publica.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=merge_cache_dir())
+    published = False
+    try:
+        with os.fdopen(fd, 'wb') as tmp_handle:
+            for chunk in chunks:
+                tmp_handle.write(chunk)
+                yield chunk
+        if is_complete():
+            _publish(tmp_path, cache_key, output_format)
+            published = True
+    finally:
+        if not published and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+async def atee_to_merge_cache(cache_key, output_format, chunks, is_complete):
+    """Versión async de tee_to_merge_cache para las vistas ASGI."""
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=merge_cache_dir())
+    published = False
+    try:
+        with os.fdopen(fd, 'wb') as tmp_handle:
+            async for chunk in chunks:
+                tmp_handle.write(chunk)
+                yield chunk
+        if is_complete():
+            _publish(tmp_path, cache_key, output_format)
+            published = True
+    finally:
+        if not published and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
@@ -1,13 +1,13 @@
 import logging
 import re
-import threading
-import time
 import uuid
 
 from django.conf import settings
 from django.http import HttpResponseNotFound, JsonResponse
+from django.utils.deprecation import MiddlewareMixin
 
 from auditlog.services import record_audit_event
+from .ratelimit import get_rate_limit_backend
 
 
 logger = logging.getLogger(__name__)
@@ -16,15 +16,18 @@ logger = logging.getLogger(__name__)
 RATE_LIMITS = {
     'auth': {'requests': 5, 'window': 60, 'block_time': 1800},
     'upload': {'requests': 20, 'window': 60, 'block_time': 180},
+    'upload_chunk': {'requests': 600, 'window': 60, 'block_time': 60},
     'api': {'requests': 200, 'window': 60, 'block_time': 60},
 }
 
 
-_RATE_STATE = {
-    'hits': {},
-    'blocked': {},
-}
-_RATE_LOCK = threading.Lock()
+def _scope_limits(scope):
+    """Límites del scope; settings.RATE_LIMITS los sobrescribe (requests=0 desactiva el scope)."""
+    overrides = getattr(settings, 'RATE_LIMITS', None) or {}
+    cfg = overrides.get(scope, RATE_LIMITS.get(scope))
+    if not cfg or cfg.get('requests', 0) <= 0:
+        return None
+    return cfg
 
 
 def get_client_ip(request):
@@ -59,50 +62,38 @@ def _classify_scope(path):
     for auth_path in _build_auth_patterns():
         if path.startswith(auth_path):
             return 'auth'
-    if path.startswith('/api/files/upload'):
+    if path.startswith('/api/files/resumable/') and path != '/api/files/resumable/finalize':
+        return 'upload_chunk'
+    if path.startswith('/api/files/upload') or path.startswith('/api/files/resumable'):
         return 'upload'
     if path.startswith('/api/'):
         return 'api'
     return None
 
 
-class IPRateLimitMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+# Los middlewares usan MiddlewareMixin para ser sync y async: así las vistas
+# async de descarga no obligan a Django a cambiar de hilo en cada capa.
+
 
-    def __call__(self, request):
+class IPRateLimitMiddleware(MiddlewareMixin):
+    def process_request(self, request):
         scope = _classify_scope(request.path)
         if not scope:
-            return self.get_response(request)
+            return None
+
+        # Scope sin límite: no toca el backend
+        cfg = _scope_limits(scope)
+        if cfg is None:
+            return None
 
         ip = get_client_ip(request)
         if not ip:
-            return self.get_response(request)
-
-        now = int(time.time())
-        cfg = RATE_LIMITS[scope]
-        bucket = f'{scope}:{ip}'
-
-        with _RATE_LOCK:
-            blocked_until = _RATE_STATE['blocked'].get(bucket, 0)
-            if blocked_until > now:
-                retry_after = blocked_until - now
-                return self._rate_limited_response(request, retry_after)
-
-            data = _RATE_STATE['hits'].get(bucket)
-            if not data or now - data['start'] >= cfg['window']:
-                data = {'count': 0, 'start': now}
+            return None
 
-            data['count'] += 1
-            _RATE_STATE['hits'][bucket] = data
-
-            if data['count'] > cfg['requests']:
-                blocked_until = now + cfg['block_time']
-                _RATE_STATE['blocked'][bucket] = blocked_until
-                retry_after = cfg['block_time']
-                return self._rate_limited_response(request, retry_after)
-
-        return self.get_response(request)
+        retry_after = get_rate_limit_backend().hit(f'{scope}:{ip}', cfg)
+        if retry_after:
+            return self._rate_limited_response(request, retry_after)
+        return None
 
     def _rate_limited_response(self, request, retry_after):
         payload = {
@@ -117,22 +108,19 @@ class IPRateLimitMiddleware:
         return response
 
 
-class AdminIPRestrictionMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+class AdminIPRestrictionMiddleware(MiddlewareMixin):
+    def process_request(self, request):
         admin_prefix = _admin_path_prefix()
         if not request.path.startswith(admin_prefix):
-            return self.get_response(request)
+            return None
 
         allowed_ips = getattr(settings, 'ADMIN_ALLOWED_IPS', [])
         if not allowed_ips:
-            return self.get_response(request)
+            return None
 
         client_ip = get_client_ip(request)
         if client_ip in allowed_ips:
-            return self.get_response(request)
+            return None
 
         logger.warning(
             'Admin access denied by IP restriction',
@@ -141,19 +129,34 @@ class AdminIPRestrictionMiddleware:
         return HttpResponseNotFound('Not Found')
 
 
-class RequestSanitizationMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-        self.patterns = [
-            re.compile(r'<\s*script', re.IGNORECASE),
-            re.compile(r'javascript\s*:', re.IGNORECASE),
-            re.compile(r'\bunion\s+select\b', re.IGNORECASE),
-            re.compile(r'\bor\s+1\s*=\s*1\b', re.IGNORECASE),
-            re.compile(r'--'),
-            re.compile(r';\s*drop\s+table', re.IGNORECASE),
-        ]
+# Una sola pasada por valor: las alternativas de patrones sospechosos en una regex
+SUSPICIOUS_INPUT_PATTERN = re.compile(
+    r'<\s*script'
+    r'|javascript\s*:'
+    r'|\bunion\s+select\b'
+    r'|\bor\s+1\s*=\s*1\b'
+    r'|--'
+    r'|;\s*drop\s+table',
+    re.IGNORECASE,
+)
+
+FORM_CONTENT_TYPES = {'multipart/form-data', 'application/x-www-form-urlencoded'}
 
-    def __call__(self, request):
+
+def _is_text_content_type(content_type):
+    return content_type == 'application/json' or content_type.endswith('+json') or content_type.startswith('text/')
+
+
+class RequestSanitizationMiddleware(MiddlewareMixin):
+    """
+    Rechaza entradas con patrones típicos de XSS/SQLi. Se inspeccionan ruta,
+    query string, campos de formulario y cuerpos JSON/texto de hasta
+    SANITIZATION_MAX_BODY_BYTES. Las partes de archivo de un multipart y los
+    cuerpos binarios (tramos de subidas, PDFs) no se leen aquí: quedan para
+    los upload handlers sin cargarse enteros en memoria.
+    """
+
+    def process_request(self, request):
         if self._contains_suspicious_input(request):
             return JsonResponse(
                 {
@@ -164,37 +167,44 @@ class RequestSanitizationMiddleware:
                 },
                 status=400,
             )
-        return self.get_response(request)
+        return None
 
     def _contains_suspicious_input(self, request):
-        values = []
-        values.extend(request.GET.values())
-        values.extend(request.POST.values())
-        values.append(request.path)
-
-        try:
-            body = request.body.decode('utf-8', errors='ignore')
-            if body:
-                values.append(body)
-        except Exception:
-            pass
-
-        for value in values:
-            if not isinstance(value, str):
-                continue
-            for pattern in self.patterns:
-                if pattern.search(value):
-                    return True
+        for value in self._inspected_values(request):
+            if isinstance(value, str) and SUSPICIOUS_INPUT_PATTERN.search(value):
+                return True
         return False
 
+    def _inspected_values(self, request):
+        yield request.path
+        for _key, values in request.GET.lists():
+            yield from values
 
-class AuditLoggingMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+        content_type = (request.content_type or '').lower()
+        if content_type in FORM_CONTENT_TYPES:
+            # Los archivos quedan en request.FILES; solo se recorren los campos
+            for _key, values in request.POST.lists():
+                yield from values
+            return
 
-    def __call__(self, request):
+        if not _is_text_content_type(content_type):
+            return
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return
+        if 0 < length <= int(getattr(settings, 'SANITIZATION_MAX_BODY_BYTES', 64 * 1024)):
+            try:
+                yield request.body.decode('utf-8', errors='ignore')
+            except Exception:
+                pass
+
+
+class AuditLoggingMiddleware(MiddlewareMixin):
+    def process_request(self, request):
         request.correlation_id = self._resolve_correlation_id(request)
-        response = self.get_response(request)
+
+    def process_response(self, request, response):
         response['X-Correlation-ID'] = str(request.correlation_id)
 
         if request.method not in {'POST', 'PUT', 'PATCH', 'DELETE'}:
@@ -252,13 +262,8 @@ class AuditLoggingMiddleware:
         return path.startswith('/api/auth/login/') or path.startswith('/api/auth/logout/')
 
 
-class SecurityHeadersMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
-
+class SecurityHeadersMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
         response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
         response['Permissions-Policy'] = (
             'accelerometer=(), '
@@ -297,7 +302,7 @@ class SecurityHeadersMiddleware:
             f"script-src {script_src}",
             "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.jsdelivr.net",
             "font-src 'self' https://fonts.gstatic.com https://cdn.jsdelivr.net",
-            "img-src 'self' data:",
+            "img-src 'self' data: blob:",
             "connect-src 'self'",
             "frame-src 'self'",
             "frame-ancestors 'self'",
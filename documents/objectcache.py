@@ -0,0 +1,319 @@
+"""
+Caché local en disco (LRU) para objetos de MinIO.
+
+Cada entrada es un archivo `sha256(object_key|etag).pdf` dentro de
+OBJECT_CACHE_DIR: si el objeto cambia en MinIO cambia su ETag y la entrada
+vieja simplemente deja de usarse hasta que la expulsa el LRU.
+
+Seguro entre procesos (workers de gunicorn):
+- las descargas se escriben en un temporal y se publican con os.replace (atómico);
+- los lectores reciben un archivo ya abierto, así que una expulsión concurrente
+  (unlink) no les corta la lectura;
+- la expulsión toma un flock no bloqueante: si otro proceso ya está limpiando, se omite.
+
+El LRU usa el mtime (se actualiza en cada acierto) porque atime no es fiable
+con montajes noatime. Aciertos, fallos y bytes en disco se llevan en
+`.counters` dentro del directorio, actualizado bajo flock (atómico entre
+procesos): la expulsión solo recorre el directorio cuando ese total supera el
+presupuesto, y al terminar lo corrige con lo que realmente quedó.
+
+Los llamadores que conocen el ETag (StorageObject, PDFIndex, listados) lo
+pasan y un acierto no toca MinIO. Sin ETag se usa el último visto para esa
+clave durante OBJECT_CACHE_ETAG_TTL_SECONDS y solo después un stat_object.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .utils import minio_client
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK_SIZE = 256 * 1024
+ENTRY_SUFFIX = '.pdf'
+COUNTERS_NAME = '.counters'
+# aciertos, fallos, bytes en disco
+_COUNTERS = struct.Struct('<qqq')
+
+# object_key -> (etag, vence): último ETag visto, por proceso
+_known_etags = {}
+_known_etags_lock = threading.Lock()
+
+
+def object_cache_max_bytes():
+    return max(0, int(getattr(settings, 'OBJECT_CACHE_MAX_BYTES', 0) or 0))
+
+
+def object_cache_enabled():
+    return object_cache_max_bytes() > 0
+
+
+def object_cache_dir():
+    directory = getattr(settings, 'OBJECT_CACHE_DIR', None) or os.path.join(tempfile.gettempdir(), 'pdf_object_cache')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _max_entry_bytes():
+    # Un objeto enorme no debe vaciar todo el caché de un golpe
+    return int(getattr(settings, 'OBJECT_CACHE_MAX_ENTRY_BYTES', 0) or object_cache_max_bytes() // 4)
+
+
+def _entry_path(object_key, etag):
+    digest = hashlib.sha256(f"{object_key}|{etag}".encode('utf-8')).hexdigest()
+    return os.path.join(object_cache_dir(), digest + ENTRY_SUFFIX)
+
+
+def _clean_etag(etag):
+    return (etag or '').strip().strip('"')
+
+
+def _etag_ttl():
+    return max(0, int(getattr(settings, 'OBJECT_CACHE_ETAG_TTL_SECONDS', 30)))
+
+
+def _remember_etag(object_key, etag):
+    if etag and _etag_ttl():
+        with _known_etags_lock:
+            if len(_known_etags) >= 10000:
+                _known_etags.clear()
+            _known_etags[object_key] = (etag, time.monotonic() + _etag_ttl())
+
+
+def _recent_etag(object_key):
+    known = _known_etags.get(object_key)
+    if known is not None and known[1] > time.monotonic():
+        return known[0]
+    return ''
+
+
+def _update_counters(hits=0, misses=0, size_bytes=0, reset_size=None):
+    """
+    Suma a los contadores de `.counters` bajo flock y devuelve (aciertos, fallos, bytes).
+    Si el archivo no existía, los bytes parten de lo que hay en disco.
+    """
+    path = os.path.join(object_cache_dir(), COUNTERS_NAME)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        raw = os.pread(fd, _COUNTERS.size, 0)
+        if len(raw) == _COUNTERS.size:
+            current_hits, current_misses, current_size = _COUNTERS.unpack(raw)
+        else:
+            current_hits, current_misses = 0, 0
+            current_size = sum(size for _, size, _ in _entries(object_cache_dir()))
+        current_size = reset_size if reset_size is not None else max(0, current_size + size_bytes)
+        counters = (current_hits + hits, current_misses + misses, current_size)
+        os.pwrite(fd, _COUNTERS.pack(*counters), 0)
+        return counters
+    finally:
+        os.close(fd)
+
+
+def _record(hits=0, misses=0, size_bytes=0):
+    try:
+        return _update_counters(hits=hits, misses=misses, size_bytes=size_bytes)
+    except OSError as e:
+        logger.warning(f"No se pudieron actualizar los contadores del caché de objetos: {e}")
+        return None
+
+
+def _stream_into(object_key, handle):
+    """Copia el objeto de MinIO por bloques en `handle`. Devuelve el ETag servido."""
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_key)
+    try:
+        for chunk in response.stream(FETCH_CHUNK_SIZE):
+            handle.write(chunk)
+        headers = getattr(response, 'headers', None) or {}
+        return _clean_etag(headers.get('ETag'))
+    finally:
+        try:
+            response.close()
+            response.release_conn()
+        except Exception:
+            pass
+
+
+def open_object(object_key, etag=None):
+    """
+    Devuelve el objeto como archivo binario abierto (posición 0), leyendo del
+    caché local o descargándolo de MinIO. Sin `etag` se usa el último visto
+    para la clave y, si no hay, se consulta con stat_object. Con el caché
+    desactivado devuelve un temporal anónimo.
+    """
+    if not object_cache_enabled():
+        handle = tempfile.TemporaryFile()
+        try:
+            _stream_into(object_key, handle)
+        except Exception:
+            handle.close()
+            raise
+        handle.seek(0)
+        return handle
+
+    etag = _clean_etag(etag) or _recent_etag(object_key)
+    if not etag:
+        etag = _clean_etag(minio_client.stat_object(settings.MINIO_BUCKET, object_key).etag)
+    _remember_etag(object_key, etag)
+
+    if etag:
+        entry_path = _entry_path(object_key, etag)
+        try:
+            handle = open(entry_path, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.utime(entry_path)
+            except OSError:
+                pass
+            _record(hits=1)
+            return handle
+
+    _record(misses=1)
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=object_cache_dir())
+    try:
+        with os.fdopen(fd, 'wb') as tmp_handle:
+            served_etag = _stream_into(object_key, tmp_handle)
+        handle = open(tmp_path, 'rb')
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    # Se indexa por el ETag que devolvió MinIO: un etag desactualizado del
+    # llamador nunca queda asociado a otro contenido.
+    served_etag = served_etag or etag
+    size = os.fstat(handle.fileno()).st_size
+    if served_etag and size <= _max_entry_bytes():
+        os.replace(tmp_path, _entry_path(object_key, served_etag))
+        _remember_etag(object_key, served_etag)
+        counters = _record(size_bytes=size)
+        if counters is None or counters[2] > object_cache_max_bytes():
+            evict()
+    else:
+        os.unlink(tmp_path)
+    return handle
+
+
+def write_object_to(object_key, handle, etag=None):
+    """Escribe el objeto en `handle` (archivo abierto en 'wb'), desde el caché si está activo."""
+    if not object_cache_enabled():
+        _stream_into(object_key, handle)
+        return
+    with open_object(object_key, etag=etag) as source:
+        shutil.copyfileobj(source, handle, FETCH_CHUNK_SIZE)
+
+
+def read_object_bytes(object_key, etag=None):
+    """Contenido completo del objeto; pasa por el caché local si está activo."""
+    if not object_cache_enabled():
+        response = minio_client.get_object(settings.MINIO_BUCKET, object_key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    with open_object(object_key, etag=etag) as handle:
+        return handle.read()
+
+
+def _entries(directory, suffix=ENTRY_SUFFIX):
+    entries = []
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            if not entry.name.endswith(suffix):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _evict_directory(directory, max_bytes, suffixes):
+    """(bytes liberados, bytes que quedan); quedan None si otro proceso ya está limpiando."""
+    with open(os.path.join(directory, '.evict.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0, None
+
+        entries = [entry for suffix in suffixes for entry in _entries(directory, suffix)]
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+
+    if freed:
+        logger.info(f"Caché en {directory}: {freed} bytes liberados")
+    return freed, total - freed
+
+
+def evict_directory(directory, max_bytes, suffixes=(ENTRY_SUFFIX,)):
+    """
+    Borra las entradas más antiguas (por mtime) de `directory` hasta quedar
+    dentro de `max_bytes`. Devuelve bytes liberados; si otro proceso ya está
+    limpiando el mismo directorio, no hace nada.
+    """
+    return _evict_directory(directory, max_bytes, suffixes)[0]
+
+
+def evict(max_bytes=None):
+    """Borra las entradas menos usadas del caché de objetos hasta quedar dentro del presupuesto."""
+    max_bytes = object_cache_max_bytes() if max_bytes is None else max_bytes
+    freed, remaining = _evict_directory(object_cache_dir(), max_bytes, (ENTRY_SUFFIX,))
+    if remaining is not None:
+        # Corrige el total llevado con lo que realmente quedó en disco
+        try:
+            _update_counters(reset_size=remaining)
+        except OSError:
+            pass
+    return freed
+
+
+def object_cache_stats():
+    hits, misses = 0, 0
+    if object_cache_enabled():
+        try:
+            hits, misses, _ = _update_counters()
+        except OSError:
+            pass
+    lookups = hits + misses
+    stats = {
+        'enabled': object_cache_enabled(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else None,
+        'max_bytes': object_cache_max_bytes(),
+        'entries': 0,
+        'size_bytes': 0,
+    }
+    if stats['enabled']:
+        entries = _entries(object_cache_dir())
+        stats['entries'] = len(entries)
+        stats['size_bytes'] = sum(size for _, size, _ in entries)
+    return stats
@@ -0,0 +1,107 @@
+"""
+Fusión de PDFs con memoria acotada.
+
+Cada PDF se copia por bloques (desde el caché local de objetos o MinIO) a un archivo temporal (con prefetch de los
+siguientes), se inserta en el documento combinado en el orden pedido y se
+borra de inmediato. El resultado se guarda en disco y se sirve desde ahí,
+sin copias intermedias en BytesIO.
+"""
+
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+from .objectcache import write_object_to
+from .zipstream import prefetch_objects
+
+
+logger = logging.getLogger(__name__)
+
+
+def spool_minio_object(object_key, directory, etag=None):
+    """Copia `object_key` por bloques a un archivo dentro de `directory` y devuelve su ruta."""
+    fd, spool_path = tempfile.mkstemp(suffix='.pdf', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            write_object_to(object_key, handle, etag=etag)
+        return spool_path
+    except Exception:
+        os.unlink(spool_path)
+        raise
+
+
+async def aspool_minio_object(object_key, directory):
+    """Versión async de spool_minio_object (lee con el cliente S3 asíncrono)."""
+    from .asyncstorage import iter_object
+
+    fd, spool_path = tempfile.mkstemp(suffix='.pdf', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            async for chunk in iter_object(object_key):
+                handle.write(chunk)
+        return spool_path
+    except Exception:
+        os.unlink(spool_path)
+        raise
+
+
+def merge_spool_directory():
+    spool_root = getattr(settings, 'MERGE_SPOOL_DIR', None) or None
+    return tempfile.TemporaryDirectory(prefix='merge_', dir=spool_root)
+
+
+def merge_spooled_pdfs(results, directory):
+    """
+    Inserta en orden los PDFs ya descargados `results` [(path, spool_path, error), ...]
+    y guarda el resultado en `directory`. Devuelve (archivo_abierto | None, files_merged, errors).
+    """
+    import fitz  # PyMuPDF
+
+    files_merged = []
+    errors = []
+    merged_pdf = fitz.open()
+    try:
+        for path, spool_path, error in results:
+            if error is not None:
+                logger.error(f"✗ Error descargando {path}: {error}")
+                errors.append({'path': path, 'error': str(error)})
+                continue
+
+            try:
+                with fitz.open(spool_path) as src_pdf:
+                    merged_pdf.insert_pdf(src_pdf)
+                files_merged.append(path)
+                logger.info(f"✓ Añadido al merge: {path}")
+            except Exception as e:
+                logger.error(f"✗ Error procesando {path}: {e}")
+                errors.append({'path': path, 'error': str(e)})
+            finally:
+                os.unlink(spool_path)
+
+        if not files_merged:
+            return None, files_merged, errors
+
+        output_path = os.path.join(directory, 'merged.pdf')
+        merged_pdf.save(output_path)
+    finally:
+        merged_pdf.close()
+
+    # El descriptor sigue siendo válido cuando se borra el directorio temporal
+    return open(output_path, 'rb'), files_merged, errors
+
+
+def merge_pdfs_to_file(paths, etags=None):
+    """
+    Fusiona `paths` en orden. Devuelve (archivo_abierto | None, files_merged, errors);
+    el archivo queda posicionado al inicio y ya no tiene nombre en disco.
+    `etags` ({path: etag}, opcional) evita un stat por archivo en el caché de objetos.
+    """
+    etags = etags or {}
+    with merge_spool_directory() as directory:
+        results = prefetch_objects(
+            ((path, path) for path in paths),
+            fetch=lambda object_key: spool_minio_object(object_key, directory, etag=etags.get(object_key)),
+        )
+        return merge_spooled_pdfs(results, directory)
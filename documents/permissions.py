@@ -4,27 +4,69 @@ from rest_framework.permissions import BasePermission
 ALL_DOCUMENT_DOMAINS = {"SEGUROS", "TREGISTRO", "CONSTANCIA_ABONO"}
 SELECCION_DOCUMENT_DOMAINS = {"SEGUROS", "TREGISTRO"}
 
+# Claim del access token con los permisos resueltos al emitirlo (ver documents/tokens.py)
+PERMISSIONS_CLAIM = "perms"
+
+# Memo en el objeto usuario: JWTAuthentication carga uno nuevo por request,
+# así que los grupos se consultan a lo sumo una vez por request
+_GROUPS_ATTR = "_permission_group_names"
+_RESOLVED_ATTR = "_resolved_permissions"
+
+
+def _group_names(user):
+    names = getattr(user, _GROUPS_ATTR, None)
+    if not isinstance(names, frozenset):
+        names = frozenset(name.strip().lower() for name in user.groups.values_list("name", flat=True))
+        setattr(user, _GROUPS_ATTR, names)
+    return names
+
 
 def user_in_group(user, group_name):
     if not user or not getattr(user, "is_authenticated", False):
         return False
-    return user.groups.filter(name__iexact=str(group_name).strip()).exists()
+    return str(group_name).strip().lower() in _group_names(user)
+
+
+def _resolve_from_groups(user):
+    if getattr(user, "is_superuser", False) or getattr(user, "is_staff", False) or user_in_group(user, "planillas"):
+        return True, frozenset(ALL_DOCUMENT_DOMAINS)
+    if user_in_group(user, "seleccion"):
+        return False, frozenset(SELECCION_DOCUMENT_DOMAINS)
+    return False, frozenset()
+
+
+def _resolved_permissions(user):
+    resolved = getattr(user, _RESOLVED_ATTR, None)
+    if not isinstance(resolved, tuple):
+        resolved = _resolve_from_groups(user)
+        setattr(user, _RESOLVED_ATTR, resolved)
+    return resolved
+
+
+def permission_claims(user):
+    """Permisos del usuario leídos de la base (sin usar los del token), para embeber en el JWT."""
+    can_manage, domains = _resolve_from_groups(user)
+    return {"can_manage_files": can_manage, "domains": sorted(domains)}
+
+
+def apply_permission_claims(user, claims):
+    """Usa los permisos del token para este usuario: la autorización no consulta grupos."""
+    if not isinstance(claims, dict):
+        return
+    domains = frozenset(str(domain) for domain in claims.get("domains") or () if str(domain) in ALL_DOCUMENT_DOMAINS)
+    setattr(user, _RESOLVED_ATTR, (bool(claims.get("can_manage_files")), domains))
 
 
 def can_manage_files(user):
     if not user or not getattr(user, "is_authenticated", False):
         return False
-    if getattr(user, "is_superuser", False) or getattr(user, "is_staff", False):
-        return True
-    return user_in_group(user, "planillas")
+    return _resolved_permissions(user)[0]
 
 
 def allowed_domains_for_user(user):
-    if can_manage_files(user):
-        return set(ALL_DOCUMENT_DOMAINS)
-    if user_in_group(user, "seleccion"):
-        return set(SELECCION_DOCUMENT_DOMAINS)
-    return set()
+    if not user or not getattr(user, "is_authenticated", False):
+        return set()
+    return set(_resolved_permissions(user)[1])
 
 
 class CanManageFiles(BasePermission):
@@ -0,0 +1,218 @@
+"""
+Vistas previas (miniaturas) de PDFs almacenados en MinIO.
+
+Se renderiza con PyMuPDF la página pedida (por defecto la primera) o la
+primera página que contiene un código de empleado, a baja resolución y en PNG
+o WebP. El render corre en el pool de procesos de documents.workers para no
+ocupar los hilos del servidor web con trabajo de CPU.
+
+Cada imagen se guarda en disco por (object_key, etag, página, ancho, formato),
+así que un objeto reemplazado en MinIO genera miniaturas nuevas. La página en
+la que aparece un código se recuerda en el caché de Django con la misma
+versión del objeto.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+
+import fitz
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponseNotModified
+
+from .objectcache import evict_directory, read_object_bytes
+from .utils import minio_client
+from .workers import run_pdf_task
+
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_FORMATS = {'png': 'image/png', 'webp': 'image/webp'}
+PREVIEW_DEFAULT_WIDTH = 240
+PREVIEW_MIN_WIDTH = 64
+PREVIEW_MAX_WIDTH = 800
+# El ancho se redondea a múltiplos de este paso para acotar las variantes en caché
+PREVIEW_WIDTH_STEP = 32
+# Alto máximo relativo al ancho: las páginas muy largas se recortan por arriba
+PREVIEW_MAX_ASPECT = 2.0
+PREVIEW_PAGE_NOT_FOUND = -1
+
+
+class PreviewNotAvailable(Exception):
+    """La página pedida no existe o el código no aparece en el documento."""
+
+
+def preview_cache_max_bytes():
+    return max(0, int(getattr(settings, 'PREVIEW_CACHE_MAX_BYTES', 0) or 0))
+
+
+def preview_cache_enabled():
+    return preview_cache_max_bytes() > 0
+
+
+def preview_cache_dir():
+    directory = getattr(settings, 'PREVIEW_CACHE_DIR', None) or os.path.join(tempfile.gettempdir(), 'pdf_preview_cache')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def parse_preview_params(params):
+    """(page, codigo, width, fmt) desde los query params; ValueError con mensaje para el cliente."""
+    fmt = str(params.get('output_format') or 'png').lower()
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}. Use png o webp.")
+
+    try:
+        width = int(params.get('width') or PREVIEW_DEFAULT_WIDTH)
+        page = int(params.get('page') or 1) - 1
+    except (TypeError, ValueError):
+        raise ValueError('width y page deben ser enteros.')
+    if page < 0:
+        raise ValueError('page debe ser mayor o igual a 1.')
+
+    width = min(PREVIEW_MAX_WIDTH, max(PREVIEW_MIN_WIDTH, width))
+    width = max(PREVIEW_MIN_WIDTH, round(width / PREVIEW_WIDTH_STEP) * PREVIEW_WIDTH_STEP)
+    codigo = str(params.get('codigo') or '').strip() or None
+    return page, codigo, width, fmt
+
+
+def _version_digest(*parts):
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _entry_path(digest, fmt):
+    return os.path.join(preview_cache_dir(), f'{digest}.{fmt}')
+
+
+def _find_code_page(document, codigo):
+    pattern = re.compile(rf'\b{re.escape(str(codigo))}\b', re.IGNORECASE)
+    for page_index, page in enumerate(document):
+        if pattern.search(page.get_text()):
+            return page_index
+    return PREVIEW_PAGE_NOT_FOUND
+
+
+def render_pdf_page(pdf_bytes, page_index, codigo, width, fmt):
+    """
+    Renderiza una página y devuelve (imagen, página). Con `codigo` se usa la
+    primera página que lo contiene. Si no hay página devuelve (None, -1).
+    Corre dentro del pool de procesos: solo recibe y devuelve datos simples.
+    """
+    document = fitz.open(stream=pdf_bytes, filetype='pdf')
+    try:
+        if codigo:
+            page_index = _find_code_page(document, codigo)
+        if page_index < 0 or page_index >= document.page_count:
+            return None, PREVIEW_PAGE_NOT_FOUND
+
+        page = document[page_index]
+        zoom = width / page.rect.width
+        clip = fitz.Rect(page.rect.x0, page.rect.y0, page.rect.x1,
+                         min(page.rect.y1, page.rect.y0 + page.rect.width * PREVIEW_MAX_ASPECT))
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+
+        if fmt == 'png':
+            return pixmap.tobytes('png'), page_index
+
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples).save(buffer, 'WEBP', quality=70)
+        return buffer.getvalue(), page_index
+    finally:
+        document.close()
+
+
+def _render(pdf_bytes, page_index, codigo, width, fmt):
+    timeout = int(getattr(settings, 'PREVIEW_RENDER_TIMEOUT_SECONDS', 30))
+    return run_pdf_task(render_pdf_page, pdf_bytes, page_index, codigo, width, fmt, timeout=timeout)
+
+
+def _store(digest, fmt, image):
+    """Publica la imagen en el caché (si está activo) y la devuelve como archivo en memoria."""
+    if preview_cache_enabled():
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=preview_cache_dir())
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(image)
+            os.replace(tmp_path, _entry_path(digest, fmt))
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la vista previa en caché: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        else:
+            evict_directory(preview_cache_dir(), preview_cache_max_bytes(), suffixes=tuple(f'.{ext}' for ext in PREVIEW_FORMATS))
+    return io.BytesIO(image)
+
+
+def _open_cached(digest, fmt):
+    if not preview_cache_enabled():
+        return None
+    entry_path = _entry_path(digest, fmt)
+    try:
+        handle = open(entry_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+    return handle
+
+
+class Preview:
+    def __init__(self, handle, fmt, page_index, digest):
+        self.handle = handle
+        self.fmt = fmt
+        self.page_index = page_index
+        self.etag = f'"{digest}"'
+
+    def response(self, request):
+        if_none_match = (getattr(request, 'META', None) or {}).get('HTTP_IF_NONE_MATCH', '')
+        if self.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self.handle.close()
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(self.handle, content_type=PREVIEW_FORMATS[self.fmt])
+            response['X-Preview-Page'] = str(self.page_index + 1)
+        response['ETag'] = self.etag
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+
+def render_preview(object_key, page_index=0, codigo=None, width=PREVIEW_DEFAULT_WIDTH, fmt='png', etag=None):
+    """
+    Vista previa de `object_key` (leído vía caché local de objetos). Lanza
+    PreviewNotAvailable si la página o el código no existen, y la excepción de
+    MinIO si el objeto no existe. Con el `etag` conocido (StorageObject) no se
+    consulta MinIO para servir una imagen ya generada.
+    """
+    etag = (etag or '').strip('"') or (minio_client.stat_object(settings.MINIO_BUCKET, object_key).etag or '').strip('"')
+
+    page_key = None
+    if codigo:
+        page_key = f"preview:page:{_version_digest(object_key, etag, codigo)}"
+        cached_page = cache.get(page_key)
+        if cached_page == PREVIEW_PAGE_NOT_FOUND:
+            raise PreviewNotAvailable(codigo)
+        if cached_page is not None:
+            page_index, codigo = cached_page, None
+
+    if not codigo:
+        digest = _version_digest(object_key, etag, page_index, width, fmt)
+        handle = _open_cached(digest, fmt)
+        if handle is not None:
+            return Preview(handle, fmt, page_index, digest)
+
+    image, page_index = _render(read_object_bytes(object_key, etag=etag), page_index, codigo, width, fmt)
+    if page_key is not None:
+        cache.set(page_key, page_index, int(getattr(settings, 'PREVIEW_PAGE_CACHE_TIMEOUT', 86400)))
+    if image is None:
+        raise PreviewNotAvailable(codigo or page_index)
+
+    digest = _version_digest(object_key, etag, page_index, width, fmt)
+    return Preview(_store(digest, fmt, image), fmt, page_index, digest)
@@ -0,0 +1,188 @@
+"""
+Backends del límite por IP de IPRateLimitMiddleware.
+
+Ventana deslizante aproximada: se cuentan peticiones por ventana fija y la
+estimación es `actual + anterior * (fracción de la ventana anterior que
+todavía cae dentro de los últimos `window` segundos)`. Al superar el límite
+el bucket queda bloqueado `block_time` segundos.
+
+- CacheRateLimitBackend (RATE_LIMIT_BACKEND='cache', por defecto): contadores
+  en su propio alias de caché (RATE_LIMIT_CACHE_ALIAS), compartidos por todos
+  los workers; el TTL de cada clave es la eviction. Solo se usa si ese alias
+  es Redis/Memcached (incr atómico y sin tocar disco): con el caché de
+  archivos cada petición /api/ costaba varias lecturas y escrituras de
+  archivos, los culls listaban el directorio y los incrementos concurrentes
+  se perdían. Con otro backend se limita por proceso (check --deploy lo
+  advierte). Si el caché falla se usa el backend local.
+- LocalRateLimitBackend (RATE_LIMIT_BACKEND='local'): por proceso, con
+  barrido periódico de entradas vencidas y un máximo de entradas
+  (RATE_LIMIT_LOCAL_MAX_ENTRIES) para acotar memoria ante escaneos.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'ratelimit'
+SWEEP_INTERVAL_SECONDS = 30
+# Backends con incr atómico entre procesos
+ATOMIC_INCR_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+def rate_limit_cache_alias():
+    return getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')
+
+
+def rate_limit_cache():
+    return caches[rate_limit_cache_alias()]
+
+
+def rate_limit_cache_is_shared():
+    """True si el alias del límite es Redis/Memcached."""
+    backend = settings.CACHES.get(rate_limit_cache_alias(), {}).get('BACKEND', '')
+    return backend in ATOMIC_INCR_CACHE_BACKENDS
+
+
+def _estimate(current, previous, now, window):
+    elapsed = (now % window) / window
+    return current + previous * (1 - elapsed)
+
+
+def _retry_after(blocked_until, now):
+    return max(1, math.ceil(blocked_until - now))
+
+
+class RateLimitBackend:
+    def hit(self, bucket, cfg, now=None):
+        """Registra una petición; devuelve los segundos de espera (0 = permitida)."""
+        raise NotImplementedError
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(getattr(settings, 'RATE_LIMIT_LOCAL_MAX_ENTRIES', 10000))
+        # bucket -> (índice de ventana, actual, anterior, vence)
+        self._windows = {}
+        # bucket -> bloqueado hasta
+        self._blocked = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def hit(self, bucket, cfg, now=None):
+        now = time.time() if now is None else now
+
+        # Sin lock: un bucket bloqueado no necesita tocar contadores
+        blocked_until = self._blocked.get(bucket, 0)
+        if blocked_until > now:
+            return _retry_after(blocked_until, now)
+
+        window = cfg['window']
+        index = int(now // window)
+        with self._lock:
+            if now >= self._next_sweep or len(self._windows) >= self.max_entries:
+                self._sweep(now)
+
+            state = self._windows.get(bucket)
+            if state is None or state[0] < index - 1:
+                current, previous = 0, 0
+            elif state[0] == index - 1:
+                current, previous = 0, state[1]
+            else:
+                current, previous = state[1], state[2]
+            current += 1
+            self._windows[bucket] = (index, current, previous, (index + 2) * window)
+
+            if _estimate(current, previous, now, window) > cfg['requests']:
+                self._blocked[bucket] = now + cfg['block_time']
+                return cfg['block_time']
+        return 0
+
+    def _sweep(self, now):
+        windows = {bucket: state for bucket, state in self._windows.items() if state[3] > now}
+        if len(windows) >= self.max_entries:
+            # Escaneo con muchas IPs distintas: se descartan las que vencen antes
+            keep = sorted(windows.items(), key=lambda item: item[1][3])[-(self.max_entries // 2):]
+            windows = dict(keep)
+        # Se reemplazan los dicts en vez de mutarlos: las lecturas sin lock ven uno u otro
+        self._windows = windows
+        self._blocked = {bucket: until for bucket, until in self._blocked.items() if until > now}
+        self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+
+    def __len__(self):
+        return len(self._windows)
+
+
+class CacheRateLimitBackend(RateLimitBackend):
+    def __init__(self, fallback=None):
+        self.fallback = fallback or LocalRateLimitBackend()
+
+    def _key(self, bucket):
+        # Las IPs vienen de cabeceras: se hashean para no armar claves inválidas
+        scope, _, client = bucket.partition(':')
+        digest = hashlib.sha1(client.encode('utf-8', errors='ignore')).hexdigest()[:20]
+        return f'{CACHE_KEY_PREFIX}:{scope}:{digest}'
+
+    def hit(self, bucket, cfg, now=None):
+        now = time.time() if now is None else now
+        try:
+            return self._hit(self._key(bucket), cfg, now)
+        except Exception as e:
+            logger.warning(f'Rate limit en caché no disponible, se limita por proceso: {e}')
+            return self.fallback.hit(bucket, cfg, now)
+
+    def _hit(self, key, cfg, now):
+        window = cfg['window']
+        index = int(now // window)
+        blocked_key = f'{key}:blocked'
+        current_key = f'{key}:{index}'
+        previous_key = f'{key}:{index - 1}'
+
+        cache = rate_limit_cache()
+        stored = cache.get_many([blocked_key, previous_key])
+        blocked_until = stored.get(blocked_key) or 0
+        if blocked_until > now:
+            return _retry_after(blocked_until, now)
+
+        cache.add(current_key, 0, window * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # La clave venció entre add e incr
+            cache.set(current_key, 1, window * 2)
+            current = 1
+
+        if _estimate(current, stored.get(previous_key) or 0, now, window) > cfg['requests']:
+            cache.set(blocked_key, now + cfg['block_time'], cfg['block_time'])
+            return cfg['block_time']
+        return 0
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limit_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'RATE_LIMIT_BACKEND', 'cache')
+                if name != 'local' and rate_limit_cache_is_shared():
+                    _backend = CacheRateLimitBackend()
+                else:
+                    if name != 'local':
+                        logger.info(f"CACHES['{rate_limit_cache_alias()}'] sin incr atómico: límite por IP por proceso")
+                    _backend = LocalRateLimitBackend()
+    return _backend
@@ -0,0 +1,225 @@
+"""
+Subidas reanudables por tramos.
+
+Protocolo (un archivo por sesión):
+
+1. POST /api/files/resumable {filename, size, md5?} crea la sesión y devuelve
+   upload_id y el tamaño de tramo sugerido.
+2. PUT /api/files/resumable/<upload_id> con el cuerpo del tramo y
+   Content-Range: bytes <inicio>-<fin>/<total>. El inicio debe coincidir con
+   el offset actual; si no, 409 con el offset que tiene el servidor.
+3. GET /api/files/resumable/<upload_id> devuelve el offset para reanudar
+   tras un corte.
+4. POST /api/files/resumable/finalize con upload_ids[] y los mismos campos de
+   /api/files/upload ejecuta clasificación e ingesta de los archivos completos.
+
+Los tramos se agregan a un archivo en UPLOAD_RESUMABLE_DIR (que el pipeline
+de subida luego mapea y sube a MinIO en multiparte); el offset es el tamaño
+de ese archivo, así que sobrevive a reinicios. Las sesiones sin actividad
+por UPLOAD_RESUMABLE_TTL_SECONDS se borran.
+"""
+
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+
+STATE_NAME = 'state.json'
+DATA_NAME = 'data.pdf'
+STREAM_BLOCK_SIZE = 1024 * 1024
+_UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{20,64}$')
+_CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ResumableUploadError(Exception):
+    """Error del cliente; `code` y `status` van en la respuesta."""
+
+    def __init__(self, message, code, status=400, offset=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.offset = offset
+
+
+def resumable_chunk_size():
+    return max(1024 * 1024, int(getattr(settings, 'UPLOAD_RESUMABLE_CHUNK_SIZE', 8 * 1024 * 1024)))
+
+
+def resumable_max_bytes():
+    return int(getattr(settings, 'UPLOAD_RESUMABLE_MAX_BYTES', 1024 * 1024 * 1024))
+
+
+def resumable_ttl():
+    return int(getattr(settings, 'UPLOAD_RESUMABLE_TTL_SECONDS', 24 * 3600))
+
+
+def resumable_dir():
+    directory = getattr(settings, 'UPLOAD_RESUMABLE_DIR', None) or os.path.join(tempfile.gettempdir(), 'pdf_upload_resumable')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def parse_content_range(value):
+    """(inicio, fin inclusive, total) de 'bytes a-b/total'; ResumableUploadError si no es válido."""
+    match = _CONTENT_RANGE_PATTERN.match(str(value or '').strip())
+    if not match:
+        raise ResumableUploadError('Content-Range debe tener la forma "bytes inicio-fin/total".', 'INVALID_CONTENT_RANGE')
+    start, end, total = (int(group) for group in match.groups())
+    if end < start:
+        raise ResumableUploadError('Content-Range inválido.', 'INVALID_CONTENT_RANGE')
+    return start, end, total
+
+
+def purge_expired_uploads(now=None):
+    """Borra las sesiones sin actividad reciente; devuelve cuántas se borraron."""
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(resumable_dir()):
+        if not entry.is_dir():
+            continue
+        data_path = os.path.join(entry.path, DATA_NAME)
+        try:
+            last_activity = os.path.getmtime(data_path if os.path.exists(data_path) else entry.path)
+        except FileNotFoundError:
+            continue
+        if now - last_activity > resumable_ttl():
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class ResumableUpload:
+    def __init__(self, upload_id, state):
+        self.upload_id = upload_id
+        self.directory = os.path.join(resumable_dir(), upload_id)
+        self.data_path = os.path.join(self.directory, DATA_NAME)
+        self.filename = state['filename']
+        self.size = int(state['size'])
+        self.md5 = state.get('md5') or None
+        self.owner = state.get('owner')
+
+    @classmethod
+    def create(cls, user, filename, size, md5=None):
+        filename = os.path.basename(str(filename or '').strip())
+        if not filename.lower().endswith('.pdf'):
+            raise ResumableUploadError('Solo se permiten archivos PDF', 'INVALID_FILE')
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise ResumableUploadError('size debe ser un entero.', 'INVALID_SIZE')
+        if size <= 0 or size > resumable_max_bytes():
+            raise ResumableUploadError(f'size debe estar entre 1 y {resumable_max_bytes()} bytes.', 'INVALID_SIZE')
+
+        purge_expired_uploads()
+        upload_id = secrets.token_urlsafe(24)
+        state = {
+            'filename': filename,
+            'size': size,
+            'md5': str(md5 or '').strip().lower() or None,
+            'owner': getattr(user, 'pk', None),
+            'created': time.time(),
+        }
+        upload = cls(upload_id, state)
+        os.makedirs(upload.directory)
+        with open(os.path.join(upload.directory, STATE_NAME), 'w', encoding='utf-8') as handle:
+            json.dump(state, handle, ensure_ascii=False)
+        open(upload.data_path, 'wb').close()
+        return upload
+
+    @classmethod
+    def load(cls, upload_id, user):
+        """Sesión del usuario; ResumableUploadError 404 si no existe, venció o es de otro usuario."""
+        not_found = ResumableUploadError('La subida no existe o venció.', 'UPLOAD_NOT_FOUND', status=404)
+        if not _UPLOAD_ID_PATTERN.match(str(upload_id or '')):
+            raise not_found
+        try:
+            with open(os.path.join(resumable_dir(), upload_id, STATE_NAME), encoding='utf-8') as handle:
+                state = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            raise not_found
+        if state.get('owner') != getattr(user, 'pk', None):
+            raise not_found
+        return cls(upload_id, state)
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+    def append(self, start, stream, length):
+        """
+        Agrega `length` bytes de `stream` en `start`. Bajo lock exclusivo: dos
+        PUT del mismo tramo no se intercalan. Un tramo cortado a la mitad deja
+        lo recibido y el cliente reanuda desde el nuevo offset.
+        """
+        if start + length > self.size:
+            raise ResumableUploadError('El tramo excede el tamaño declarado.', 'INVALID_CONTENT_RANGE', offset=self.offset)
+
+        with open(self.data_path, 'ab') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            current = os.fstat(handle.fileno()).st_size
+            if start != current:
+                raise ResumableUploadError('El tramo no empieza en el offset actual.', 'OFFSET_MISMATCH', status=409, offset=current)
+
+            remaining = length
+            while remaining > 0:
+                block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                handle.write(block)
+                remaining -= len(block)
+            handle.flush()
+        return self.offset
+
+    def as_uploaded_file(self):
+        return ResumableUploadedFile(self)
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def describe(self):
+        offset = self.offset
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': offset,
+            'complete': offset == self.size,
+            'chunk_size': resumable_chunk_size(),
+        }
+
+
+class ResumableUploadedFile(UploadedFile):
+    """Archivo completo de una sesión; el pipeline de subida lo trata como un temporal de Django."""
+
+    def __init__(self, upload):
+        super().__init__(open(upload.data_path, 'rb'), name=upload.filename, content_type='application/pdf', size=upload.size)
+        self.upload = upload
+        self.expected_md5 = upload.md5
+
+    def temporary_file_path(self):
+        return self.upload.data_path
+
+    def release(self):
+        """Subida confirmada: borra la sesión."""
+        self.close()
+        self.upload.discard()
@@ -44,6 +44,8 @@ let uploadMode = 'auto';
 let selectedManualFolder = '';
 let manualFolderFromPreview = false;
 let classifyPreviewRequestId = 0;
+// Token de classify-preview: upload confirma los archivos ya guardados en el servidor
+let classifyPreviewToken = null;
 
 /* ── Helpers de autenticación ───────────────────────────────────────── */
 function getAuthHeaders(includeContentType = true) {
@@ -1156,9 +1158,11 @@ async function triggerClassifyPreview(files) {
   const formData = new FormData();
   files.forEach(f => formData.append('files[]', f));
   formData.append('upload_mode', uploadMode);
+  formData.append('stage_bytes', 'true');
   if (uploadMode === 'manual' && selectedManualFolder) {
     formData.append('folder', selectedManualFolder);
   }
+  classifyPreviewToken = null;
 
   try {
     const data = await fetchJson(API.classifyPreview, {
@@ -1169,6 +1173,7 @@ async function triggerClassifyPreview(files) {
 
     if (requestId !== classifyPreviewRequestId) return;
 
+    classifyPreviewToken = data.preview_token || null;
     const items = data.files || [];
     items.forEach((item, i) => {
       if (item.status !== 'INVALID_FILE') {
@@ -1329,8 +1334,14 @@ async function handleUpload() {
     progressText.textContent = `Subiendo ${filename}...`;
     countEl.textContent = `${done}/${total}`;
 
-const formData = new FormData();
-    formData.append('files[]', entry.file);
+    const formData = new FormData();
+    const stagedId = classifyPreviewToken ? entry.previewItem?.staged_id : null;
+    if (stagedId != null) {
+      formData.append('preview_token', classifyPreviewToken);
+      formData.append('staged_files[]', stagedId);
+    } else {
+      formData.append('files[]', entry.file);
+    }
 
     // Incluir hints del preview si están disponibles
     const meta = entry.previewItem?.metadata || {};
@@ -1353,11 +1364,24 @@ const formData = new FormData();
     }
 
     try {
-      const resp = await fetchJson(API.filesUpload, {
-        method: 'POST',
-        headers: getAuthHeaders(false),
-        body: formData
-      });
+      try {
+        await fetchJson(API.filesUpload, {
+          method: 'POST',
+          headers: getAuthHeaders(false),
+          body: formData
+        });
+      } catch (e) {
+        if (stagedId == null || e.code !== 'PREVIEW_TOKEN_INVALID') throw e;
+        // La previsualización venció en el servidor: se reenvía el archivo
+        formData.delete('preview_token');
+        formData.delete('staged_files[]');
+        formData.append('files[]', entry.file);
+        await fetchJson(API.filesUpload, {
+          method: 'POST',
+          headers: getAuthHeaders(false),
+          body: formData
+        });
+      }
       done++;
       const pct = Math.round((done / total) * 100);
       progressBar.style.width = `${pct}%`;
@@ -101,6 +101,7 @@
             localStorage.removeItem(tokenKey);
             localStorage.removeItem(refreshTokenKey);
             localStorage.removeItem(userKey);
+            this._etagCache.clear();
             if (options.updateUi !== false) {
                 this.setAuthState(false);
                 this.renderSidebarUser({ userKey });
@@ -173,22 +174,41 @@
         },
 
         // --- HTTP ---
+        // Respuestas GET con ETag: se revalidan con If-None-Match y un 304 reutiliza el cuerpo guardado.
+        _etagCache: new Map(),
+
         async fetchJson(url, options = {}) {
             const isFormData = options.body instanceof FormData;
             const authHeaders = this.getAuthHeaders(!isFormData);
             const headers = { ...authHeaders, ...(options.headers || {}) };
+            const isGet = !options.method || String(options.method).toUpperCase() === 'GET';
+            const cached = isGet ? this._etagCache.get(url) : null;
+            if (cached) headers['If-None-Match'] = cached.etag;
+
             const response = await fetch(url, { ...options, headers });
             
             if (response.status === 401 || response.status === 403) {
                 this.logout();
                 throw new Error('Sesión expirada');
             }
+
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
             
             if (!response.ok) {
                 const err = await response.json().catch(() => ({ detail: 'Error en la petición' }));
-                throw new Error(err.detail || err.error || `HTTP ${response.status}`);
+                const error = new Error(err.detail || err.error || `HTTP ${response.status}`);
+                error.code = err.code;
+                error.status = response.status;
+                throw error;
+            }
+            const data = await response.json();
+            const etag = isGet ? response.headers.get('ETag') : null;
+            if (etag) {
+                this._etagCache.set(url, { etag, data });
             }
-            return response.json();
+            return data;
         },
 
         async validateToken(meUrl, token) {
@@ -696,6 +716,7 @@
                         ${columns.map(col => `<td>${col.render(doc)}</td>`).join('')}
                     </tr>
                 `).join('');
+                DocSearchCore.loadThumbnails(resultsTableBody, state.lastRequestedCodes || []);
 
                 // Delegate download event
                 resultsTableBody.onclick = async (e) => {
@@ -853,29 +874,41 @@
          * @returns {Promise<Object>} Filter options with meses, razon_social, etc.
          */
         async loadFilterOptions(documentType) {
-            // Check local storage cache first
+            // Session cache is revalidated with If-None-Match; a 304 reuses the stored payload
             const cacheKey = `filter_options_${documentType}`;
+            let cached = null;
             const cachedData = sessionStorage.getItem(cacheKey);
             if (cachedData) {
                 try {
-                    return JSON.parse(cachedData);
+                    cached = JSON.parse(cachedData);
                 } catch (e) {
                     sessionStorage.removeItem(cacheKey);
                 }
             }
+            if (cached && !cached.etag) {
+                cached = null;
+            }
 
             try {
                 const url = `/api/filter-options-bulk?document_type=${encodeURIComponent(documentType)}`;
-                const response = await fetch(url, { headers: DocSearchCore.getAuthHeaders(false) });
+                const headers = DocSearchCore.getAuthHeaders(false);
+                if (cached) headers['If-None-Match'] = cached.etag;
+                const response = await fetch(url, { headers });
+
+                if (response.status === 304 && cached) {
+                    return cached.data;
+                }
                 
                 if (!response.ok) {
                     console.error(`Failed to load filter options: ${response.status}`);
-                    return null;
+                    return cached ? cached.data : null;
                 }
 
                 const data = await response.json();
-                // Cache in sessionStorage for the session duration
-                sessionStorage.setItem(cacheKey, JSON.stringify(data));
+                const etag = response.headers.get('ETag');
+                if (etag) {
+                    sessionStorage.setItem(cacheKey, JSON.stringify({ etag, data }));
+                }
                 return data;
             } catch (error) {
                 console.error('Error loading filter options:', error);
@@ -970,8 +1003,13 @@
                 `;
             }
 
+            const thumbnail = documentId
+                ? `<img class="doc-thumb" data-preview-id="${DocSearchCore.safeText(documentId)}" alt="" width="48">`
+                : '';
+
             return `
                 <div class="flex gap-2">
+                    ${thumbnail}
                     <button class="btn-icon btn-primary js-download"
                             data-id="${DocSearchCore.safeText(documentId)}"
                             data-url="${DocSearchCore.safeText(downloadUrl)}"
@@ -983,6 +1021,44 @@
             `;
         },
 
+        // Las miniaturas requieren el header Authorization: se piden con fetch
+        // cuando la fila entra en pantalla y se muestran como blob URL.
+        loadThumbnails(container, codes = []) {
+            if (!container) return;
+            const images = container.querySelectorAll('img.doc-thumb[data-preview-id]');
+            if (!images.length) return;
+
+            const codigo = codes.length === 1 ? codes[0] : '';
+            const load = async (img) => {
+                const params = new URLSearchParams({ width: 96 });
+                if (codigo) params.append('codigo', codigo);
+                const url = `${API_PATHS.download}${img.dataset.previewId}/preview?${params.toString()}`;
+                try {
+                    const response = await fetch(url, { headers: DocSearchCore.getAuthHeaders(false) });
+                    if (!response.ok) throw new Error(String(response.status));
+                    const blobUrl = URL.createObjectURL(await response.blob());
+                    img.onload = () => URL.revokeObjectURL(blobUrl);
+                    img.src = blobUrl;
+                    img.classList.add('loaded');
+                } catch (_) {
+                    img.remove();
+                }
+            };
+
+            if (!('IntersectionObserver' in window)) {
+                images.forEach(load);
+                return;
+            }
+            const observer = new IntersectionObserver((entries) => {
+                entries.forEach(entry => {
+                    if (!entry.isIntersecting) return;
+                    observer.unobserve(entry.target);
+                    load(entry.target);
+                });
+            }, { rootMargin: '200px' });
+            images.forEach(img => observer.observe(img));
+        },
+
         renderSkeletonRows(count) {
             let html = '';
             for (let i = 0; i < count; i++) {
@@ -4,6 +4,8 @@ from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
 from django.test import override_settings
 from rest_framework.test import APITestCase
 
@@ -16,6 +18,7 @@ from documents.views import (
 	FoldersListView,
 	FolderOptionsView,
 	IndexStatsView,
+	MergePdfsView,
 	PopulateHashesView,
 	ReindexView,
 	SyncIndexView,
@@ -114,6 +117,7 @@ class SearchViewFallbackTests(APITestCase):
 		fake_obj = SimpleNamespace(
 			object_name='2025/RESGUARDO/01.ENERO/BCP/planilla_unica.pdf',
 			size=2048,
+			etag='etag-unica',
 		)
 		mock_list_objects.return_value = [fake_obj]
 		mock_search_in_pdf.return_value = True
@@ -143,6 +147,7 @@ class SearchViewFallbackTests(APITestCase):
 		fake_obj = SimpleNamespace(
 			object_name='2025/RESGUARDO/01.ENERO/BCP/planilla_filtrada.pdf',
 			size=4096,
+			etag='etag-filtrada',
 		)
 		mock_list_objects.return_value = [fake_obj]
 		mock_search_in_pdf.return_value = True
@@ -172,8 +177,7 @@ class DocrepoIndexViewsUnitTests(TestCase):
 			is_staff=True,
 		)
 
-		from documents import views
-		views._minio_list_cache = {'time': 0, 'data': None}
+		cache.clear()
 
 	def _request(self, data=None):
 		return SimpleNamespace(
@@ -207,9 +211,34 @@ class DocrepoIndexViewsUnitTests(TestCase):
 		self.assertEqual(response.data['moved_files'], 0)
 		self.assertEqual(response.data['removed_orphans'], 0)
 
+	@patch('documents.views.StorageObject.objects.select_related')
+	@patch('documents.views.Document.objects.filter')
+	@patch('documents.views.minio_client.list_objects')
+	def test_sync_reuses_minio_listing_until_storage_changes(
+		self,
+		mock_list_objects,
+		mock_document_filter,
+		mock_select_related,
+	):
+		from docrepo.cache import STORAGE_CHANGED, emit_invalidation_event
+
+		mock_list_objects.return_value = []
+		mock_document_filter.return_value = SimpleNamespace(count=lambda: 0)
+		storage_qs = MagicMock()
+		storage_qs.filter.return_value = []
+		mock_select_related.return_value = storage_qs
+
+		SyncIndexView().post(self._request({'batch_size': 10}))
+		SyncIndexView().post(self._request({'batch_size': 10}))
+		self.assertEqual(mock_list_objects.call_count, 1)
+
+		emit_invalidation_event(STORAGE_CHANGED)
+		SyncIndexView().post(self._request({'batch_size': 10}))
+		self.assertEqual(mock_list_objects.call_count, 2)
+
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views.upsert_document_from_upload')
-	@patch('documents.views.extract_text_from_pdf')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
 	@patch('documents.views.extract_metadata')
 	@patch('documents.views.StorageObject.objects.select_related')
 	@patch('documents.views.minio_client.list_objects')
@@ -242,7 +271,7 @@ class DocrepoIndexViewsUnitTests(TestCase):
 			'banco': 'BCP',
 			'tipo_documento': 'GENERAL',
 		}
-		mock_extract_text.return_value = ('contenido', ['12345678'])
+		mock_extract_text.return_value = ('contenido', ['12345678'], 'md5-contenido', 'sha-contenido')
 
 		response = ReindexView().post(self._request({'clean_orphans': True}))
 
@@ -254,6 +283,8 @@ class DocrepoIndexViewsUnitTests(TestCase):
 		self.assertEqual(response.data['total_indexed'], 1)
 
 		mock_upsert.assert_called_once()
+		self.assertEqual(mock_upsert.call_args.kwargs['content_md5'], 'md5-contenido')
+		self.assertEqual(mock_upsert.call_args.kwargs['checksum_sha256'], 'sha-contenido')
 		self.assertTrue(mock_record_audit.called)
 
 	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
@@ -415,7 +446,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.build_auto_storage_prefix')
 	@patch('documents.views.infer_upload_metadata')
-	@patch('documents.views.extract_text_from_pdf_bytes')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
 	def test_files_classify_preview_returns_ready_item(
 		self,
 		mock_extract_text_from_bytes,
@@ -424,10 +455,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_find_duplicate,
 		mock_record_audit,
 	):
-		fake_upload = SimpleNamespace(
-			name='SCTR PENSION 02012026 FACILITIES.pdf',
-			read=lambda: b'%PDF-1.4 classify-preview content',
-		)
+		fake_upload = SimpleUploadedFile('SCTR PENSION 02012026 FACILITIES.pdf', b'%PDF-1.4 classify-preview content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_extract_text_from_bytes.return_value = ('SCTR PENSION FACILITIES', ['42177863'])
@@ -467,7 +495,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.build_auto_storage_prefix')
 	@patch('documents.views.infer_upload_metadata')
-	@patch('documents.views.extract_text_from_pdf_bytes')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
 	def test_files_classify_preview_marks_duplicate(
 		self,
 		mock_extract_text_from_bytes,
@@ -476,10 +504,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_find_duplicate,
 		mock_record_audit,
 	):
-		fake_upload = SimpleNamespace(
-			name='FIN DE MES DESTACADOS_27022024.pdf',
-			read=lambda: b'%PDF-1.4 classify-preview duplicate',
-		)
+		fake_upload = SimpleUploadedFile('FIN DE MES DESTACADOS_27022024.pdf', b'%PDF-1.4 classify-preview duplicate', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_extract_text_from_bytes.return_value = ('FIN DE MES DESTACADOS', ['42177863'])
@@ -526,10 +551,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_upsert,
 		mock_record_audit,
 	):
-		fake_upload = SimpleNamespace(
-			name='duplicado.pdf',
-			read=lambda: b'%PDF-1.4 duplicate content',
-		)
+		fake_upload = SimpleUploadedFile('duplicado.pdf', b'%PDF-1.4 duplicate content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_find_duplicate.return_value = SimpleNamespace(
@@ -556,10 +578,10 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.upsert_document_from_upload')
-	@patch('documents.views.extract_text_from_pdf')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
 	@patch('documents.views.build_auto_storage_prefix')
 	@patch('documents.views.infer_upload_metadata')
-	@patch('documents.views.extract_text_from_pdf_bytes')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
 	@patch('documents.views.minio_client.stat_object')
 	@patch('documents.views.minio_client.put_object')
 	def test_files_upload_auto_routes_when_folder_missing(
@@ -574,10 +596,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_find_duplicate,
 		mock_record_audit,
 	):
-		fake_upload = SimpleNamespace(
-			name='SCTR PENSION 02012026 FACILITIES.pdf',
-			read=lambda: b'%PDF-1.4 auto-route test content',
-		)
+		fake_upload = SimpleUploadedFile('SCTR PENSION 02012026 FACILITIES.pdf', b'%PDF-1.4 auto-route test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_extract_text_from_bytes.return_value = ('SCTR PENSION FACILITIES', ['42177863'])
@@ -627,7 +646,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.upsert_document_from_upload')
-	@patch('documents.views.extract_text_from_pdf')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
 	@patch('documents.views.extract_metadata')
 	@patch('documents.views.minio_client.stat_object')
 	@patch('documents.views.minio_client.put_object')
@@ -641,10 +660,7 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_find_duplicate,
 		mock_record_audit,
 	):
-		fake_upload = SimpleNamespace(
-			name='planilla_test.pdf',
-			read=lambda: b'%PDF-1.4 test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_test.pdf', b'%PDF-1.4 test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_stat_object.return_value = SimpleNamespace(
@@ -684,6 +700,226 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		mock_find_duplicate.assert_called_once()
 		mock_record_audit.assert_called_once()
 
+	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
+	@patch('documents.views.record_audit_event')
+	@patch('documents.views._find_active_duplicate_by_hash_size')
+	@patch('documents.views.upsert_document_from_upload')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_files_upload_streams_temporary_file_with_incremental_hashes(
+		self,
+		mock_put_object,
+		mock_stat_object,
+		mock_extract_text,
+		mock_upsert,
+		mock_find_duplicate,
+		mock_record_audit,
+	):
+		import hashlib
+		import fitz
+		from django.core.files.uploadedfile import TemporaryUploadedFile
+
+		document = fitz.open()
+		document.new_page().insert_text((72, 72), 'Constancia 12345678')
+		content = document.tobytes()
+		document.close()
+
+		upload = TemporaryUploadedFile('constancia.pdf', 'application/pdf', len(content), None)
+		upload.write(content)
+		upload.seek(0)
+		self.addCleanup(upload.close)
+		mock_put_object.side_effect = lambda _bucket, _name, data, length, **kwargs: self.assertEqual(data.read(), content)
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc-2"', last_modified=datetime.utcnow())
+		mock_upsert.return_value = SimpleNamespace(document=SimpleNamespace(id='doc-1'), domain_code='CONSTANCIA_ABONO')
+		mock_find_duplicate.return_value = None
+
+		request = self._request(files=SimpleNamespace(getlist=lambda _key: [upload]), post={'folder': '2025/RESGUARDO'})
+		response = FilesUploadView().post(request)
+
+		self.assertEqual(response.status_code, 201)
+		mock_find_duplicate.assert_called_once_with(len(content), hashlib.md5(content).hexdigest(), hashlib.sha256(content).hexdigest())
+		put_kwargs = mock_put_object.call_args.kwargs
+		self.assertEqual(put_kwargs['length'], len(content))
+		self.assertGreaterEqual(put_kwargs['part_size'], 5 * 1024 * 1024)
+		mock_extract_text.assert_not_called()
+		upsert_kwargs = mock_upsert.call_args.kwargs
+		self.assertEqual(upsert_kwargs['employee_codes'], ['12345678'])
+		self.assertEqual(upsert_kwargs['etag'], 'abc-2')
+		self.assertEqual(upsert_kwargs['content_md5'], hashlib.md5(content).hexdigest())
+		self.assertEqual(upsert_kwargs['checksum_sha256'], hashlib.sha256(content).hexdigest())
+
+	@patch('documents.views.settings.UPLOAD_WORKERS', 3)
+	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
+	@patch('documents.views.emit_invalidation_event')
+	@patch('documents.views.record_audit_event')
+	@patch('documents.views._find_active_duplicate_by_hash_size')
+	@patch('documents.views.upsert_document_from_upload')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_files_upload_processes_files_in_workers_and_keeps_request_order(
+		self,
+		mock_put_object,
+		mock_stat_object,
+		mock_extract_text_from_bytes,
+		mock_upsert,
+		mock_find_duplicate,
+		mock_record_audit,
+		mock_emit_invalidation,
+	):
+		import threading
+
+		main_thread = threading.get_ident()
+		put_threads = []
+		upsert_threads = []
+
+		def fake_put(_bucket, name, data, length, **kwargs):
+			put_threads.append(threading.get_ident())
+			if name.endswith('b.pdf'):
+				raise Exception('MinIO no disponible')
+
+		def fake_upsert(**kwargs):
+			upsert_threads.append(threading.get_ident())
+			return SimpleNamespace(document=SimpleNamespace(id=kwargs['object_key']), domain_code='CONSTANCIA_ABONO')
+
+		mock_put_object.side_effect = fake_put
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc"', last_modified=datetime.utcnow())
+		mock_extract_text_from_bytes.return_value = ('texto', ['12345678'])
+		mock_upsert.side_effect = fake_upsert
+		mock_find_duplicate.return_value = None
+
+		uploads = [
+			SimpleUploadedFile(name, f'%PDF-1.4 {name}'.encode(), content_type='application/pdf')
+			for name in ('a.pdf', 'b.pdf', 'notas.txt', 'c.pdf')
+		]
+		request = self._request(files=SimpleNamespace(getlist=lambda _key: uploads), post={'folder': '2025/RESGUARDO'})
+		response = FilesUploadView().post(request)
+
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual([item['path'] for item in response.data['uploaded']], ['2025/RESGUARDO/a.pdf', '2025/RESGUARDO/c.pdf'])
+		self.assertEqual([item['filename'] for item in response.data['errors']], ['b.pdf', 'notas.txt'])
+		self.assertEqual(len(put_threads), 3)
+		self.assertNotIn(main_thread, put_threads)
+		self.assertEqual(upsert_threads, [main_thread, main_thread])
+		self.assertEqual([call.kwargs['object_key'] for call in mock_upsert.call_args_list], ['2025/RESGUARDO/a.pdf', '2025/RESGUARDO/c.pdf'])
+		mock_emit_invalidation.assert_called_once()
+
+	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
+	@patch('documents.views.record_audit_event')
+	@patch('documents.views._find_active_duplicate_by_hash_size')
+	@patch('documents.views.upsert_document_from_upload')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_files_upload_blocks_duplicates_within_the_same_request(
+		self,
+		mock_put_object,
+		mock_stat_object,
+		mock_extract_text_from_bytes,
+		mock_upsert,
+		mock_find_duplicate,
+		mock_record_audit,
+	):
+		"""El mismo PDF dos veces en una petición se sube e indexa una sola vez."""
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc"', last_modified=datetime.utcnow())
+		mock_extract_text_from_bytes.return_value = ('texto', ['12345678'])
+		mock_upsert.side_effect = lambda **kwargs: SimpleNamespace(
+			document=SimpleNamespace(id=kwargs['object_key']), domain_code='CONSTANCIA_ABONO',
+		)
+		mock_find_duplicate.return_value = None
+
+		uploads = [
+			SimpleUploadedFile('a.pdf', b'%PDF-1.4 mismo contenido', content_type='application/pdf'),
+			SimpleUploadedFile('a.pdf', b'%PDF-1.4 mismo contenido', content_type='application/pdf'),
+			SimpleUploadedFile('copia.pdf', b'%PDF-1.4 mismo contenido', content_type='application/pdf'),
+			SimpleUploadedFile('a.pdf', b'%PDF-1.4 otra version', content_type='application/pdf'),
+		]
+		request = self._request(files=SimpleNamespace(getlist=lambda _key: uploads), post={'folder': '2025/RESGUARDO'})
+		response = FilesUploadView().post(request)
+
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual([item['path'] for item in response.data['uploaded']], ['2025/RESGUARDO/a.pdf'])
+		self.assertEqual(
+			[(item['filename'], item['code']) for item in response.data['errors']],
+			[('a.pdf', 'DUPLICATE_FILE'), ('copia.pdf', 'DUPLICATE_FILE'), ('a.pdf', 'OBJECT_KEY_CONFLICT')],
+		)
+		self.assertEqual(response.data['errors'][0]['duplicate_in_request'], 'a.pdf')
+		mock_put_object.assert_called_once()
+		mock_upsert.assert_called_once()
+
+	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
+	@patch('documents.views.settings.DOCREPO_AUTO_ROUTE_UPLOAD_ENABLED', True)
+	@patch('documents.views.record_audit_event')
+	@patch('documents.views._find_active_duplicate_by_hash_size')
+	@patch('documents.views.upsert_document_from_upload')
+	@patch('documents.views.build_auto_storage_prefix')
+	@patch('documents.views.infer_upload_metadata')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_files_upload_commits_classify_preview_by_token(
+		self,
+		mock_put_object,
+		mock_stat_object,
+		mock_extract_text_from_bytes,
+		mock_infer_upload_metadata,
+		mock_build_auto_storage_prefix,
+		mock_upsert,
+		mock_find_duplicate,
+		mock_record_audit,
+	):
+		import os
+		import shutil
+		import tempfile
+		from django.http import QueryDict
+
+		staging_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, staging_dir, True)
+		content = b'%PDF-1.4 staged content'
+		put_bodies = []
+
+		mock_extract_text_from_bytes.return_value = ('CONSTANCIA 12345678', ['12345678'])
+		mock_infer_upload_metadata.return_value = {
+			'domain_code': 'CONSTANCIA_ABONO', 'año': '2026', 'mes': '01',
+			'razon_social': 'RESGUARDO', 'banco': 'BCP', 'tipo_documento': 'CONSTANCIA',
+		}
+		mock_build_auto_storage_prefix.return_value = '2026/RESGUARDO/01.ENERO/BCP'
+		mock_find_duplicate.return_value = None
+		mock_put_object.side_effect = lambda _bucket, _name, data, length, **kwargs: put_bodies.append(data.read())
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc"', last_modified=datetime.utcnow())
+		mock_upsert.return_value = SimpleNamespace(document=SimpleNamespace(id='doc-1'), domain_code='CONSTANCIA_ABONO')
+
+		with patch('documents.uploadstage.settings.UPLOAD_STAGING_DIR', staging_dir):
+			upload = SimpleUploadedFile('constancia.pdf', content, content_type='application/pdf')
+			preview = FilesClassifyPreviewView().post(self._request(
+				files=SimpleNamespace(getlist=lambda _key: [upload]),
+				post={'upload_mode': 'auto', 'stage_bytes': 'true'},
+			))
+			self.assertEqual(preview.status_code, 200)
+			token = preview.data['preview_token']
+			staged_id = preview.data['files'][0]['staged_id']
+			self.assertEqual(staged_id, '0')
+
+			post = QueryDict(mutable=True)
+			post.update({'upload_mode': 'auto', 'preview_token': token})
+			post.setlist('staged_files[]', [staged_id])
+			response = FilesUploadView().post(self._request(post=post))
+
+			self.assertEqual(response.status_code, 201)
+			self.assertEqual(response.data['uploaded'][0]['path'], '2026/RESGUARDO/01.ENERO/BCP/constancia.pdf')
+			self.assertEqual(put_bodies, [content])
+			mock_extract_text_from_bytes.assert_called_once()
+			self.assertEqual(mock_upsert.call_args.kwargs['employee_codes'], ['12345678'])
+			self.assertFalse(os.path.exists(os.path.join(staging_dir, token, '0.pdf')))
+
+			# Los bytes ya se consumieron y otro usuario no puede usar el token
+			retry = FilesUploadView().post(self._request(post=post))
+			self.assertEqual(retry.data['code'], 'PREVIEW_TOKEN_INVALID')
+			other = self._request(post=post)
+			other.user = SimpleNamespace(id=2002, pk=2002, is_authenticated=True, is_staff=True)
+			self.assertEqual(FilesUploadView().post(other).data['code'], 'PREVIEW_TOKEN_INVALID')
+
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views.deactivate_document_by_storage_key')
 	@patch('documents.views.PDFIndex.objects.filter')
@@ -778,6 +1014,64 @@ class DocrepoFileManagementViewsUnitTests(TestCase):
 		self.assertEqual(response.data['folders'][1]['name'], 'TREGISTRO')
 		self.assertEqual(response.data['folders'][1]['count'], 1)
 
+	@patch('documents.views.Document.objects.filter')
+	def test_folders_list_returns_304_when_etag_matches_index_generation(self, mock_document_filter):
+		mock_document_filter.return_value.values.return_value = [
+			{'storage_object__object_key': '2025/RESGUARDO/01.ENERO/BCP/archivo_1.pdf', 'source_path_legacy': ''},
+		]
+
+		first = FoldersListView().get(self._request(query_params={'parent': '2025/'}))
+
+		self.assertEqual(first.status_code, 200)
+		self.assertTrue(first['ETag'])
+		self.assertTrue(first['Last-Modified'])
+		self.assertEqual(first['Cache-Control'], 'private, no-cache')
+
+		revalidation = self._request(query_params={'parent': '2025/'})
+		revalidation.method = 'GET'
+		revalidation.META = {'HTTP_IF_NONE_MATCH': first['ETag']}
+		second = FoldersListView().get(revalidation)
+
+		self.assertEqual(second.status_code, 304)
+		self.assertEqual(second['ETag'], first['ETag'])
+		self.assertEqual(mock_document_filter.call_count, 1)
+
+	@patch('documents.views.Document.objects.filter')
+	def test_folders_list_etag_changes_with_index_generation_and_params(self, mock_document_filter):
+		from docrepo.cache import bump_index_generation
+
+		mock_document_filter.return_value.values.return_value = []
+
+		first = FoldersListView().get(self._request(query_params={'parent': '2025/'}))
+		other_parent = FoldersListView().get(self._request(query_params={'parent': '2026/'}))
+		self.assertNotEqual(first['ETag'], other_parent['ETag'])
+
+		bump_index_generation()
+		revalidation = self._request(query_params={'parent': '2025/'})
+		revalidation.method = 'GET'
+		revalidation.META = {'HTTP_IF_NONE_MATCH': first['ETag']}
+		second = FoldersListView().get(revalidation)
+
+		self.assertEqual(second.status_code, 200)
+		self.assertNotEqual(second['ETag'], first['ETag'])
+
+	@patch('documents.views.Document.objects.filter')
+	def test_folders_list_etag_does_not_repeat_after_generation_counters_are_lost(self, mock_document_filter):
+		"""Si el cache de estado pierde los contadores, un ETag viejo no devuelve 304."""
+		from docrepo.cache import state_cache
+
+		mock_document_filter.return_value.values.return_value = []
+
+		first = FoldersListView().get(self._request(query_params={'parent': '2025/'}))
+		state_cache().clear()
+		revalidation = self._request(query_params={'parent': '2025/'})
+		revalidation.method = 'GET'
+		revalidation.META = {'HTTP_IF_NONE_MATCH': first['ETag']}
+		second = FoldersListView().get(revalidation)
+
+		self.assertEqual(second.status_code, 200)
+		self.assertNotEqual(second['ETag'], first['ETag'])
+
 	@patch('documents.views.Document.objects.filter')
 	def test_bulk_search_returns_hits_and_missing_codes(self, mock_document_filter):
 		record = SimpleNamespace(
@@ -828,6 +1122,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 			is_authenticated=True,
 			is_staff=True,
 		)
+		cache.clear()
 
 	def _request(self, data=None, query_params=None, files=None, post=None):
 		return SimpleNamespace(
@@ -871,13 +1166,57 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		self.assertEqual(response.status_code, 200)
 		self.assertEqual(response.data['domain_filter'], 'SEGUROS')
 
+	@patch('documents.views.Document.objects.filter')
+	def test_folder_options_served_from_cache_until_index_changes(self, mock_document_filter):
+		"""Las opciones se cachean hasta que cambia la generación del índice."""
+		from docrepo.cache import bump_index_generation
+
+		mock_document_filter.return_value.values.return_value = [
+			{'storage_object__object_key': 'Planillas 2026/RESGUARDO/01.ENERO/BCP/file1.pdf', 'source_path_legacy': ''},
+		]
+
+		first = FolderOptionsView().get(self._request(query_params={'domain': 'CONSTANCIA_ABONO'}))
+		second = FolderOptionsView().get(self._request(query_params={'domain': 'CONSTANCIA_ABONO'}))
+
+		self.assertFalse(first.data['cached'])
+		self.assertTrue(second.data['cached'])
+		self.assertEqual(second.data['folders'], first.data['folders'])
+		self.assertEqual(mock_document_filter.call_count, 1)
+
+		bump_index_generation()
+		third = FolderOptionsView().get(self._request(query_params={'domain': 'CONSTANCIA_ABONO'}))
+
+		self.assertFalse(third.data['cached'])
+		self.assertEqual(mock_document_filter.call_count, 2)
+
+	@patch('documents.views.Document.objects.filter')
+	def test_folder_options_drill_down_reads_only_parent_subtree(self, mock_document_filter):
+		"""GET /api/folders/options?parent=... filtra por prefijo y dominio."""
+		mock_document_filter.return_value.values.return_value = [
+			{'storage_object__object_key': 'Planillas 2026/RESGUARDO/01.ENERO/BCP/file1.pdf', 'source_path_legacy': ''},
+			{'storage_object__object_key': 'Planillas 2026/RESGUARDO/02.FEBRERO/BCP/file2.pdf', 'source_path_legacy': ''},
+		]
+
+		request = self._request(query_params={'parent': 'Planillas 2026/RESGUARDO', 'domain': 'SEGUROS'})
+		response = FolderOptionsView().get(request)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['current_path'], 'Planillas 2026/RESGUARDO/')
+		self.assertEqual(
+			[folder['path'] for folder in response.data['folders']],
+			['Planillas 2026/RESGUARDO/01.ENERO/', 'Planillas 2026/RESGUARDO/02.FEBRERO/'],
+		)
+		query = mock_document_filter.call_args[0][0]
+		self.assertIn(('storage_object__object_key__startswith', 'Planillas 2026/RESGUARDO/'), query.children)
+		self.assertIn(('domain__code', 'SEGUROS'), query.children)
+
 	@patch('documents.views.settings.DOCREPO_DUAL_WRITE_LEGACY_ENABLED', False)
 	@patch('documents.views.settings.DOCREPO_AUTO_ROUTE_UPLOAD_ENABLED', True)
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.build_auto_storage_prefix')
 	@patch('documents.views.infer_upload_metadata')
-	@patch('documents.views.extract_text_from_pdf_bytes')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
 	def test_files_classify_preview_accepts_upload_mode_auto(
 		self,
 		mock_extract_text_from_bytes,
@@ -887,10 +1226,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/classify-preview con upload_mode=auto."""
-		fake_upload = SimpleNamespace(
-			name='planilla_test.pdf',
-			read=lambda: b'%PDF-1.4 test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_test.pdf', b'%PDF-1.4 test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_extract_text_from_bytes.return_value = ('PLANILLA', [])
@@ -919,10 +1255,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/classify-preview con upload_mode=manual sin folder retorna error."""
-		fake_upload = SimpleNamespace(
-			name='planilla_test.pdf',
-			read=lambda: b'%PDF-1.4 test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_test.pdf', b'%PDF-1.4 test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		request = self._request(files=files, post={'upload_mode': 'manual'})
@@ -937,7 +1270,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.build_auto_storage_prefix')
 	@patch('documents.views.infer_upload_metadata')
-	@patch('documents.views.extract_text_from_pdf_bytes')
+	@patch('documents.uploadstream.extract_text_from_pdf_bytes')
 	def test_files_classify_preview_manual_mode_with_folder(
 		self,
 		mock_extract_text_from_bytes,
@@ -947,10 +1280,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/classify-preview con upload_mode=manual y folder."""
-		fake_upload = SimpleNamespace(
-			name='planilla_test.pdf',
-			read=lambda: b'%PDF-1.4 test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_test.pdf', b'%PDF-1.4 test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_extract_text_from_bytes.return_value = ('PLANILLA', [])
@@ -978,7 +1308,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.upsert_document_from_upload')
-	@patch('documents.views.extract_text_from_pdf')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
 	@patch('documents.views.extract_metadata')
 	@patch('documents.views.minio_client.stat_object')
 	@patch('documents.views.minio_client.put_object')
@@ -993,10 +1323,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/upload con allow_duplicate=true permite re-ingreso."""
-		fake_upload = SimpleNamespace(
-			name='duplicado_reingreso.pdf',
-			read=lambda: b'%PDF-1.4 reingreso content',
-		)
+		fake_upload = SimpleUploadedFile('duplicado_reingreso.pdf', b'%PDF-1.4 reingreso content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		# Simular que hay un duplicado
@@ -1039,7 +1366,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 	@patch('documents.views.record_audit_event')
 	@patch('documents.views._find_active_duplicate_by_hash_size')
 	@patch('documents.views.upsert_document_from_upload')
-	@patch('documents.views.extract_text_from_pdf')
+	@patch('documents.views.extract_text_and_hashes_from_pdf')
 	@patch('documents.views.extract_metadata')
 	@patch('documents.views.minio_client.stat_object')
 	@patch('documents.views.minio_client.put_object')
@@ -1054,10 +1381,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/upload con upload_mode=manual usa folder especificado."""
-		fake_upload = SimpleNamespace(
-			name='planilla_manual.pdf',
-			read=lambda: b'%PDF-1.4 manual test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_manual.pdf', b'%PDF-1.4 manual test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		mock_find_duplicate.return_value = None
@@ -1099,10 +1423,7 @@ class FolderOptionsAndUploadModeTests(TestCase):
 		mock_record_audit,
 	):
 		"""POST /api/files/upload con upload_mode=manual sin folder retorna error."""
-		fake_upload = SimpleNamespace(
-			name='planilla_test.pdf',
-			read=lambda: b'%PDF-1.4 test content',
-		)
+		fake_upload = SimpleUploadedFile('planilla_test.pdf', b'%PDF-1.4 test content', content_type='application/pdf')
 		files = SimpleNamespace(getlist=lambda _key: [fake_upload])
 
 		request = self._request(files=files, post={'upload_mode': 'manual'})
@@ -1110,3 +1431,1274 @@ class FolderOptionsAndUploadModeTests(TestCase):
 
 		self.assertEqual(response.status_code, 400)
 		self.assertEqual(response.data['code'], 'MANUAL_MODE_REQUIRES_FOLDER')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, MINIO_BUCKET='test-bucket')
+class DocrepoServiceIntegrationTests(APITestCase):
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			username='facet_tester',
+			password='safe-password-123',
+			is_staff=True,
+		)
+		self.client.force_authenticate(user=self.user)
+
+	def _ingest(self, object_key, razon_social, banco='BCP', tipo='CUADRO DE PERSONAL'):
+		from docrepo.services import upsert_document_from_upload
+
+		return upsert_document_from_upload(
+			object_key=object_key,
+			metadata={'año': '2025', 'mes': '03', 'razon_social': razon_social, 'banco': banco, 'tipo_documento': tipo},
+			size_bytes=1024,
+			etag='etag',
+			last_modified=None,
+			employee_codes=['12345678'],
+			is_indexed=True,
+		)
+
+	def _facet_counts(self):
+		from docrepo.models import DocumentFacet
+
+		return {
+			(row.facet, row.value): row.document_count
+			for row in DocumentFacet.objects.filter(domain_code='CONSTANCIA_ABONO')
+		}
+
+	def test_services_maintain_facet_counts_incrementally_and_match_rebuild(self):
+		from docrepo.facets import rebuild_facets
+		from docrepo.services import deactivate_document_by_storage_key
+
+		self._ingest('2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		self._ingest('2025/RESGUARDO/03.MARZO/BCP/b.pdf', 'RESGUARDO')
+		self._ingest('2025/FACILITIES/03.MARZO/BBVA/c.pdf', 'FACILITIES', banco='BBVA')
+
+		counts = self._facet_counts()
+		self.assertEqual(counts[('COMPANY', 'RESGUARDO')], 2)
+		self.assertEqual(counts[('BANK', 'BBVA')], 1)
+		self.assertEqual(counts[('YEAR', '2025')], 3)
+
+		# Reclasificación: el documento pasa de RESGUARDO a FACILITIES.
+		self._ingest('2025/RESGUARDO/03.MARZO/BCP/b.pdf', 'FACILITIES')
+		deactivate_document_by_storage_key(object_key='2025/FACILITIES/03.MARZO/BBVA/c.pdf')
+
+		counts = self._facet_counts()
+		self.assertEqual(counts[('COMPANY', 'RESGUARDO')], 1)
+		self.assertEqual(counts[('COMPANY', 'FACILITIES')], 1)
+		self.assertNotIn(('BANK', 'BBVA'), counts)
+		self.assertEqual(counts[('YEAR', '2025')], 2)
+
+		rebuild_facets()
+		self.assertEqual(self._facet_counts(), counts)
+
+	def test_filter_options_v2_reads_facet_table_with_counts(self):
+		from docrepo.facets import rebuild_facets
+
+		self._ingest('2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		rebuild_facets(domain_code='CONSTANCIA_ABONO')
+		self._ingest('2025/FACILITIES/03.MARZO/BCP/b.pdf', 'FACILITIES')
+
+		response = self.client.get('/api/v2/filter-options', {'domain': 'CONSTANCIA_ABONO'})
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['años'], ['2025'])
+		self.assertEqual(response.data['razones_sociales'], ['FACILITIES', 'RESGUARDO'])
+		self.assertEqual(response.data['bancos'], ['BCP'])
+		self.assertEqual(response.data['counts']['bancos'], {'BCP': 2})
+		self.assertEqual(response.data['counts']['razones_sociales'], {'FACILITIES': 1, 'RESGUARDO': 1})
+
+	def test_filter_options_v2_uses_live_queries_until_facets_are_rebuilt(self):
+		"""Filas incrementales sin rebuild no ocultan documentos históricos."""
+		from docrepo.facets import rebuild_facets
+		from docrepo.models import DocumentFacet
+
+		self._ingest('2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		# Documento histórico: ingresado antes de existir la tabla de facetas
+		DocumentFacet.objects.all().delete()
+		self._ingest('2025/FACILITIES/03.MARZO/BBVA/b.pdf', 'FACILITIES', banco='BBVA')
+		self.assertTrue(DocumentFacet.objects.exists())
+
+		response = self.client.get('/api/v2/filter-options', {'domain': 'CONSTANCIA_ABONO'})
+		self.assertEqual(response.data['razones_sociales'], ['FACILITIES', 'RESGUARDO'])
+		self.assertEqual(response.data['bancos'], ['BBVA', 'BCP'])
+		self.assertEqual(response.data['counts'], {})
+
+		rebuild_facets()
+		response = self.client.get('/api/v2/filter-options', {'domain': 'CONSTANCIA_ABONO'})
+		self.assertEqual(response.data['counts']['razones_sociales'], {'FACILITIES': 1, 'RESGUARDO': 1})
+		self.assertEqual(response.data['counts']['bancos'], {'BBVA': 1, 'BCP': 1})
+
+	def test_v2_search_returns_facet_counts_for_full_result_set(self):
+		self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BBVA/b.pdf', 'RESGUARDO', banco='BBVA')
+		self._ingest('Planillas 2025/FACILITIES/03.MARZO/BCP/c.pdf', 'FACILITIES')
+
+		response = self.client.get('/api/v2/constancias/search/', {'año': '2025', 'facets': 'true'})
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['total'], 3)
+		facets = response.data['facets']
+		self.assertEqual(facets['años'], [{'value': '2025', 'count': 3}])
+		self.assertEqual(facets['meses'], [{'value': '03', 'count': 3}])
+		self.assertEqual(
+			facets['razones_sociales'],
+			[{'value': 'RESGUARDO', 'count': 2}, {'value': 'FACILITIES', 'count': 1}],
+		)
+		self.assertEqual(facets['bancos'], [{'value': 'BCP', 'count': 2}, {'value': 'BBVA', 'count': 1}])
+
+		without_facets = self.client.get('/api/v2/constancias/search/', {'año': '2025'})
+		self.assertNotIn('facets', without_facets.data)
+
+
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_v2_zip_download_streams_documents(self, mock_get_object):
+		import io
+		import zipfile
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		from documents.models import DownloadLog
+
+		mock_get_object.side_effect = lambda _bucket, key: SimpleNamespace(
+			read=lambda: b'%PDF-' + key.encode(), close=lambda: None, release_conn=lambda: None,
+		)
+		first = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		second = self._ingest('Planillas 2025/FACILITIES/03.MARZO/BCP/a.pdf', 'FACILITIES')
+
+		response = self.client.post(
+			'/api/v2/documents/download-zip',
+			{'document_ids': [str(first.document.id), str(second.document.id)]},
+			format='json',
+		)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.streaming)
+		self.assertEqual(response['X-Files-Zipped'], '2')
+		self.assertEqual(DownloadLog.objects.count(), 0)
+
+		with CaptureQueriesContext(connection) as queries:
+			archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+		self.assertEqual(sorted(archive.namelist()), ['001_a.pdf', '002_a.pdf'])
+
+		# Las filas de DownloadLog se escriben juntas al cerrar el stream
+		log_inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "download_log"')]
+		self.assertEqual(len(log_inserts), 1)
+		self.assertEqual(
+			sorted(DownloadLog.objects.values_list('filename', flat=True)),
+			['Planillas 2025/FACILITIES/03.MARZO/BCP/a.pdf', 'Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf'],
+		)
+
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_v2_zip_download_records_audit_event_when_client_disconnects(self, mock_get_object):
+		from auditlog.models import AuditEvent
+
+		mock_get_object.side_effect = lambda _bucket, key: SimpleNamespace(
+			read=lambda: b'%PDF-' + key.encode(), close=lambda: None, release_conn=lambda: None,
+		)
+		first = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		second = self._ingest('Planillas 2025/FACILITIES/03.MARZO/BCP/a.pdf', 'FACILITIES')
+
+		response = self.client.post(
+			'/api/v2/documents/download-zip',
+			{'document_ids': [str(first.document.id), str(second.document.id)]},
+			format='json',
+		)
+		next(iter(response.streaming_content))
+		# El cliente corta la conexión: Django cierra la respuesta sin agotar el generador
+		response.close()
+
+		event = AuditEvent.objects.get(action='DOC_ZIP_DOWNLOAD_SUCCEEDED')
+		self.assertEqual(event.metadata['documents_requested'], 2)
+		self.assertLess(event.metadata['files_zipped'], 2)
+
+	@override_settings(DOWNLOAD_DELIVERY_MODE='presigned', MINIO_PUBLIC_ENDPOINT='')
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_presigned_mode_redirects_after_audit(self, mock_minio):
+		from auditlog.models import AuditEvent
+		from documents.delivery import _public_minio_client
+		from documents.models import DownloadLog
+
+		# El cliente público se memoiza: sin endpoint propio sería el mock de otro test
+		_public_minio_client.cache_clear()
+		self.addCleanup(_public_minio_client.cache_clear)
+
+		mock_minio.presigned_get_object.return_value = 'https://minio.local/test-bucket/a.pdf?X-Amz-Signature=abc'
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+
+		response = self.client.get(f'/api/v2/documents/{ingested.document.id}/download')
+
+		self.assertEqual(response.status_code, 302)
+		self.assertEqual(response['Location'], 'https://minio.local/test-bucket/a.pdf?X-Amz-Signature=abc')
+		mock_minio.get_object.assert_not_called()
+		kwargs = mock_minio.presigned_get_object.call_args.kwargs
+		self.assertEqual(kwargs['response_headers']['response-content-disposition'], 'attachment; filename="a.pdf"')
+		self.assertEqual(DownloadLog.objects.filter(filename='Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf').count(), 1)
+		self.assertTrue(AuditEvent.objects.filter(action='DOC_DOWNLOAD_SUCCEEDED').exists())
+
+	@override_settings(DOWNLOAD_DELIVERY_MODE='accel', DOWNLOAD_ACCEL_PREFIX='/_minio_internal/')
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_accel_mode_hands_off_to_nginx(self, mock_minio):
+		mock_minio.presigned_get_object.return_value = 'http://minio:9000/test-bucket/a%20b.pdf?X-Amz-Signature=abc'
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a b.pdf', 'RESGUARDO')
+
+		response = self.client.get(f'/api/v2/documents/{ingested.document.id}/download')
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['X-Accel-Redirect'], '/_minio_internal/test-bucket/a%20b.pdf?X-Amz-Signature=abc')
+		self.assertEqual(response['Content-Disposition'], 'attachment; filename="a b.pdf"')
+		self.assertEqual(response.content, b'')
+
+	@override_settings(DOWNLOAD_DELIVERY_MODE='presigned')
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_presigned_mode_keeps_404_for_missing_object(self, mock_minio):
+		from auditlog.models import AuditEvent
+
+		mock_minio.stat_object.side_effect = Exception('NoSuchKey')
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+
+		response = self.client.get(f'/api/v2/documents/{ingested.document.id}/download')
+
+		self.assertEqual(response.status_code, 404)
+		mock_minio.presigned_get_object.assert_not_called()
+		self.assertTrue(AuditEvent.objects.filter(action='DOC_DOWNLOAD_FAILED').exists())
+
+	def _mock_ranged_object(self, mock_minio, data, etag='abc123'):
+		from datetime import timezone as dt_timezone
+
+		mock_minio.stat_object.return_value = SimpleNamespace(
+			size=len(data), etag=etag, last_modified=datetime(2025, 3, 1, 12, 0, tzinfo=dt_timezone.utc),
+		)
+
+		def get_object(_bucket, _key, offset=0, length=0):
+			chunk = data[offset:offset + length] if length else data[offset:]
+			return SimpleNamespace(stream=lambda amt: iter([chunk]), headers={})
+
+		mock_minio.get_object.side_effect = get_object
+
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_serves_byte_range_with_206(self, mock_minio):
+		self._mock_ranged_object(mock_minio, b'%PDF-0123456789')
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		url = f'/api/v2/documents/{ingested.document.id}/download'
+
+		response = self.client.get(url, HTTP_RANGE='bytes=5-9')
+
+		self.assertEqual(response.status_code, 206)
+		self.assertEqual(b''.join(response.streaming_content), b'01234')
+		self.assertEqual(response['Content-Range'], 'bytes 5-9/15')
+		self.assertEqual(response['Content-Length'], '5')
+		self.assertEqual(response['Accept-Ranges'], 'bytes')
+		self.assertEqual(mock_minio.get_object.call_args.kwargs, {'offset': 5, 'length': 5})
+
+		suffix = self.client.get(url, HTTP_RANGE='bytes=-3', HTTP_IF_RANGE='"abc123"')
+		self.assertEqual(suffix.status_code, 206)
+		self.assertEqual(b''.join(suffix.streaming_content), b'789')
+
+		stale = self.client.get(url, HTTP_RANGE='bytes=5-9', HTTP_IF_RANGE='"otro-etag"')
+		self.assertEqual(stale.status_code, 200)
+		self.assertEqual(b''.join(stale.streaming_content), b'%PDF-0123456789')
+		self.assertEqual(stale['Content-Length'], '15')
+
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_logs_ranged_reads_once_with_real_status(self, mock_minio):
+		"""Un visor que pide el PDF por tramos cuenta como una descarga, con su estado y rango."""
+		from auditlog.models import AuditEvent
+		from documents.models import DownloadLog
+
+		self._mock_ranged_object(mock_minio, b'%PDF-0123456789')
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		url = f'/api/v2/documents/{ingested.document.id}/download'
+
+		for range_header in ('bytes=0-4', 'bytes=5-9', 'bytes=10-', 'bytes=50-'):
+			response = self.client.get(url, HTTP_RANGE=range_header)
+			if response.streaming:
+				b''.join(response.streaming_content)
+			response.close()
+
+		self.assertEqual(DownloadLog.objects.count(), 1)
+		event = AuditEvent.objects.get(action='DOC_DOWNLOAD_SUCCEEDED')
+		self.assertEqual(event.metadata['status_code'], 206)
+		self.assertEqual(event.metadata['byte_range'], 'bytes 0-4/15')
+
+	@patch('documents.utils.minio_client.get_object')
+	@patch('documents.utils.minio_client.stat_object')
+	def test_v2_download_serves_ranges_from_local_object_cache(self, mock_stat_object, mock_get_object):
+		import tempfile
+
+		cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(cache_dir.cleanup)
+		mock_minio = SimpleNamespace(stat_object=mock_stat_object, get_object=mock_get_object)
+		self._mock_ranged_object(mock_minio, b'%PDF-0123456789')
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		url = f'/api/v2/documents/{ingested.document.id}/download'
+
+		with override_settings(OBJECT_CACHE_MAX_BYTES=1024, OBJECT_CACHE_DIR=cache_dir.name):
+			first = self.client.get(url, HTTP_RANGE='bytes=5-9')
+			second = self.client.get(url)
+
+			self.assertEqual(first.status_code, 206)
+			self.assertEqual(b''.join(first.streaming_content), b'01234')
+			self.assertEqual(second.status_code, 200)
+			self.assertEqual(b''.join(second.streaming_content), b'%PDF-0123456789')
+			self.assertEqual(second['Content-Length'], '15')
+		self.assertEqual(mock_get_object.call_count, 1)
+
+	@patch('documents.delivery.minio_client')
+	def test_v2_download_rejects_unsatisfiable_range(self, mock_minio):
+		from documents.models import DownloadLog
+
+		self._mock_ranged_object(mock_minio, b'%PDF-0123456789')
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+
+		response = self.client.get(f'/api/v2/documents/{ingested.document.id}/download', HTTP_RANGE='bytes=50-')
+
+		self.assertEqual(response.status_code, 416)
+		self.assertEqual(response['Content-Range'], 'bytes */15')
+		mock_minio.get_object.assert_not_called()
+		self.assertEqual(DownloadLog.objects.count(), 0)
+
+	@patch('docrepo.management.commands.backfill_content_hashes.minio_client.get_object')
+	def test_backfill_content_hashes_enables_sha256_duplicate_lookup(self, mock_get_object):
+		import hashlib
+		from io import StringIO
+		from django.core.management import call_command
+		from docrepo.models import Document, StorageObject
+		from docrepo.services import deactivate_document_by_storage_key, upsert_document_from_upload
+		from documents.views import _find_active_duplicate_by_hash_size
+
+		contents = {
+			'Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf': b'%PDF-1.4 contenido a',
+			'Planillas 2025/RESGUARDO/03.MARZO/BCP/b.pdf': b'%PDF-1.4 contenido b',
+		}
+		for key in contents:
+			self._ingest(key, 'RESGUARDO')
+		# ETag multiparte: no sirve como MD5
+		StorageObject.objects.update(etag='abc-3')
+		mock_get_object.side_effect = lambda _bucket, key: SimpleNamespace(
+			stream=lambda _size: iter([contents[key]]),
+			headers={'ETag': '"abc-3"'},
+			close=lambda: None,
+			release_conn=lambda: None,
+		)
+
+		call_command('backfill_content_hashes', '--batch-size', '1', stdout=StringIO())
+
+		sha_a = hashlib.sha256(contents['Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf']).hexdigest()
+		storage_a = StorageObject.objects.get(object_key='Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf')
+		self.assertEqual(storage_a.checksum_sha256, sha_a)
+		self.assertEqual(storage_a.document.content_hash_sha256, sha_a)
+		self.assertEqual(mock_get_object.call_count, 2)
+
+		duplicate = _find_active_duplicate_by_hash_size(999, 'otro-md5', sha_a)
+		self.assertEqual(duplicate.object_key, storage_a.object_key)
+
+		# Re-ingreso forzado del mismo contenido en el mismo alcance: sin violar docrepo_doc_hash_scope_uniq
+		copy = upsert_document_from_upload(
+			object_key='Planillas 2025/RESGUARDO/03.MARZO/BCP/a_copia.pdf',
+			metadata={'año': '2025', 'mes': '03', 'razon_social': 'RESGUARDO', 'banco': 'BCP', 'tipo_documento': 'CUADRO DE PERSONAL'},
+			size_bytes=1024, etag='def-2', last_modified=None, employee_codes=[], is_indexed=True,
+			checksum_sha256=sha_a,
+		)
+		self.assertIsNone(Document.objects.get(pk=copy.document.pk).content_hash_sha256)
+
+		# Al desactivar el original se libera el hash para una nueva subida
+		deactivate_document_by_storage_key(object_key=storage_a.object_key)
+		self.assertIsNone(Document.objects.get(pk=storage_a.document.pk).content_hash_sha256)
+
+	def test_concurrent_ingest_of_same_content_keeps_hash_on_first_document(self):
+		from docrepo.models import Document, StorageObject
+		from docrepo.services import upsert_document_from_upload
+
+		sha = 'a' * 64
+		metadata = {'año': '2025', 'mes': '03', 'razon_social': 'RESGUARDO', 'banco': 'BCP', 'tipo_documento': 'CUADRO DE PERSONAL'}
+
+		def ingest(object_key):
+			return upsert_document_from_upload(
+				object_key=object_key, metadata=metadata, size_bytes=1024, etag='def-2',
+				last_modified=None, employee_codes=[], is_indexed=True, checksum_sha256=sha,
+			)
+
+		first = ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf')
+		# La otra subida pasó la comprobación antes de que la primera confirmara
+		with patch('docrepo.services._assign_content_hash', lambda document, checksum: setattr(document, 'content_hash_sha256', checksum)):
+			second = ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a_copia.pdf')
+
+		self.assertEqual(Document.objects.get(pk=first.document.pk).content_hash_sha256, sha)
+		self.assertIsNone(Document.objects.get(pk=second.document.pk).content_hash_sha256)
+		self.assertEqual(StorageObject.objects.get(document=second.document).checksum_sha256, sha)
+
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_resumable_upload_resumes_after_offset_mismatch_and_finalizes(self, mock_put_object, mock_stat_object):
+		import hashlib
+		import tempfile
+		import fitz
+		from docrepo.models import StorageObject
+
+		cache.clear()
+		upload_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(upload_dir.cleanup)
+		document = fitz.open()
+		document.new_page().insert_text((72, 72), 'Constancia 12345678')
+		content = document.tobytes()
+		document.close()
+		half = len(content) // 2
+		put_bodies = []
+		mock_put_object.side_effect = lambda _bucket, _name, data, length, **kwargs: put_bodies.append(data.read())
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc-2"', last_modified=None)
+
+		with override_settings(UPLOAD_RESUMABLE_DIR=upload_dir.name, PDF_WORKER_PROCESSES=0, DOCREPO_DUAL_WRITE_LEGACY_ENABLED=False):
+			created = self.client.post('/api/files/resumable', {
+				'filename': 'constancia.pdf', 'size': len(content), 'md5': hashlib.md5(content).hexdigest(),
+			}, format='json')
+			url = f"/api/files/resumable/{created.data['upload_id']}"
+			first = self.client.put(url, content[:half], content_type='application/octet-stream',
+									HTTP_CONTENT_RANGE=f'bytes 0-{half - 1}/{len(content)}')
+			# Reintento del primer tramo tras un corte: el servidor indica dónde seguir
+			repeated = self.client.put(url, content[:half], content_type='application/octet-stream',
+									   HTTP_CONTENT_RANGE=f'bytes 0-{half - 1}/{len(content)}')
+			early = self.client.post('/api/files/resumable/finalize', {'upload_ids[]': [created.data['upload_id']], 'folder': '2025/RESGUARDO'})
+			status = self.client.get(url)
+			rest = self.client.put(url, content[status.data['offset']:], content_type='application/octet-stream',
+								   HTTP_CONTENT_RANGE=f"bytes {status.data['offset']}-{len(content) - 1}/{len(content)}")
+			finalized = self.client.post('/api/files/resumable/finalize', {'upload_ids[]': [created.data['upload_id']], 'folder': '2025/RESGUARDO'})
+			after = self.client.get(url)
+
+		self.assertEqual(created.status_code, 201)
+		self.assertEqual(first.data['offset'], half)
+		self.assertEqual(repeated.status_code, 409)
+		self.assertEqual(repeated.data['offset'], half)
+		self.assertEqual(early.status_code, 409)
+		self.assertEqual(early.data['code'], 'UPLOAD_INCOMPLETE')
+		self.assertTrue(rest.data['complete'])
+		self.assertEqual(finalized.status_code, 201)
+		self.assertEqual(finalized.data['uploaded'][0]['path'], '2025/RESGUARDO/constancia.pdf')
+		self.assertEqual(put_bodies, [content])
+		storage = StorageObject.objects.get(object_key='2025/RESGUARDO/constancia.pdf')
+		self.assertEqual(storage.checksum_sha256, hashlib.sha256(content).hexdigest())
+		self.assertEqual(after.status_code, 404)
+
+	@patch('documents.views.minio_client.stat_object')
+	@patch('documents.views.minio_client.put_object')
+	def test_resumable_finalize_accepts_json_body(self, mock_put_object, mock_stat_object):
+		import hashlib
+		import tempfile
+		import fitz
+
+		cache.clear()
+		upload_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(upload_dir.cleanup)
+		document = fitz.open()
+		document.new_page().insert_text((72, 72), 'Constancia 12345678')
+		content = document.tobytes()
+		document.close()
+		mock_stat_object.return_value = SimpleNamespace(etag='"abc-1"', last_modified=None)
+
+		with override_settings(UPLOAD_RESUMABLE_DIR=upload_dir.name, PDF_WORKER_PROCESSES=0, DOCREPO_DUAL_WRITE_LEGACY_ENABLED=False):
+			created = self.client.post('/api/files/resumable', {
+				'filename': 'constancia.pdf', 'size': len(content), 'md5': hashlib.md5(content).hexdigest(),
+			}, format='json')
+			self.client.put(f"/api/files/resumable/{created.data['upload_id']}", content, content_type='application/octet-stream',
+							HTTP_CONTENT_RANGE=f'bytes 0-{len(content) - 1}/{len(content)}')
+			not_a_list = self.client.post('/api/files/resumable/finalize', {'upload_ids': created.data['upload_id']}, format='json')
+			finalized = self.client.post('/api/files/resumable/finalize', {
+				'upload_ids': [created.data['upload_id']], 'folder': '2025/RESGUARDO', 'upload_mode': 'manual',
+			}, format='json')
+
+		self.assertEqual(not_a_list.status_code, 400)
+		self.assertEqual(finalized.status_code, 201)
+		self.assertEqual(finalized.data['uploaded'][0]['path'], '2025/RESGUARDO/constancia.pdf')
+		self.assertEqual(mock_put_object.call_count, 1)
+
+	@patch('documents.bulkimport.minio_client.stat_object')
+	@patch('documents.bulkimport.minio_client.put_object')
+	def test_import_pdfs_from_zip_skips_duplicates_and_resumes_from_checkpoint(self, mock_put_object, mock_stat_object):
+		import json
+		import os
+		import tempfile
+		import zipfile
+		from io import StringIO
+		import fitz
+		from django.core.management import call_command
+		from docrepo.models import StorageObject
+
+		work_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(work_dir.cleanup)
+		contents = {}
+		for name, text in (('a.pdf', 'Constancia 12345678'), ('b.pdf', 'Constancia 87654321')):
+			document = fitz.open()
+			document.new_page().insert_text((72, 72), text)
+			contents[name] = document.tobytes()
+			document.close()
+		archive_path = os.path.join(work_dir.name, 'historico.zip')
+		with zipfile.ZipFile(archive_path, 'w') as archive:
+			archive.writestr('marzo/a.pdf', contents['a.pdf'])
+			archive.writestr('marzo/b.pdf', contents['b.pdf'])
+			archive.writestr('marzo/copia/a.pdf', contents['a.pdf'])
+			archive.writestr('marzo/notas.txt', b'sin pdf')
+		put_bodies = []
+		mock_put_object.side_effect = lambda _bucket, key, data, **_kwargs: put_bodies.append((key, data.read()))
+		mock_stat_object.return_value = SimpleNamespace(etag='"etag-bulk"', last_modified=None)
+		options = ['--folder', '2025/RESGUARDO', '--processes', '0', '--batch-size', '2']
+
+		call_command('import_pdfs', archive_path, '--dry-run', *options, stdout=StringIO())
+		self.assertEqual(put_bodies, [])
+		self.assertFalse(os.path.exists(f'{archive_path}.import.jsonl'))
+
+		out = StringIO()
+		call_command('import_pdfs', archive_path, *options, stdout=out)
+
+		self.assertEqual(sorted(key for key, _body in put_bodies), ['2025/RESGUARDO/a.pdf', '2025/RESGUARDO/b.pdf'])
+		self.assertEqual(dict(put_bodies)['2025/RESGUARDO/a.pdf'], contents['a.pdf'])
+		self.assertTrue(StorageObject.objects.filter(object_key='2025/RESGUARDO/b.pdf', document__is_active=True).exists())
+		with open(f'{archive_path}.import.jsonl', encoding='utf-8') as handle:
+			records = {record['name']: record for record in map(json.loads, handle)}
+		self.assertEqual(records['marzo/copia/a.pdf']['status'], 'duplicate')
+		self.assertEqual(records['marzo/copia/a.pdf']['duplicate_of'], '2025/RESGUARDO/a.pdf')
+		self.assertIn('Duplicates: 1', out.getvalue())
+
+		# Relanzar no vuelve a subir lo que ya figura en el checkpoint
+		put_bodies.clear()
+		out = StringIO()
+		call_command('import_pdfs', archive_path, *options, stdout=out)
+		self.assertEqual(put_bodies, [])
+		self.assertIn('already done: 3, pending: 0', out.getvalue())
+
+	@patch('documents.bulkimport.minio_client.remove_object')
+	@patch('documents.bulkimport.PDFIndex.objects.update_or_create')
+	def test_import_ingest_batch_only_fails_entries_whose_upsert_fails(self, mock_legacy_update, mock_remove_object):
+		from docrepo.models import StorageObject
+		from docrepo.services import upsert_document_from_upload
+		from documents.bulkimport import ImportEntry, ingest_batch
+
+		def entry(name, razon_social):
+			metadata = {'año': '2025', 'mes': '03', 'razon_social': razon_social, 'banco': 'BCP', 'tipo_documento': 'CUADRO DE PERSONAL'}
+			return ImportEntry(
+				name=name, size=10, md5=f'md5-{name}', sha256=f'sha-{name}', text='texto', codigos=['12345678'],
+				metadata=metadata, domain_code='CONSTANCIA_ABONO', object_key=f'2025/{razon_social}/03.MARZO/BCP/{name}',
+			)
+
+		def upsert(**kwargs):
+			if kwargs['object_key'].endswith('roto.pdf'):
+				raise ValueError('catálogo inválido')
+			return upsert_document_from_upload(**kwargs)
+
+		mock_legacy_update.side_effect = Exception('legacy caído')
+		broken = entry('roto.pdf', 'RESGUARDO')
+		stat = SimpleNamespace(etag='"etag"', last_modified=None)
+
+		with patch('documents.bulkimport.upsert_document_from_upload', side_effect=upsert), \
+				self.assertLogs('documents.bulkimport', level='WARNING') as logs:
+			failed = ingest_batch([(entry('a.pdf', 'RESGUARDO'), stat), (broken, stat)])
+
+		# Un fallo del espejo legacy no cuenta como error; uno del upsert sí, y su objeto se borra
+		self.assertEqual(list(failed), ['roto.pdf'])
+		self.assertTrue(any('Legacy mirror sync failed' in line for line in logs.output))
+		self.assertTrue(StorageObject.objects.filter(object_key='2025/RESGUARDO/03.MARZO/BCP/a.pdf').exists())
+		mock_remove_object.assert_called_once_with('test-bucket', broken.object_key)
+
+	def test_permissions_resolve_once_per_request_and_travel_in_the_access_token(self):
+		from django.contrib.auth.models import Group
+		from rest_framework_simplejwt.tokens import AccessToken
+		from documents.permissions import allowed_domains_for_user, can_manage_files, user_in_group
+		from documents.tokens import PermissionClaimsJWTAuthentication
+
+		cache.clear()
+		selector = get_user_model().objects.create_user(username='selector', password='safe-password-123')
+		selector.groups.add(Group.objects.create(name='Seleccion'))
+		self.client.force_authenticate(user=None)
+
+		login = self.client.post('/api/token/', {'username': 'selector', 'password': 'safe-password-123'}, format='json')
+		access = AccessToken(login.data['access'])
+		self.assertEqual(access['perms'], {'can_manage_files': False, 'domains': ['SEGUROS', 'TREGISTRO']})
+
+		# Con el claim del token la autorización no consulta grupos
+		user = PermissionClaimsJWTAuthentication().get_user(access)
+		with self.assertNumQueries(0):
+			self.assertFalse(can_manage_files(user))
+			self.assertEqual(allowed_domains_for_user(user), {'SEGUROS', 'TREGISTRO'})
+
+		# Sin claim: una sola consulta de grupos por usuario cargado
+		fresh = get_user_model().objects.get(pk=selector.pk)
+		with self.assertNumQueries(1):
+			self.assertFalse(can_manage_files(fresh))
+			self.assertEqual(allowed_domains_for_user(fresh), {'SEGUROS', 'TREGISTRO'})
+			self.assertTrue(user_in_group(fresh, 'seleccion'))
+
+		# El refresh vuelve a leer los grupos en vez de copiar el claim anterior
+		selector.groups.clear()
+		refreshed = self.client.post('/api/token/refresh/', {'refresh': login.data['refresh']}, format='json')
+		self.assertEqual(AccessToken(refreshed.data['access'])['perms'], {'can_manage_files': False, 'domains': []})
+
+	@patch('documents.utils.minio_client.put_object')
+	@patch('documents.utils.minio_client.bucket_exists', return_value=True)
+	def test_archive_audit_events_rolls_up_then_archives_months_past_retention(self, _mock_bucket_exists, mock_put_object):
+		import gzip
+		import json
+		from datetime import timedelta
+		from io import StringIO
+		from django.core.management import call_command
+		from django.utils import timezone
+		from auditlog.models import AuditArchive, AuditDailyRollup, AuditEvent
+
+		now = timezone.now()
+		old = now - timedelta(days=500)
+		for action in ('FILE_UPLOADED', 'FILE_UPLOADED', 'HTTP_POST'):
+			AuditEvent.objects.create(action=action, resource_type='file', actor=self.user, occurred_at=old)
+		AuditEvent.objects.create(action='FILE_UPLOADED', resource_type='file', occurred_at=now)
+		archived = {}
+		mock_put_object.side_effect = lambda bucket, key, data, length, **_kwargs: archived.update({key: data.read(length)})
+
+		call_command('archive_audit_events', '--retention-months', '12', stdout=StringIO())
+
+		old_rollup = AuditDailyRollup.objects.get(day=timezone.localtime(old).date(), action='FILE_UPLOADED')
+		self.assertEqual((old_rollup.event_count, old_rollup.actor_count), (2, 1))
+		self.assertEqual(list(AuditEvent.objects.values_list('occurred_at', flat=True)), [now])
+		archive = AuditArchive.objects.get()
+		self.assertEqual(archive.object_key, f'audit_event/{old:%Y-%m}.jsonl.gz')
+		lines = gzip.decompress(archived[archive.object_key]).decode('utf-8').splitlines()
+		self.assertEqual(sorted(json.loads(line)['action'] for line in lines), ['FILE_UPLOADED', 'FILE_UPLOADED', 'HTTP_POST'])
+		self.assertEqual(archive.row_count, 3)
+
+		# Rehacer rollups desde antes del archivo no borra los días ya archivados
+		call_command('archive_audit_events', '--rollup-since', f'{old:%Y-%m-%d}', stdout=StringIO())
+		self.assertTrue(AuditDailyRollup.objects.filter(day=timezone.localtime(old).date()).exists())
+		self.assertEqual(mock_put_object.call_count, 1)
+
+	@patch('documents.utils.minio_client.get_object')
+	@patch('documents.utils.minio_client.stat_object')
+	def test_v2_preview_renders_first_or_matching_page_and_caches_it(self, mock_stat_object, mock_get_object):
+		import tempfile
+		import fitz
+		from auditlog.models import AuditEvent
+
+		document = fitz.open()
+		document.new_page().insert_text((72, 72), 'Resumen general')
+		document.new_page().insert_text((72, 72), 'Trabajador 12345678')
+		data = document.tobytes()
+		document.close()
+
+		cache.clear()
+		cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(cache_dir.cleanup)
+		mock_stat_object.return_value = SimpleNamespace(etag='"v1"', size=len(data), last_modified=None)
+		mock_get_object.side_effect = lambda _bucket, _key: SimpleNamespace(
+			read=lambda: data, close=lambda: None, release_conn=lambda: None,
+		)
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		url = f'/api/v2/documents/{ingested.document.id}/preview'
+
+		with override_settings(PDF_WORKER_PROCESSES=0, PREVIEW_CACHE_MAX_BYTES=1024 * 1024, PREVIEW_CACHE_DIR=cache_dir.name):
+			first = self.client.get(url, {'width': 100})
+			again = self.client.get(url, {'width': 100}, HTTP_IF_NONE_MATCH=first['ETag'])
+			matching = self.client.get(url, {'codigo': '12345678', 'output_format': 'webp'})
+			matching_again = self.client.get(url, {'codigo': '12345678', 'output_format': 'webp'})
+			missing = self.client.get(url, {'codigo': '99999999'})
+			invalid = self.client.get(url, {'output_format': 'gif'})
+
+		self.assertEqual(first.status_code, 200)
+		self.assertEqual(first['Content-Type'], 'image/png')
+		self.assertEqual(first['X-Preview-Page'], '1')
+		self.assertTrue(b''.join(first.streaming_content).startswith(b'\x89PNG'))
+		self.assertEqual(again.status_code, 304)
+		self.assertEqual(matching['Content-Type'], 'image/webp')
+		self.assertEqual(matching['X-Preview-Page'], '2')
+		self.assertEqual(matching_again['ETag'], matching['ETag'])
+		self.assertEqual(missing.status_code, 404)
+		self.assertEqual(invalid.status_code, 400)
+		# Primera página, página con el código y búsqueda fallida; el resto sale del caché
+		self.assertEqual(mock_get_object.call_count, 3)
+		# El 304 no se audita
+		events = AuditEvent.objects.filter(action='DOC_PREVIEW_RENDERED').order_by('occurred_at', 'id')
+		self.assertEqual(
+			[(event.metadata['page'], event.metadata['width'], event.metadata['format']) for event in events],
+			[(1, 96, 'png'), (2, 256, 'webp'), (2, 256, 'webp')],
+		)
+		self.assertEqual({event.document_id for event in events}, {ingested.document.id})
+
+	@patch('docrepo.views.render_preview')
+	def test_v2_preview_returns_503_when_rendering_fails(self, mock_render_preview):
+		from auditlog.models import AuditEvent
+		from minio.error import S3Error
+
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		url = f'/api/v2/documents/{ingested.document.id}/preview'
+
+		mock_render_preview.side_effect = TimeoutError()
+		timed_out = self.client.get(url)
+		mock_render_preview.side_effect = S3Error(None, 'NoSuchKey', 'missing', 'a.pdf', 'req', 'host')
+		missing = self.client.get(url)
+
+		self.assertEqual(timed_out.status_code, 503)
+		self.assertEqual(missing.status_code, 404)
+		self.assertFalse(AuditEvent.objects.filter(action='DOC_PREVIEW_RENDERED').exists())
+
+	def _call_async_view(self, view, request, **kwargs):
+		from asgiref.sync import async_to_sync, sync_to_async
+
+		async def run():
+			response = await view(request, **kwargs)
+			content = b''
+			if response.streaming:
+				content = b''.join([chunk async for chunk in response.streaming_content])
+				await sync_to_async(response.close)()
+			return response, content
+
+		return async_to_sync(run)()
+
+	def _jwt_get(self, path, **extra):
+		from django.test import RequestFactory
+		from rest_framework_simplejwt.tokens import RefreshToken
+
+		token = RefreshToken.for_user(self.user).access_token
+		return RequestFactory().get(path, HTTP_AUTHORIZATION=f'Bearer {token}', **extra)
+
+	@patch('documents.asyncstorage.iter_object')
+	@patch('documents.asyncstorage.stat_object')
+	def test_async_v2_download_streams_range_and_logs_after_transfer(self, mock_stat_object, mock_iter_object):
+		from docrepo.async_views import AsyncDocumentDownloadV2View
+		from documents.models import DownloadLog
+
+		data = b'%PDF-0123456789'
+
+		async def stat_object(_key):
+			return {'size': len(data), 'etag': 'abc123', 'last_modified': None}
+
+		async def iter_object(_key, offset=0, length=None):
+			yield data[offset:offset + length]
+
+		mock_stat_object.side_effect = stat_object
+		mock_iter_object.side_effect = iter_object
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+		request = self._jwt_get('/download', HTTP_RANGE='bytes=0-4')
+
+		response, content = self._call_async_view(
+			AsyncDocumentDownloadV2View.as_view(), request, document_id=ingested.document.id,
+		)
+
+		self.assertEqual(response.status_code, 206)
+		self.assertTrue(response.is_async)
+		self.assertEqual(content, b'%PDF-')
+		self.assertEqual(response['Content-Range'], 'bytes 0-4/15')
+		self.assertEqual(DownloadLog.objects.get().filename, 'Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf')
+
+	@override_settings(DOWNLOAD_DELIVERY_MODE='presigned', MINIO_PUBLIC_ENDPOINT='')
+	@patch('documents.delivery.minio_client')
+	def test_async_v2_download_signs_presigned_url_off_the_event_loop(self, mock_minio):
+		import asyncio
+		from docrepo.async_views import AsyncDocumentDownloadV2View
+		from documents.delivery import _public_minio_client
+
+		# El cliente público se memoiza: sin endpoint propio sería el mock de otro test
+		_public_minio_client.cache_clear()
+		self.addCleanup(_public_minio_client.cache_clear)
+
+		signed_on_loop = []
+
+		def presigned_get_object(*args, **kwargs):
+			try:
+				asyncio.get_running_loop()
+				signed_on_loop.append(True)
+			except RuntimeError:
+				signed_on_loop.append(False)
+			return 'https://minio.local/test-bucket/a.pdf?X-Amz-Signature=abc'
+
+		mock_minio.presigned_get_object.side_effect = presigned_get_object
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+
+		response, _ = self._call_async_view(
+			AsyncDocumentDownloadV2View.as_view(), self._jwt_get('/download'), document_id=ingested.document.id,
+		)
+
+		self.assertEqual(response.status_code, 302)
+		self.assertEqual(response['Location'], 'https://minio.local/test-bucket/a.pdf?X-Amz-Signature=abc')
+		self.assertEqual(signed_on_loop, [False])
+
+	def test_async_views_apply_jwt_authentication(self):
+		from django.test import RequestFactory
+		from docrepo.async_views import AsyncDocumentDownloadV2View
+		from documents.async_views import AsyncMergePdfsView
+
+		ingested = self._ingest('Planillas 2025/RESGUARDO/03.MARZO/BCP/a.pdf', 'RESGUARDO')
+
+		anonymous, _ = self._call_async_view(
+			AsyncDocumentDownloadV2View.as_view(), RequestFactory().get('/download'), document_id=ingested.document.id,
+		)
+		wrong_method, _ = self._call_async_view(AsyncMergePdfsView.as_view(), self._jwt_get('/merge'))
+
+		self.assertEqual(anonymous.status_code, 401)
+		self.assertEqual(wrong_method.status_code, 405)
+
+class ObjectCacheTests(TestCase):
+	def setUp(self):
+		import tempfile
+
+		self.cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.cache_dir.cleanup)
+		overrides = override_settings(
+			OBJECT_CACHE_MAX_BYTES=20,
+			OBJECT_CACHE_MAX_ENTRY_BYTES=8,
+			OBJECT_CACHE_DIR=self.cache_dir.name,
+		)
+		overrides.enable()
+		self.addCleanup(overrides.disable)
+		patcher = patch('documents.objectcache._known_etags', {})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		self.sources = {}
+		patcher = patch('documents.objectcache.minio_client.get_object', side_effect=self._get_object)
+		self.mock_get_object = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def _get_object(self, _bucket, key):
+		data, etag = self.sources[key]
+		return SimpleNamespace(
+			stream=lambda amt: iter([data]),
+			headers={'ETag': f'"{etag}"'},
+			close=lambda: None,
+			release_conn=lambda: None,
+		)
+
+	def test_read_through_is_keyed_by_object_and_etag(self):
+		from documents.objectcache import object_cache_stats, read_object_bytes
+
+		self.sources['a.pdf'] = (b'%PDF-v1', 'v1')
+		self.assertEqual(read_object_bytes('a.pdf', etag='v1'), b'%PDF-v1')
+		self.assertEqual(read_object_bytes('a.pdf', etag='"v1"'), b'%PDF-v1')
+		self.assertEqual(self.mock_get_object.call_count, 1)
+
+		# El objeto cambió en MinIO: un ETag nuevo no reutiliza la entrada vieja
+		self.sources['a.pdf'] = (b'%PDF-v2', 'v2')
+		self.assertEqual(read_object_bytes('a.pdf', etag='v2'), b'%PDF-v2')
+		self.assertEqual(self.mock_get_object.call_count, 2)
+
+		stats = object_cache_stats()
+		self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+		self.assertEqual(stats['hit_ratio'], 0.3333)
+		self.assertEqual(stats['entries'], 2)
+
+	def test_evicts_least_recently_used_entries_over_budget(self):
+		import os
+		from documents.objectcache import _entry_path, read_object_bytes
+
+		for key in ('a.pdf', 'b.pdf', 'c.pdf'):
+			self.sources[key] = (b'%PDF-' + key[:1].encode() * 3, key)
+		read_object_bytes('a.pdf', etag='a.pdf')
+		read_object_bytes('b.pdf', etag='b.pdf')
+		os.utime(_entry_path('a.pdf', 'a.pdf'), (1, 1))
+		os.utime(_entry_path('b.pdf', 'b.pdf'), (2, 2))
+		read_object_bytes('a.pdf', etag='a.pdf')  # acierto: 'a' pasa a ser el más reciente
+
+		read_object_bytes('c.pdf', etag='c.pdf')
+
+		self.assertTrue(os.path.exists(_entry_path('a.pdf', 'a.pdf')))
+		self.assertFalse(os.path.exists(_entry_path('b.pdf', 'b.pdf')))
+		self.assertTrue(os.path.exists(_entry_path('c.pdf', 'c.pdf')))
+
+	@patch('documents.objectcache.evict')
+	@patch('documents.objectcache.minio_client.stat_object')
+	def test_lookups_without_etag_reuse_the_last_seen_and_evict_only_over_budget(self, mock_stat_object, mock_evict):
+		from documents.objectcache import object_cache_stats, read_object_bytes
+
+		self.sources['a.pdf'] = (b'%PDF-a', 'va')
+		self.sources['b.pdf'] = (b'%PDF-bb', 'vb')
+		mock_stat_object.return_value = SimpleNamespace(etag='"va"')
+
+		self.assertEqual(read_object_bytes('a.pdf'), b'%PDF-a')
+		self.assertEqual(read_object_bytes('a.pdf'), b'%PDF-a')
+		read_object_bytes('b.pdf', etag='vb')
+		# El segundo acierto usa el ETag recordado: un solo stat y ningún GET extra
+		mock_stat_object.assert_called_once()
+		self.assertEqual(self.mock_get_object.call_count, 2)
+		# 13 bytes de un presupuesto de 20: no se recorre el directorio
+		mock_evict.assert_not_called()
+
+		self.sources['c.pdf'] = (b'%PDF-ccc', 'vc')
+		read_object_bytes('c.pdf', etag='vc')
+		mock_evict.assert_called_once()
+		self.assertEqual((object_cache_stats()['hits'], object_cache_stats()['misses']), (1, 3))
+
+	def test_objects_over_entry_limit_are_served_without_caching(self):
+		from documents.objectcache import object_cache_stats, read_object_bytes
+
+		self.sources['big.pdf'] = (b'%PDF-' + b'x' * 20, 'big')
+
+		self.assertEqual(read_object_bytes('big.pdf', etag='big'), b'%PDF-' + b'x' * 20)
+		self.assertEqual(object_cache_stats()['entries'], 0)
+
+
+class StreamingZipTests(TestCase):
+	def test_stream_zip_writes_stored_entries_with_data_descriptors(self):
+		import io
+		import zipfile
+		from documents.zipstream import stream_zip
+
+		chunks = list(stream_zip([('a.pdf', b'%PDF-a' * 20000), ('b.pdf', b'%PDF-b')]))
+		archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+		self.assertGreater(len(chunks), 2)
+		self.assertIsNone(archive.testzip())
+		self.assertEqual([info.filename for info in archive.infolist()], ['a.pdf', 'b.pdf'])
+		self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+		self.assertTrue(all(info.flag_bits & 0x08 for info in archive.infolist()))
+		self.assertEqual(archive.read('b.pdf'), b'%PDF-b')
+
+	def test_parse_range_header_handles_open_suffix_and_invalid_ranges(self):
+		from documents.delivery import RangeNotSatisfiable, parse_range_header
+
+		self.assertEqual(parse_range_header('bytes=0-99', 50), (0, 49))
+		self.assertEqual(parse_range_header('bytes=10-', 50), (10, 49))
+		self.assertEqual(parse_range_header('bytes=-10', 50), (40, 49))
+		self.assertIsNone(parse_range_header('bytes=0-1,5-6', 50))
+		self.assertIsNone(parse_range_header('items=0-1', 50))
+		self.assertIsNone(parse_range_header('bytes=9-3', 50))
+		with self.assertRaises(RangeNotSatisfiable):
+			parse_range_header('bytes=50-', 50)
+
+	def test_prefetch_objects_keeps_order_and_reports_errors(self):
+		from documents.zipstream import prefetch_objects
+
+		def fetch(key):
+			if key == 'missing':
+				raise FileNotFoundError(key)
+			return key.encode()
+
+		results = list(prefetch_objects([(1, 'a'), (2, 'missing'), (3, 'c')], fetch=fetch, window=2))
+
+		self.assertEqual([item for item, _, _ in results], [1, 2, 3])
+		self.assertEqual(results[0][1], b'a')
+		self.assertIsInstance(results[1][2], FileNotFoundError)
+		self.assertEqual(results[2][1], b'c')
+
+	@patch('documents.downloadlog.DownloadLog')
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_merge_pdfs_zip_streams_archive_and_lists_failed_members(self, mock_get_object, mock_download_log):
+		import io
+		import zipfile
+
+		def get_object(_bucket, key):
+			if key.endswith('roto.pdf'):
+				raise Exception('NoSuchKey')
+			return SimpleNamespace(read=lambda: b'%PDF-' + key.encode(), close=lambda: None, release_conn=lambda: None)
+
+		mock_get_object.side_effect = get_object
+		request = SimpleNamespace(
+			data={'paths': ['A/uno.pdf', 'B/uno.pdf', 'C/roto.pdf'], 'output_format': 'zip'},
+			user=SimpleNamespace(id=1, is_authenticated=True),
+			META={},
+		)
+
+		response = MergePdfsView().post(request)
+
+		self.assertTrue(response.streaming)
+		archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+		self.assertEqual(archive.namelist(), ['001_uno.pdf', '002_uno.pdf', 'ERRORES.txt'])
+		self.assertEqual(archive.read('002_uno.pdf'), b'%PDF-B/uno.pdf')
+		self.assertIn(b'C/roto.pdf', archive.read('ERRORES.txt'))
+		mock_download_log.objects.bulk_create.assert_not_called()
+		response.close()
+		self.assertIn('ZIP:2_archivos', mock_download_log.call_args.kwargs['filename'])
+		mock_download_log.objects.bulk_create.assert_called_once()
+
+	@patch('documents.downloadlog.DownloadLog')
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_merge_pdfs_zip_logs_download_when_client_disconnects(self, mock_get_object, mock_download_log):
+		mock_get_object.side_effect = lambda _bucket, key: SimpleNamespace(
+			read=lambda: b'%PDF-' + key.encode(), close=lambda: None, release_conn=lambda: None,
+		)
+		request = SimpleNamespace(
+			data={'paths': ['A/uno.pdf', 'B/dos.pdf'], 'output_format': 'zip'},
+			user=SimpleNamespace(id=1, is_authenticated=True),
+			META={},
+		)
+
+		response = MergePdfsView().post(request)
+		next(iter(response.streaming_content))
+		response.close()
+
+		mock_download_log.objects.bulk_create.assert_called_once()
+		self.assertRegex(mock_download_log.call_args.kwargs['filename'], r'^ZIP:[01]_archivos_')
+
+	@patch('documents.downloadlog.DownloadLog')
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_merge_pdfs_spools_inputs_to_disk_and_keeps_order(self, mock_get_object, mock_download_log):
+		import fitz
+
+		def pdf_bytes(pages, width=595):
+			document = fitz.open()
+			for _ in range(pages):
+				document.new_page(width=width)
+			data = document.tobytes()
+			document.close()
+			return data
+
+		sources = {'A/uno.pdf': pdf_bytes(1, width=200), 'B/dos.pdf': pdf_bytes(2)}
+
+		def get_object(_bucket, key):
+			if key not in sources:
+				raise Exception('NoSuchKey')
+			data = sources[key]
+			return SimpleNamespace(
+				stream=lambda amt: (data[i:i + amt] for i in range(0, len(data), amt)),
+				close=lambda: None,
+				release_conn=lambda: None,
+			)
+
+		mock_get_object.side_effect = get_object
+		request = SimpleNamespace(
+			data={'paths': ['B/dos.pdf', 'X/falta.pdf', 'A/uno.pdf']},
+			user=SimpleNamespace(id=1, is_authenticated=True),
+			META={},
+		)
+
+		response = MergePdfsView().post(request)
+
+		self.assertEqual(response['X-Files-Merged'], '2')
+		self.assertEqual(response['X-Merge-Errors'], '1')
+		merged = fitz.open(stream=b''.join(response.streaming_content), filetype='pdf')
+		self.assertEqual(merged.page_count, 3)
+		self.assertEqual([int(page.rect.width) for page in merged], [595, 595, 200])
+		merged.close()
+		response.close()
+
+	@patch('documents.downloadlog.DownloadLog')
+	@patch('documents.utils.minio_client.stat_object')
+	@patch('documents.objectcache.minio_client.get_object')
+	def test_merge_results_are_cached_by_ordered_object_versions(self, mock_get_object, mock_stat_object, mock_download_log):
+		import tempfile
+
+		cache_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(cache_dir.cleanup)
+		etags = {'A/uno.pdf': 'e1', 'B/dos.pdf': 'e2'}
+		mock_stat_object.side_effect = lambda _bucket, key: SimpleNamespace(etag=f'"{etags[key]}"')
+		mock_get_object.side_effect = lambda _bucket, key: SimpleNamespace(
+			read=lambda: b'%PDF-' + key.encode(), close=lambda: None, release_conn=lambda: None,
+		)
+
+		def merge(paths):
+			request = SimpleNamespace(
+				data={'paths': paths, 'output_format': 'zip'},
+				user=SimpleNamespace(id=1, is_authenticated=True),
+				META={},
+			)
+			response = MergePdfsView().post(request)
+			content = b''.join(response.streaming_content)
+			response.close()
+			return response, content
+
+		with override_settings(MERGE_CACHE_MAX_BYTES=1024 * 1024, MERGE_CACHE_DIR=cache_dir.name):
+			first, first_content = merge(['A/uno.pdf', 'B/dos.pdf'])
+			second, second_content = merge(['A/uno.pdf', 'B/dos.pdf'])
+			reordered, _ = merge(['B/dos.pdf', 'A/uno.pdf'])
+			etags['B/dos.pdf'] = 'e3'
+			changed, _ = merge(['A/uno.pdf', 'B/dos.pdf'])
+
+		self.assertEqual(first['X-Merge-Cache'], 'MISS')
+		self.assertEqual(second['X-Merge-Cache'], 'HIT')
+		self.assertEqual(second['X-Files-Zipped'], '2')
+		self.assertEqual(second_content, first_content)
+		self.assertEqual(reordered['X-Merge-Cache'], 'MISS')
+		self.assertEqual(changed['X-Merge-Cache'], 'MISS')
+		self.assertEqual(mock_get_object.call_count, 6)
+		self.assertEqual(mock_download_log.objects.bulk_create.call_count, 4)
+
+
+def _crash_once(marker_path):
+	import os
+
+	if not os.path.exists(marker_path):
+		open(marker_path, 'w').close()
+		os._exit(1)
+	return os.getpid()
+
+
+def _sleep_and_return(seconds):
+	import os
+	import time
+
+	time.sleep(seconds)
+	return os.getpid()
+
+
+class PdfWorkerPoolTests(TestCase):
+	def setUp(self):
+		from documents import workers
+
+		overrides = override_settings(PDF_WORKER_PROCESSES=1)
+		overrides.enable()
+		self.addCleanup(overrides.disable)
+		self.addCleanup(lambda: workers._pdf_pool and workers._discard_pdf_pool(workers._pdf_pool, terminate=True))
+
+	def test_broken_pool_is_replaced_and_the_task_retried(self):
+		import os
+		import tempfile
+		from documents import workers
+
+		marker_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(marker_dir.cleanup)
+		broken_pool = workers._get_pdf_pool()
+
+		worker_pid = workers.run_pdf_task(_crash_once, os.path.join(marker_dir.name, 'crashed'), timeout=30)
+
+		self.assertNotEqual(worker_pid, os.getpid())
+		self.assertIsNot(workers._pdf_pool, broken_pool)
+		self.assertEqual(workers.run_pdf_task(_sleep_and_return, 0, timeout=30), worker_pid)
+
+	def test_timed_out_task_does_not_keep_the_worker(self):
+		from documents import workers
+
+		stuck_pool = workers._get_pdf_pool()
+
+		with self.assertRaises(TimeoutError):
+			workers.run_pdf_task(_sleep_and_return, 30, timeout=0.5)
+
+		self.assertIsNot(workers._get_pdf_pool(), stuck_pool)
+		# El único worker quedó libre: una tarea corta no espera a la vencida
+		self.assertIsInstance(workers.run_pdf_task(_sleep_and_return, 0, timeout=5), int)
+
+
+class RateLimitBackendTests(TestCase):
+	LIMITS = {'requests': 3, 'window': 60, 'block_time': 30}
+
+	def test_cache_backend_shares_the_limit_between_workers(self):
+		from documents.ratelimit import CacheRateLimitBackend, rate_limit_cache
+
+		rate_limit_cache().clear()
+		worker_a, worker_b = CacheRateLimitBackend(), CacheRateLimitBackend()
+		now = 600.0
+
+		results = [worker.hit('api:10.0.0.1', self.LIMITS, now) for worker in (worker_a, worker_b, worker_a, worker_b)]
+
+		self.assertEqual(results, [0, 0, 0, 30])
+		# Los contadores no ocupan el caché general
+		counter_key = f"{worker_a._key('api:10.0.0.1')}:10"
+		self.assertEqual(rate_limit_cache().get(counter_key), 4)
+		self.assertIsNone(cache.get(counter_key))
+		self.assertEqual(worker_a.hit('api:10.0.0.1', self.LIMITS, now + 10), 20)
+		self.assertEqual(worker_b.hit('api:10.0.0.2', self.LIMITS, now + 10), 0)
+
+	def test_cache_backend_requires_an_atomic_cache_alias(self):
+		from django.conf import settings
+		from documents.ratelimit import CacheRateLimitBackend, LocalRateLimitBackend, get_rate_limit_backend
+
+		def backend_for(cache_backend):
+			caches_setting = {**settings.CACHES, 'ratelimit': {'BACKEND': cache_backend}}
+			with override_settings(CACHES=caches_setting, RATE_LIMIT_CACHE_ALIAS='ratelimit', RATE_LIMIT_BACKEND='cache'), \
+					patch('documents.ratelimit._backend', None):
+				return get_rate_limit_backend()
+
+		self.assertIsInstance(backend_for('django.core.cache.backends.filebased.FileBasedCache'), LocalRateLimitBackend)
+		self.assertIsInstance(backend_for('django.core.cache.backends.locmem.LocMemCache'), LocalRateLimitBackend)
+		self.assertIsInstance(backend_for('django.core.cache.backends.redis.RedisCache'), CacheRateLimitBackend)
+
+	def test_local_backend_slides_the_window_and_bounds_its_state(self):
+		from documents.ratelimit import LocalRateLimitBackend
+
+		backend = LocalRateLimitBackend(max_entries=10)
+		for _ in range(3):
+			self.assertEqual(backend.hit('api:10.0.0.1', self.LIMITS, 630.0), 0)
+		# A mitad de la ventana siguiente las 3 anteriores aún cuentan como 1.5
+		self.assertEqual(backend.hit('api:10.0.0.1', self.LIMITS, 690.0), 0)
+		self.assertEqual(backend.hit('api:10.0.0.1', self.LIMITS, 690.0), 30)
+
+		for number in range(50):
+			backend.hit(f'api:192.168.0.{number}', self.LIMITS, 700.0)
+		self.assertLessEqual(len(backend), 10)
+		# Dos ventanas después todo vence en el siguiente barrido
+		backend.hit('api:10.0.0.9', self.LIMITS, 900.0)
+		self.assertEqual(len(backend), 1)
+
+	@override_settings(RATE_LIMITS={'api': {'requests': 0, 'window': 60, 'block_time': 60}})
+	@patch('documents.middleware.get_rate_limit_backend')
+	def test_middleware_skips_the_backend_for_unthrottled_scopes(self, mock_backend):
+		from django.test import RequestFactory
+		from documents.middleware import IPRateLimitMiddleware
+
+		middleware = IPRateLimitMiddleware(lambda request: None)
+
+		self.assertIsNone(middleware.process_request(RequestFactory().get('/api/search/')))
+		mock_backend.assert_not_called()
+
+		mock_backend.return_value.hit.return_value = 12
+		response = middleware.process_request(RequestFactory().post('/api/files/upload'))
+		self.assertEqual(response.status_code, 429)
+		self.assertEqual(response['Retry-After'], '12')
+
+
+class RequestSanitizationTests(TestCase):
+	def setUp(self):
+		from django.test import RequestFactory
+		from documents.middleware import RequestSanitizationMiddleware
+
+		self.factory = RequestFactory()
+		self.middleware = RequestSanitizationMiddleware(lambda request: None)
+
+	def test_multipart_file_parts_are_not_scanned_but_fields_are(self):
+		pdf = SimpleUploadedFile('a.pdf', b'%PDF-1.4 -- <script> binario', content_type='application/pdf')
+		clean = self.factory.post('/api/files/upload', {'folder': '2025/RESGUARDO', 'files': pdf})
+		self.assertIsNone(self.middleware.process_request(clean))
+
+		pdf.seek(0)
+		dirty = self.factory.post('/api/files/upload', {'folder': '<script>alert(1)</script>', 'files': pdf})
+		self.assertEqual(self.middleware.process_request(dirty).status_code, 400)
+
+	def test_binary_bodies_are_not_read_and_json_is_capped(self):
+		chunk = self.factory.put('/api/files/resumable/abc', b'%PDF -- OR 1=1', content_type='application/octet-stream')
+		self.assertIsNone(self.middleware.process_request(chunk))
+		self.assertFalse(hasattr(chunk, '_body'))
+
+		query = self.factory.post('/api/search/', '{"q": "x UNION SELECT password"}', content_type='application/json')
+		self.assertEqual(self.middleware.process_request(query).status_code, 400)
+
+		with override_settings(SANITIZATION_MAX_BODY_BYTES=16):
+			large = self.factory.post('/api/search/', '{"q": "x UNION SELECT password"}', content_type='application/json')
+			self.assertIsNone(self.middleware.process_request(large))
+
+		self.assertEqual(self.middleware.process_request(self.factory.get('/api/search/', {'q': 'a', 'b': ["1' or 1=1"]})).status_code, 400)
+
+
+class AuditEventWriterTests(TestCase):
+	def test_queued_events_are_written_in_batches_and_overflow_is_synchronous(self):
+		import threading
+		from auditlog.models import AuditEvent
+		from auditlog.writer import AuditEventWriter
+
+		writer = AuditEventWriter(batch_size=2, flush_interval=30, max_queue=3)
+		self.addCleanup(writer.stop)
+		batches = []
+		release = threading.Event()
+
+		def fake_write(batch):
+			batches.append([event.action for event in batch])
+			if threading.current_thread().name == 'audit-event-writer':
+				release.wait(5)
+
+		with patch.object(writer, '_write', side_effect=fake_write):
+			for number in range(2):
+				writer.submit(AuditEvent(action=f'E{number}', resource_type='test'))
+			# El hilo está escribiendo el primer lote; con la cola llena se escribe en línea
+			for _ in range(50):
+				if batches:
+					break
+				threading.Event().wait(0.01)
+			for number in range(2, 6):
+				writer.submit(AuditEvent(action=f'E{number}', resource_type='test'))
+			self.assertEqual(batches[-1], ['E5'])
+			release.set()
+			self.assertTrue(writer.flush(timeout=5))
+
+		self.assertEqual(batches, [['E0', 'E1'], ['E5'], ['E2', 'E3'], ['E4']])
+
+	@patch('auditlog.models.AuditEvent.save')
+	@patch('auditlog.writer.get_audit_writer')
+	def test_events_inside_a_transaction_are_saved_immediately(self, mock_writer, mock_save):
+		from django.db import transaction
+		from auditlog.services import record_audit_event
+
+		with transaction.atomic():
+			record_audit_event(action='FILE_UPLOADED', resource_type='file', metadata={'a': 1})
+		mock_save.assert_called_once_with(force_insert=True)
+		mock_writer.assert_not_called()
+
+		record_audit_event(action='FILE_UPLOADED', resource_type='file')
+		mock_writer.return_value.submit.assert_called_once()
+		self.assertEqual(mock_save.call_count, 1)
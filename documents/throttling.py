@@ -64,3 +64,13 @@ class BulkSearchRateThrottle(UserRateThrottle):
 class MergeRateThrottle(UserRateThrottle):
     """Throttle para fusión de PDFs, una operación pesada de I/O y CPU."""
     scope = 'merge'
+
+
+class PreviewRateThrottle(UserRateThrottle):
+    """Throttle para miniaturas: una página de resultados pide varias a la vez."""
+    scope = 'preview'
+
+
+class UploadChunkRateThrottle(UserRateThrottle):
+    """Throttle para tramos de subidas reanudables: un lote grande son muchos PUT."""
+    scope = 'upload_chunk'
@@ -0,0 +1,47 @@
+"""
+JWT con los permisos del usuario embebidos.
+
+Cada access token lleva el claim `perms` ({can_manage_files, domains}) resuelto
+al emitirlo, tanto en el login como en cada refresh (se vuelve a leer de la
+base, no se copia del refresh token). PermissionClaimsJWTAuthentication lo
+aplica al usuario del request, así CanManageFiles, allowed_domains_for_user y
+can_manage_files no consultan grupos. Un cambio de grupos se refleja a más
+tardar al vencer el access token (ACCESS_TOKEN_LIFETIME).
+"""
+
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .permissions import PERMISSIONS_CLAIM, apply_permission_claims, permission_claims
+
+
+class PermissionRefreshToken(RefreshToken):
+    @property
+    def access_token(self):
+        access = super().access_token
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            access.payload.pop(PERMISSIONS_CLAIM, None)
+        else:
+            access[PERMISSIONS_CLAIM] = permission_claims(user)
+        return access
+
+
+class PermissionTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = PermissionRefreshToken
+
+
+class PermissionTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = PermissionRefreshToken
+
+
+class PermissionClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        # Tokens emitidos antes de este claim: se resuelve por grupos como siempre
+        apply_permission_claims(user, validated_token.get(PERMISSIONS_CLAIM))
+        return user
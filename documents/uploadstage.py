@@ -0,0 +1,197 @@
+"""
+Traspaso de classify-preview a upload mediante un token de previsualización.
+
+classify-preview ya calcula hashes y texto de cada PDF. Con el token que
+devuelve, /api/files/upload reutiliza ese trabajo:
+
+- Siempre se guardan, por archivo, tamaño, MD5, SHA-256, texto y códigos. Si
+  el cliente vuelve a enviar un archivo con el mismo nombre, tamaño y MD5, no
+  se vuelve a extraer texto con PyMuPDF.
+- Con stage_bytes=true también se guardan los bytes (enlace duro al temporal
+  de Django cuando es posible). El cliente confirma enviando staged_files[]
+  con los ids devueltos y el archivo no se vuelve a transferir.
+
+Cada sesión es un directorio bajo UPLOAD_STAGING_DIR con un manifest.json,
+ligada al usuario que la creó, y vence UPLOAD_STAGING_TTL_SECONDS después de
+creada. El directorio debe ser compartido por los workers que atienden ambas
+peticiones (mismo host o volumen compartido).
+"""
+
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from .uploadstream import PreparedUpload, UploadDigest
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{20,64}$')
+_STAGED_ID_PATTERN = re.compile(r'^\d{1,6}$')
+
+
+class StagingTokenInvalid(Exception):
+    """El token no existe, venció o pertenece a otro usuario."""
+
+
+def upload_staging_ttl():
+    return max(0, int(getattr(settings, 'UPLOAD_STAGING_TTL_SECONDS', 900)))
+
+
+def upload_staging_enabled():
+    return upload_staging_ttl() > 0
+
+
+def upload_staging_dir():
+    directory = getattr(settings, 'UPLOAD_STAGING_DIR', None) or os.path.join(tempfile.gettempdir(), 'pdf_upload_staging')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _session_dir(token):
+    if not _TOKEN_PATTERN.match(str(token or '')):
+        raise StagingTokenInvalid(token)
+    return os.path.join(upload_staging_dir(), token)
+
+
+def _staged_path(session_dir, staged_id):
+    return os.path.join(session_dir, f'{staged_id}.pdf')
+
+
+def _copy_upload(uploaded_file, destination):
+    """Enlace duro al temporal de Django (sin copiar bytes) o copia por bloques."""
+    temporary_path = getattr(uploaded_file, 'temporary_file_path', None)
+    if temporary_path is not None:
+        try:
+            os.link(temporary_path(), destination)
+            return
+        except OSError:
+            pass
+    uploaded_file.seek(0)
+    with open(destination, 'wb') as handle:
+        for chunk in uploaded_file.chunks():
+            handle.write(chunk)
+    uploaded_file.seek(0)
+
+
+def purge_expired_sessions(now=None):
+    """Borra las sesiones vencidas; devuelve cuántas se borraron."""
+    now = time.time() if now is None else now
+    ttl = upload_staging_ttl()
+    removed = 0
+    for entry in os.scandir(upload_staging_dir()):
+        if not entry.is_dir():
+            continue
+        try:
+            expired = now - entry.stat().st_mtime > ttl
+        except FileNotFoundError:
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class StagingSession:
+    """Sesión en construcción durante classify-preview."""
+
+    def __init__(self, user, keep_bytes):
+        purge_expired_sessions()
+        self.token = secrets.token_urlsafe(24)
+        self.directory = _session_dir(self.token)
+        self.keep_bytes = keep_bytes
+        self.owner = getattr(user, 'pk', None)
+        self.entries = {}
+        os.makedirs(self.directory)
+
+    def add(self, uploaded_file, prepared):
+        """Registra un archivo ya preparado y devuelve su staged_id."""
+        staged_id = str(len(self.entries))
+        if self.keep_bytes:
+            _copy_upload(uploaded_file, _staged_path(self.directory, staged_id))
+        self.entries[staged_id] = {
+            'filename': uploaded_file.name,
+            'size': prepared.digest.size,
+            'md5': prepared.digest.md5,
+            'sha256': prepared.digest.sha256,
+            'text': prepared.text,
+            'codigos': list(prepared.codigos or []),
+            'has_bytes': self.keep_bytes,
+        }
+        return staged_id
+
+    def save(self):
+        manifest = {'owner': self.owner, 'created': time.time(), 'files': self.entries}
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_NAME))
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _prepared(entry):
+    digest = UploadDigest(entry['size'], entry['md5'], entry['sha256'])
+    return PreparedUpload(digest, entry['text'], entry['codigos'])
+
+
+class StagedUpload(UploadedFile):
+    """PDF guardado en classify-preview; se usa como un archivo subido más."""
+
+    def __init__(self, path, entry):
+        super().__init__(open(path, 'rb'), name=entry['filename'], content_type='application/pdf', size=entry['size'])
+        self.path = path
+        self.prepared = _prepared(entry)
+
+    def temporary_file_path(self):
+        return self.path
+
+    def release(self):
+        """Archivo ya subido: borra sus bytes; el resto de la sesión sigue vigente."""
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class StagedSession:
+    """Sesión guardada, leída desde upload."""
+
+    def __init__(self, token, user):
+        self.directory = _session_dir(token)
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), encoding='utf-8') as handle:
+                manifest = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            raise StagingTokenInvalid(token)
+        if manifest.get('owner') != getattr(user, 'pk', None):
+            raise StagingTokenInvalid(token)
+        if time.time() - float(manifest.get('created') or 0) > upload_staging_ttl():
+            raise StagingTokenInvalid(token)
+        self.entries = manifest.get('files') or {}
+
+    def open(self, staged_id):
+        """StagedUpload del id pedido; StagingTokenInvalid si no tiene bytes guardados."""
+        entry = self.entries.get(str(staged_id)) if _STAGED_ID_PATTERN.match(str(staged_id)) else None
+        path = _staged_path(self.directory, staged_id) if entry else None
+        if entry is None or not entry.get('has_bytes') or not os.path.exists(path):
+            raise StagingTokenInvalid(staged_id)
+        return StagedUpload(path, entry)
+
+    def known(self, filename):
+        """Resultado guardado para un archivo re-enviado con ese nombre, o None."""
+        for entry in self.entries.values():
+            if entry['filename'] == filename:
+                return _prepared(entry)
+        return None
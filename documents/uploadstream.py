@@ -0,0 +1,121 @@
+"""
+Lectura en streaming de PDFs subidos.
+
+Django deja los archivos grandes en un temporal en disco (TemporaryUploadedFile);
+aquí se recorren por bloques para calcular MD5 y SHA-256, se mapean en memoria
+para extraer texto con PyMuPDF sin copiarlos y se envían a MinIO como subida
+multiparte. El proceso nunca tiene el PDF completo en un buffer propio.
+"""
+
+import hashlib
+import mmap
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .utils import extract_text_from_pdf_bytes, minio_client
+from .workers import run_pdf_task
+
+
+UPLOAD_HASH_CHUNK_SIZE = 1024 * 1024
+# MinIO/S3 exige partes de al menos 5 MiB (salvo la última)
+MIN_UPLOAD_PART_SIZE = 5 * 1024 * 1024
+
+UploadDigest = namedtuple('UploadDigest', ['size', 'md5', 'sha256'])
+PreparedUpload = namedtuple('PreparedUpload', ['digest', 'text', 'codigos'])
+
+
+def upload_part_size():
+    return max(MIN_UPLOAD_PART_SIZE, int(getattr(settings, 'UPLOAD_PART_SIZE', 16 * 1024 * 1024)))
+
+
+def digest_upload(uploaded_file, chunk_size=UPLOAD_HASH_CHUNK_SIZE):
+    """Tamaño, MD5 y SHA-256 del archivo, leyendo por bloques; lo deja al inicio."""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in uploaded_file.chunks(chunk_size):
+        md5.update(chunk)
+        sha256.update(chunk)
+        size += len(chunk)
+    uploaded_file.seek(0)
+    return UploadDigest(size, md5.hexdigest(), sha256.hexdigest())
+
+
+@contextmanager
+def _mapped_file(path):
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            yield memoryview(b'')
+            return
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
+
+
+@contextmanager
+def mapped_upload(uploaded_file):
+    """
+    memoryview del contenido para fitz.open(stream=...): mmap del temporal de
+    Django si el archivo está en disco, o sus bytes si Django lo dejó en memoria.
+    """
+    temporary_path = getattr(uploaded_file, 'temporary_file_path', None)
+    if temporary_path is not None:
+        with _mapped_file(temporary_path()) as view:
+            yield view
+        return
+
+    uploaded_file.seek(0)
+    content = uploaded_file.read()
+    uploaded_file.seek(0)
+    yield memoryview(content)
+
+
+def extract_text_from_spooled_file(path):
+    """Texto y códigos de un PDF en disco; corre en el pool de procesos."""
+    with _mapped_file(path) as content:
+        return extract_text_from_pdf_bytes(content)
+
+
+def prepare_upload(uploaded_file, known=None):
+    """
+    Trabajo previo al put que no toca la base de datos: hashes y texto.
+    Los temporales en disco se extraen en el pool de procesos (leyendo el
+    archivo por su ruta); los archivos chicos en memoria, en este proceso.
+
+    Los archivos guardados en classify-preview traen `prepared`; `known` es el
+    resultado de una previsualización anterior y se reutiliza si tamaño y MD5
+    coinciden.
+    """
+    prepared = getattr(uploaded_file, 'prepared', None)
+    if prepared is not None:
+        return prepared
+    digest = digest_upload(uploaded_file)
+    if known is not None and (known.digest.size, known.digest.md5) == (digest.size, digest.md5):
+        return PreparedUpload(digest, known.text, known.codigos)
+    temporary_path = getattr(uploaded_file, 'temporary_file_path', None)
+    if temporary_path is not None:
+        text, codigos = run_pdf_task(extract_text_from_spooled_file, temporary_path())
+    else:
+        with mapped_upload(uploaded_file) as content:
+            text, codigos = run_pdf_task(extract_text_from_pdf_bytes, content, inline=True)
+    return PreparedUpload(digest, text, codigos)
+
+
+def put_upload(object_name, uploaded_file, size, content_type='application/pdf'):
+    """Sube el archivo por partes de upload_part_size(); devuelve el resultado de put_object."""
+    uploaded_file.seek(0)
+    return minio_client.put_object(
+        settings.MINIO_BUCKET,
+        object_name,
+        uploaded_file,
+        length=size,
+        content_type=content_type,
+        part_size=upload_part_size(),
+    )
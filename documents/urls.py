@@ -1,14 +1,20 @@
+from django.conf import settings
 from django.urls import path, include
 from .views import (
     SearchView, ReindexView, FilterOptionsView, FilterOptionsForBulkView,
     DownloadView, SyncIndexView, PopulateHashesView, IndexStatsView, index,
     seguros_ui, tregistro_ui,
     FilesListView, FilesClassifyPreviewView, FilesUploadView, CreateFolderView, FilesDeleteView, FoldersListView,
+    FilesResumableCreateView, FilesResumableChunkView, FilesResumableFinalizeView,
     FolderOptionsView,
     BulkSearchView, MergePdfsView, CurrentUserView, HealthCheckView
 )
 from .auth_views import AuthLoginView, AuthLogoutView
 from .ui_views import login_ui, constancias_ui, files_ui
+
+if settings.ASYNC_STORAGE_VIEWS:
+    from .async_views import AsyncDownloadView as DownloadView, AsyncMergePdfsView as MergePdfsView  # noqa: F811
+
 urlpatterns = [
     path('', login_ui, name='index'),
     path('api/v2/', include('docrepo.urls')),
@@ -39,6 +45,9 @@ urlpatterns = [
     path('api/files/list', FilesListView.as_view(), name='files_list'),
     path('api/files/classify-preview', FilesClassifyPreviewView.as_view(), name='files_classify_preview'),
     path('api/files/upload', FilesUploadView.as_view(), name='files_upload'),
+    path('api/files/resumable', FilesResumableCreateView.as_view(), name='files_resumable_create'),
+    path('api/files/resumable/finalize', FilesResumableFinalizeView.as_view(), name='files_resumable_finalize'),
+    path('api/files/resumable/<str:upload_id>', FilesResumableChunkView.as_view(), name='files_resumable_chunk'),
     path('api/files/create-folder', CreateFolderView.as_view(), name='create_folder'),
     path('api/files/delete', FilesDeleteView.as_view(), name='files_delete'),
     path('api/folders/list', FoldersListView.as_view(), name='folders_list'),
@@ -1,3 +1,4 @@
+import hashlib
 import re
 import unicodedata
 import fitz  # PyMuPDF
@@ -641,30 +642,42 @@ def extract_metadata(file_path):
         'tipo_documento': tipo_documento,
     }
 
-def extract_text_from_pdf(object_name):
+def extract_text_from_pdf(object_name, etag=None):
     """
-    Extrae todo el texto de un PDF almacenado en MinIO.
+    Extrae todo el texto de un PDF almacenado en MinIO (vía caché local de objetos).
     """
-    try:
-        response = minio_client.get_object(settings.MINIO_BUCKET, object_name)
-        try:
-            pdf_bytes = response.read()
-        finally:
-            response.close()
-            response.release_conn()
+    from .objectcache import read_object_bytes
 
+    try:
+        pdf_bytes = read_object_bytes(object_name, etag=etag)
         return _extract_text_and_codes_from_pdf_bytes(pdf_bytes)
     
     except Exception as e:
         print(f"Error extrayendo texto de {object_name}: {e}")
         return None, []
 
-def search_in_pdf(object_name, codigo_empleado):
-    """Descarga y busca código en el PDF"""
+def extract_text_and_hashes_from_pdf(object_name, etag=None):
+    """
+    Como extract_text_from_pdf, más MD5 y SHA-256 del contenido con una sola
+    lectura. Devuelve (texto, códigos, md5, sha256).
+    """
+    from .objectcache import read_object_bytes
+
     try:
-        response = minio_client.get_object(settings.MINIO_BUCKET, object_name)
-        
-        pdf_bytes = response.read()
+        pdf_bytes = read_object_bytes(object_name, etag=etag)
+        text, codigos = _extract_text_and_codes_from_pdf_bytes(pdf_bytes)
+        return text, codigos, hashlib.md5(pdf_bytes).hexdigest(), hashlib.sha256(pdf_bytes).hexdigest()
+
+    except Exception as e:
+        print(f"Error extrayendo texto de {object_name}: {e}")
+        return None, [], None, None
+
+def search_in_pdf(object_name, codigo_empleado, etag=None):
+    """Descarga (o lee del caché local) y busca código en el PDF"""
+    from .objectcache import read_object_bytes
+
+    try:
+        pdf_bytes = read_object_bytes(object_name, etag=etag)
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         
         for page_num, page in enumerate(doc):
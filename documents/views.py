@@ -2,32 +2,64 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Sum, Count
-from django.http import StreamingHttpResponse
-from django.core.cache import cache
+from django.http import FileResponse, StreamingHttpResponse
 from auditlog.services import record_audit_event
+from docrepo.cache import STORAGE_CHANGED, emit_invalidation_event, region_get_or_set
 from docrepo.models import Document, StorageObject
 from docrepo.services import deactivate_document_by_storage_key, upsert_document_from_upload
-from .models import PDFIndex, DownloadLog
+from .conditional import conditional_on_index
+from .delivery import ObjectDelivery
+from .downloadlog import DownloadLogBatch
+from .mergecache import (
+    merge_cache_enabled, merge_cache_key, object_versions, open_cached_merge,
+    store_merge_result, tee_to_merge_cache,
+)
+from .models import PDFIndex
+from .objectcache import object_cache_stats
+from .pdfmerge import merge_pdfs_to_file
 from .serializers import PDFIndexSerializer
-from .throttling import SearchRateThrottle, BulkSearchRateThrottle, MergeRateThrottle
+from .resumable import ResumableUpload, ResumableUploadError, parse_content_range
+from .throttling import SearchRateThrottle, BulkSearchRateThrottle, MergeRateThrottle, UploadChunkRateThrottle
+from .uploadstage import (
+    StagedSession, StagingSession, StagingTokenInvalid, upload_staging_enabled, upload_staging_ttl,
+)
+from .uploadstream import prepare_upload, put_upload
+from .zipstream import (
+    ZIP_ERRORS_NAME, build_archive_names, errors_manifest, fetch_minio_object, prefetch_objects, stream_zip,
+)
 from .permissions import CanManageFiles, allowed_domains_for_user, can_manage_files
+from .workers import upload_workers
 from .utils import (
     minio_client, extract_metadata, search_in_pdf,
-    extract_text_from_pdf, extract_text_from_pdf_bytes,
+    extract_text_and_hashes_from_pdf,
     infer_upload_metadata, build_auto_storage_prefix,
     BANCOS_VALIDOS, RAZONES_SOCIALES_VALIDAS
 )
-import hashlib
 import concurrent.futures
 import time
+from types import SimpleNamespace
 from datetime import datetime
 import re
 from django.conf import settings
 from django.shortcuts import render
 from django.db import connection
 
-# Cache simple en memoria para listado de MinIO (como en Flask app)
-_minio_list_cache = {'time': 0, 'data': None}
+# Listado de PDFs en MinIO, cacheado en la región compartida 'minio_listing'
+def _list_minio_pdfs():
+    import logging
+
+    logging.getLogger(__name__).info('Listing MinIO (cache expired or empty)...')
+    # Copias simples para que el listado sea serializable en el cache compartido
+    return [
+        SimpleNamespace(
+            object_name=obj.object_name,
+            size=obj.size,
+            etag=obj.etag,
+            last_modified=obj.last_modified,
+        )
+        for obj in minio_client.list_objects(settings.MINIO_BUCKET, recursive=True)
+        if obj.object_name.endswith('.pdf')
+    ]
 
 CLASSIFICATION_DOMAIN_KEYWORDS = {
     'SEGUROS': ['SCTR', 'VIDA LEY', 'POLIZA', 'SEGURO', 'PENSION', 'SALUD'],
@@ -275,17 +307,25 @@ def _build_upload_hints(request):
     }
 
 
-def _find_active_duplicate_by_hash_size(file_size, md5_hash):
+def _find_active_duplicate_by_hash_size(file_size, md5_hash, sha256_hash=None):
     if file_size <= 0 or not md5_hash:
         return None
 
+    active = StorageObject.objects.select_related('document').filter(
+        bucket_name=settings.MINIO_BUCKET,
+        document__is_active=True,
+    )
+    # SHA-256 de contenido (índice docrepo_storage_sha256_idx): correcto para
+    # cualquier tamaño, incluso si el ETag de MinIO es multiparte
+    if sha256_hash:
+        duplicate = active.filter(checksum_sha256=sha256_hash).first()
+        if duplicate is not None:
+            return duplicate
+
+    # Objetos aún sin SHA-256 (previos a backfill_content_hashes): ETag o MD5 + tamaño
     return (
-        StorageObject.objects.select_related('document')
-        .filter(
-            bucket_name=settings.MINIO_BUCKET,
-            size_bytes=file_size,
-            document__is_active=True,
-        )
+        active.filter(size_bytes=file_size)
+        .filter(Q(checksum_sha256__isnull=True) | Q(checksum_sha256=''))
         .filter(Q(etag=md5_hash) | Q(document__source_hash_md5=md5_hash))
         .first()
     )
@@ -526,8 +566,7 @@ class FilterOptionsForBulkView(APIView):
     """
     permission_classes = [IsAuthenticated]
     
-    CACHE_TIMEOUT = 3600  # 1 hour cache
-    
+    @conditional_on_index()
     def get(self, request):
         document_type = request.query_params.get('document_type', '').upper()
         
@@ -539,17 +578,12 @@ class FilterOptionsForBulkView(APIView):
                 'filters': {}
             }, status=400)
         
-        # Try to get from cache first
-        cache_key = f'filter_options_{document_type}'
-        cached_options = cache.get(cache_key)
-        if cached_options:
-            return Response(cached_options)
-        
-        # Build filter options from database
-        filter_options = self._build_filter_options(document_type)
-        
-        # Cache the result
-        cache.set(cache_key, filter_options, self.CACHE_TIMEOUT)
+        # Región compartida entre workers; se invalida con cada cambio del índice
+        filter_options, _ = region_get_or_set(
+            'filter_options',
+            (document_type,),
+            lambda: self._build_filter_options(document_type),
+        )
         
         return Response(filter_options)
     
@@ -762,7 +796,7 @@ class SearchView(APIView):
                 if data.get('razon_social') and meta['razon_social'] != data['razon_social']: continue
                 
                 # Buscar código en PDF
-                if search_in_pdf(obj.object_name, codigo_empleado):
+                if search_in_pdf(obj.object_name, codigo_empleado, etag=obj.etag):
                     results.append({
                         'filename': obj.object_name,
                         'metadata': meta,
@@ -781,45 +815,41 @@ class SearchView(APIView):
             'source': 'minio_direct'
         })
 
+def download_forbidden(user, filename):
+    """True si el usuario no puede descargar `filename` (compartido por las vistas sync y async)."""
+    allowed_domains = allowed_domains_for_user(user)
+    storage = StorageObject.objects.select_related('document__domain').filter(
+        bucket_name=settings.MINIO_BUCKET,
+        object_key=filename,
+        document__is_active=True,
+    ).first()
+    if storage is not None:
+        return storage.document.domain.code not in allowed_domains
+
+    legacy_row = PDFIndex.objects.filter(minio_object_name=filename).only('minio_object_name', 'tipo_documento').first()
+    if legacy_row is not None:
+        from docrepo.domain_inference import infer_domain_code
+        return infer_domain_code(legacy_row.minio_object_name, legacy_row.tipo_documento) not in allowed_domains
+    return False
+
+
 class DownloadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, filename):
         try:
-            allowed_domains = allowed_domains_for_user(request.user)
-            storage = StorageObject.objects.select_related('document__domain').filter(
-                bucket_name=settings.MINIO_BUCKET,
-                object_key=filename,
-                document__is_active=True,
-            ).first()
-            if storage and storage.document.domain.code not in allowed_domains:
+            if download_forbidden(request.user, filename):
                 return Response({'error': 'No tiene permisos para descargar este documento.'}, status=403)
-            if storage is None:
-                legacy_row = PDFIndex.objects.filter(minio_object_name=filename).only('minio_object_name', 'tipo_documento').first()
-                if legacy_row is not None:
-                    from docrepo.domain_inference import infer_domain_code
-                    if infer_domain_code(legacy_row.minio_object_name, legacy_row.tipo_documento) not in allowed_domains:
-                        return Response({'error': 'No tiene permisos para descargar este documento.'}, status=403)
-
-            # MinIO response
-            response = minio_client.get_object(settings.MINIO_BUCKET, filename)
+
+            # Verifica que el objeto exista (proxy con Range, URL firmada o X-Accel-Redirect)
+            delivery = ObjectDelivery(filename, request=request).open()
             
-            # Log audit
-            DownloadLog.objects.create(
-                user=request.user,
-                filename=filename,
-                ip_address=request.META.get('REMOTE_ADDR')
-            )
+            # Log audit (se escribe al terminar la transferencia); de los Range solo el que empieza en 0
+            download_log = DownloadLogBatch(request)
+            if delivery.counts_as_download:
+                download_log.add(filename)
             
-            # Streaming response
-            response_headers = {
-                'Content-Disposition': f'attachment; filename="{filename.split("/")[-1]}"'
-            }
-            return StreamingHttpResponse(
-                response.stream(amt=8192),
-                content_type='application/pdf',
-                headers=response_headers
-            )
+            return download_log.attach(delivery.response(filename.split('/')[-1]))
         except Exception as e:
             return Response({'error': 'Archivo no encontrado'}, status=404)
 
@@ -837,7 +867,6 @@ class SyncIndexView(APIView):
 
         logger = logging.getLogger(__name__)
 
-        global _minio_list_cache
         data = request.data or {}
         batch_size = min(int(data.get('batch_size', 50)), 200)
         skip_new = data.get('skip_new', False)
@@ -851,16 +880,7 @@ class SyncIndexView(APIView):
         errors = 0
 
         try:
-            now = time.time()
-            if _minio_list_cache['data'] is None or (now - _minio_list_cache['time']) > 60:
-                logger.info('Listing MinIO (cache expired or empty)...')
-                minio_all = []
-                for obj in minio_client.list_objects(settings.MINIO_BUCKET, recursive=True):
-                    if obj.object_name.endswith('.pdf'):
-                        minio_all.append(obj)
-                _minio_list_cache = {'time': now, 'data': minio_all}
-
-            objects_list = _minio_list_cache['data']
+            objects_list, _ = region_get_or_set('minio_listing', (settings.MINIO_BUCKET,), _list_minio_pdfs)
             minio_map = {obj.object_name: obj for obj in objects_list}
             minio_names = set(minio_map.keys())
 
@@ -979,7 +999,7 @@ class SyncIndexView(APIView):
                     try:
                         obj = minio_map[name]
                         meta = extract_metadata(name)
-                        text, codigos = extract_text_from_pdf(name)
+                        text, codigos, content_md5, content_sha256 = extract_text_and_hashes_from_pdf(name, etag=obj.etag)
                         md5_hash = obj.etag.strip('"') if obj.etag else None
                         is_indexed = bool(text)
 
@@ -993,6 +1013,8 @@ class SyncIndexView(APIView):
                             is_indexed=is_indexed,
                             actor=request.user,
                             pdf_text=text,
+                            content_md5=content_md5,
+                            checksum_sha256=content_sha256,
                         )
 
                         if dual_write_legacy:
@@ -1266,6 +1288,7 @@ class IndexStatsView(APIView):
             'last_indexed': last.indexed_at.isoformat() if last and last.indexed_at else None,
             'indexed_successfully': documents_qs.filter(index_state__is_indexed=True).count(),
             'with_errors': documents_qs.filter(Q(index_state__isnull=True) | Q(index_state__is_indexed=False)).count(),
+            'object_cache': object_cache_stats(),
             'source': 'docrepo_v2',
         })
 
@@ -1356,7 +1379,7 @@ class ReindexView(APIView):
             for obj, action in to_process:
                 try:
                     meta = extract_metadata(obj.object_name)
-                    text, codigos = extract_text_from_pdf(obj.object_name)
+                    text, codigos, content_md5, content_sha256 = extract_text_and_hashes_from_pdf(obj.object_name, etag=obj.etag)
                     md5_hash = obj.etag.strip('"') if obj.etag else None
                     is_indexed = bool(text)
 
@@ -1370,6 +1393,8 @@ class ReindexView(APIView):
                         is_indexed=is_indexed,
                         actor=request.user,
                         pdf_text=text,
+                        content_md5=content_md5,
+                        checksum_sha256=content_sha256,
                     )
 
                     if dual_write_legacy:
@@ -1440,6 +1465,7 @@ class FilesListView(APIView):
     """
     permission_classes = [CanManageFiles]
 
+    @conditional_on_index()
     def get(self, request):
         def safe_int(value, default=None):
             try:
@@ -1614,13 +1640,15 @@ class FolderOptionsView(APIView):
     Parámetros opcionales:
     - domain: SEGUROS | TREGISTRO | CONSTANCIA_ABONO (filtra estructura)
     - parent: ruta padre para drill-down
+
+    Las opciones se calculan una vez por (dominio, parent) y se guardan en
+    cache hasta que una ingesta, movimiento o baja cambie la generación del índice.
     """
     permission_classes = [CanManageFiles]
 
+    VALID_DOMAINS = {'SEGUROS', 'TREGISTRO', 'CONSTANCIA_ABONO'}
+
     def get(self, request):
-        import re
-        from django.db.models import Q
-        
         parent = request.query_params.get('parent', '').strip()
         domain = request.query_params.get('domain', '').strip().upper()
         
@@ -1628,72 +1656,18 @@ class FolderOptionsView(APIView):
             parent += '/'
         
         try:
-            # Construir query base
-            query = Q(is_active=True)
-            
-            if parent:
-                query &= Q(
-                    storage_object__object_key__startswith=parent
-                ) | Q(source_path_legacy__startswith=parent)
-            
-            # Obtener todas las rutas únicas
-            docs = Document.objects.filter(query).values(
-                'storage_object__object_key', 
-                'source_path_legacy'
+            folder_options, cached = region_get_or_set(
+                'folder_options',
+                (domain, parent),
+                lambda: self._collect_folder_options(domain, parent),
             )
-            if hasattr(docs, 'distinct'):
-                docs = docs.distinct()
-            
-            folder_options = []
-            seen_folders = set()
-            
-            for doc in docs:
-                path = doc['storage_object__object_key'] or doc['source_path_legacy']
-                if not path:
-                    continue
-                
-                relative_path = path[len(parent):] if parent else path
-                parts = relative_path.split('/')
-                if not parent and len(parts) > 1 and re.fullmatch(r'Planillas\s+20\d{2}', parts[0], re.IGNORECASE):
-                    parts = parts[1:]
-                
-                # Skip years at root level (they're structural)
-                if not parent and len(parts) > 0 and re.fullmatch(r'20\d{2}', parts[0]):
-                    continue
-                
-                if len(parts) >= 2:
-                    folder_name = parts[0]
-                    folder_path = parent + folder_name + '/'
-                    
-                    if folder_path not in seen_folders:
-                        seen_folders.add(folder_path)
-                        
-                        # Map to domain structure
-                        domain_label = ''
-                        if domain == 'SEGUROS':
-                            domain_label = 'SEGUROS'
-                        elif domain == 'TREGISTRO':
-                            domain_label = 'TREGISTRO'
-                        elif domain == 'CONSTANCIA_ABONO':
-                            # Check if contains bank
-                            bank_match = re.search(r'/(BCP|INTERBACK|BBVA|MIBANCO|SCOTIABANK|GENERAL)/', path)
-                            if bank_match:
-                                domain_label = f"PLANILLAS / {bank_match.group(1)}"
-                            else:
-                                domain_label = 'PLANILLAS'
-                        
-                        folder_options.append({
-                            'name': folder_name,
-                            'path': folder_path,
-                            'label': f"{folder_name} ({domain_label})" if domain_label else folder_name,
-                            'domain_hint': self._infer_domain_from_path(folder_path),
-                        })
             
             return Response({
                 'success': True,
                 'current_path': parent,
-                'folders': sorted(folder_options, key=lambda x: x['name'].lower()),
+                'folders': folder_options,
                 'domain_filter': domain or None,
+                'cached': cached,
             })
             
         except Exception as e:
@@ -1701,6 +1675,69 @@ class FolderOptionsView(APIView):
                 'error': f'Error listando carpetas: {str(e)}',
                 'folders': []
             }, status=500)
+
+    def _collect_folder_options(self, domain, parent):
+        """Recorre solo el subárbol de `parent` (o la raíz) del dominio indicado."""
+        query = Q(is_active=True)
+        if domain in self.VALID_DOMAINS:
+            query &= Q(domain__code=domain)
+        if parent:
+            # Prefijo sobre la clave de storage: usa docrepo_storage_key_prefix_idx.
+            query &= Q(storage_object__object_key__startswith=parent)
+
+        docs = Document.objects.filter(query).values(
+            'storage_object__object_key',
+            'source_path_legacy'
+        )
+
+        folder_options = []
+        seen_folders = set()
+
+        for doc in docs:
+            path = doc['storage_object__object_key'] or doc['source_path_legacy']
+            if not path:
+                continue
+
+            relative_path = path[len(parent):] if parent else path
+            parts = relative_path.split('/')
+            if not parent and len(parts) > 1 and re.fullmatch(r'Planillas\s+20\d{2}', parts[0], re.IGNORECASE):
+                parts = parts[1:]
+
+            # Skip years at root level (they're structural)
+            if not parent and len(parts) > 0 and re.fullmatch(r'20\d{2}', parts[0]):
+                continue
+
+            if len(parts) < 2:
+                continue
+
+            folder_name = parts[0]
+            folder_path = parent + folder_name + '/'
+            if folder_path in seen_folders:
+                continue
+            seen_folders.add(folder_path)
+
+            # Map to domain structure
+            domain_label = ''
+            if domain == 'SEGUROS':
+                domain_label = 'SEGUROS'
+            elif domain == 'TREGISTRO':
+                domain_label = 'TREGISTRO'
+            elif domain == 'CONSTANCIA_ABONO':
+                # Check if contains bank
+                bank_match = re.search(r'/(BCP|INTERBACK|BBVA|MIBANCO|SCOTIABANK|GENERAL)/', path)
+                if bank_match:
+                    domain_label = f"PLANILLAS / {bank_match.group(1)}"
+                else:
+                    domain_label = 'PLANILLAS'
+
+            folder_options.append({
+                'name': folder_name,
+                'path': folder_path,
+                'label': f"{folder_name} ({domain_label})" if domain_label else folder_name,
+                'domain_hint': self._infer_domain_from_path(folder_path),
+            })
+
+        return sorted(folder_options, key=lambda x: x['name'].lower())
     
     def _infer_domain_from_path(self, folder_path):
         """Infiere el dominio basado en la ruta."""
@@ -1749,6 +1786,15 @@ class FilesClassifyPreviewView(APIView):
         hints = _build_upload_hints(request)
         min_confidence = float(getattr(settings, 'DOCREPO_CLASSIFICATION_MIN_CONFIDENCE', 0.7))
 
+        # Token para que upload reutilice hashes y texto (y los bytes con stage_bytes=true)
+        staging = None
+        if upload_staging_enabled():
+            keep_bytes = request.POST.get('stage_bytes', 'false').strip().lower() in {'true', '1', 'yes'}
+            try:
+                staging = StagingSession(request.user, keep_bytes=keep_bytes)
+            except OSError as staging_error:
+                logger.warning(f'No se pudo crear la sesión de staging: {staging_error}')
+
         items = []
         ready = 0
         requires_confirmation = 0
@@ -1772,12 +1818,18 @@ class FilesClassifyPreviewView(APIView):
                 continue
 
             try:
-                file_content = file.read()
-                file_size = len(file_content)
-                file_md5 = hashlib.md5(file_content).hexdigest()
+                prepared = prepare_upload(file)
+                file_size = prepared.digest.size
+                file_md5 = prepared.digest.md5
+                preview_text, preview_codes = prepared.text, prepared.codigos
+
+                staged_id = None
+                if staging is not None:
+                    try:
+                        staged_id = staging.add(file, prepared)
+                    except OSError as staging_error:
+                        logger.warning(f'No se pudo guardar {file.name} en staging: {staging_error}')
 
-                preview_text, preview_codes = extract_text_from_pdf_bytes(file_content)
-                
                 # Usar domain_hint si está presente, sino inferir de metadata
                 if domain_hint:
                     meta = infer_upload_metadata(file.name, preview_text, hints)
@@ -1801,7 +1853,7 @@ class FilesClassifyPreviewView(APIView):
                     logical_path = f"{logical_prefix}/{file.name}"
                     auto_routed = True
 
-                duplicate = _find_active_duplicate_by_hash_size(file_size, file_md5)
+                duplicate = _find_active_duplicate_by_hash_size(file_size, file_md5, prepared.digest.sha256)
                 if duplicate is not None:
                     duplicates += 1
 
@@ -1855,6 +1907,7 @@ class FilesClassifyPreviewView(APIView):
                     'missing_fields': missing_fields,
                     'warnings': warnings,
                     'detected_codes_count': len(preview_codes or []),
+                    'staged_id': staged_id,
                     'duplicate': {
                         'document_id': str(duplicate.document.id),
                         'object_key': duplicate.object_key,
@@ -1894,10 +1947,23 @@ class FilesClassifyPreviewView(APIView):
             metadata=summary,
         )
 
+        preview_token = None
+        if staging is not None and staging.entries:
+            try:
+                staging.save()
+                preview_token = staging.token
+            except OSError as staging_error:
+                logger.warning(f'No se pudo guardar la sesión de staging: {staging_error}')
+                staging.discard()
+        elif staging is not None:
+            staging.discard()
+
         return Response({
             'success': True,
             'summary': summary,
             'files': items,
+            'preview_token': preview_token,
+            'preview_token_ttl': upload_staging_ttl() if preview_token else None,
         })
     
     def _get_folder_suggestions(self, meta, domain_code):
@@ -1955,6 +2021,12 @@ class FilesClassifyPreviewView(APIView):
         return None
 
 
+def _store_upload(object_name, uploaded_file, size):
+    """Put multiparte a MinIO y stat del objeto resultante; corre en el pool de hilos."""
+    put_upload(object_name, uploaded_file, size)
+    return minio_client.stat_object(settings.MINIO_BUCKET, object_name)
+
+
 class FilesUploadView(APIView):
     """
     Subir uno o varios PDFs a MinIO y auto-indexarlos.
@@ -1966,25 +2038,28 @@ class FilesUploadView(APIView):
     permission_classes = [CanManageFiles]
 
     def post(self, request):
-        from io import BytesIO
         import logging
         logger = logging.getLogger(__name__)
         dual_write_legacy = getattr(settings, 'DOCREPO_DUAL_WRITE_LEGACY_ENABLED', True)
         auto_route_enabled = getattr(settings, 'DOCREPO_AUTO_ROUTE_UPLOAD_ENABLED', True)
 
-        files = request.FILES.getlist('files[]')
-        requested_folder = request.POST.get('folder', '').strip()
-        correction_reason = request.POST.get('correction_reason', '').strip()[:500]
+        fields = self._form_fields(request)
+        requested_folder = str(fields.get('folder', '')).strip()
+        correction_reason = str(fields.get('correction_reason', '')).strip()[:500]
         
         # FEAT-1: Modo de upload
-        upload_mode = request.POST.get('upload_mode', 'auto').strip().lower()
+        upload_mode = str(fields.get('upload_mode', 'auto')).strip().lower()
         
         # FEAT-3: Permitir duplicados solo para admins (planillas/admin)
         # No se audita aquí porque el override real ocurre en la línea de éxito
         is_admin_override = can_manage_files(request.user)
-        allow_duplicate_raw = request.POST.get('allow_duplicate', 'false').strip().lower()
+        allow_duplicate_raw = str(fields.get('allow_duplicate', 'false')).strip().lower()
         allow_duplicate = allow_duplicate_raw in {'true', '1', 'yes'} and is_admin_override
 
+        files, known_for, error_response = self._collect_files(request)
+        if error_response is not None:
+            return error_response
+
         if not files:
             return Response({'error': 'No se proporcionaron archivos.'}, status=400)
 
@@ -1995,245 +2070,469 @@ class FilesUploadView(APIView):
                 'code': 'MANUAL_MODE_REQUIRES_FOLDER',
             }, status=400)
 
-        uploaded = []
-        errors = []
+        # Cada archivo pasa por: preparación (hash + texto) y put a MinIO en el
+        # pool de hilos, y escritura en base de datos + auditoría en este hilo,
+        # en el orden original. Así N archivos tardan ~ lo del más lento.
+        outcomes = []
+        # Contenidos (tamaño, sha256) y rutas ya aceptados en esta petición
+        batch = SimpleNamespace(contents={}, object_names={})
+        with concurrent.futures.ThreadPoolExecutor(max_workers=upload_workers()) as pool:
+            for file in files:
+                if not file or file.name == '':
+                    continue
+                if not file.name.lower().endswith('.pdf'):
+                    outcomes.append(SimpleNamespace(file=file, error={'filename': file.name, 'error': 'Solo se permiten archivos PDF'}))
+                    continue
+                known = known_for(file.name) if known_for is not None else None
+                outcomes.append(SimpleNamespace(file=file, error=None, pending=pool.submit(prepare_upload, file, known)))
 
-        for file in files:
-            if not file or file.name == '':
-                continue
+            for outcome in outcomes:
+                if outcome.error is None:
+                    self._stage(request, pool, outcome, batch, requested_folder, upload_mode, auto_route_enabled, allow_duplicate)
 
-            if not file.name.lower().endswith('.pdf'):
-                errors.append({'filename': file.name, 'error': 'Solo se permiten archivos PDF'})
-                continue
+            stored = False
+            for outcome in outcomes:
+                if outcome.error is None:
+                    self._await_store(outcome)
+                    stored = stored or not isinstance(outcome.stat, Exception)
+            if stored:
+                emit_invalidation_event(STORAGE_CHANGED)
 
-            try:
-                # Leer contenido del archivo
-                file_content = file.read()
-                file_size = len(file_content)
-                file_md5 = hashlib.md5(file_content).hexdigest()
+        uploaded = []
+        errors = []
+        for outcome in outcomes:
+            if outcome.error is None:
+                self._commit(request, outcome, requested_folder, upload_mode, allow_duplicate, correction_reason, dual_write_legacy)
+            if outcome.error is None:
+                uploaded.append(outcome.uploaded)
+            else:
+                errors.append(outcome.error)
+            # Archivos en staging o subidas reanudables: se borran solo si quedaron subidos
+            release = getattr(outcome.file, 'release', None)
+            if release is not None:
+                if outcome.error is None:
+                    release()
+                else:
+                    outcome.file.close()
 
-                duplicate = _find_active_duplicate_by_hash_size(file_size, file_md5)
-                
-                # FEAT-3: Si hay duplicado y no se permite override, bloquear
-                if duplicate is not None and not allow_duplicate:
-                    record_audit_event(
-                        action='FILE_UPLOAD_DUPLICATE_BLOCKED',
-                        resource_type='file',
-                        resource_id=file.name,
-                        request=request,
-                        actor=request.user,
-                        document=duplicate.document,
-                        metadata={
-                            'status_code': 409,
-                            'filename': file.name,
-                            'size_bytes': file_size,
-                            'md5_hash': file_md5,
-                            'existing_document_id': str(duplicate.document.id),
-                            'existing_object_key': duplicate.object_key,
-                        },
-                    )
-                    errors.append({
-                        'filename': file.name,
-                        'error': 'Archivo duplicado detectado (mismo hash y tamaño).',
-                        'code': 'DUPLICATE_FILE',
-                        'existing_document_id': str(duplicate.document.id),
-                        'existing_path': duplicate.object_key,
-                        'suggested_override': allow_duplicate,
-                    })
-                    continue
-                
-                # FEAT-3: Si allow_duplicate=true, continuar con upload (re-ingreso)
-                duplicate_replaced = None
-                if duplicate is not None and allow_duplicate:
-                    # Registrar que estamos reemplazando un duplicado
-                    duplicate_replaced = {
-                        'document_id': str(duplicate.document.id),
-                        'object_key': duplicate.object_key,
-                    }
-                    logger.info(f"Re-ingresando duplicado: {duplicate.object_key} → nuevo archivo")
+        return Response({
+            'success': len(uploaded) > 0,
+            'uploaded': uploaded,
+            'errors': errors,
+            'total_uploaded': len(uploaded),
+            'total_indexed': sum(1 for u in uploaded if u['indexed']),
+            'total_errors': len(errors)
+        }, status=201 if uploaded else 400)
 
-                hints = _build_upload_hints(request)
+    def _form_fields(self, request):
+        """Campos del formulario (folder, upload_mode, allow_duplicate, correction_reason)."""
+        return request.POST
+
+    def _collect_files(self, request):
+        """(archivos, búsqueda de resultados de preview por nombre, respuesta de error)."""
+        files = list(request.FILES.getlist('files[]'))
+        # Confirmación de un classify-preview: archivos guardados (staged_files[])
+        # y/o re-enviados cuyo texto ya se extrajo
+        preview_token = request.POST.get('preview_token', '').strip()
+        if not preview_token:
+            return files, None, None
+        try:
+            staged_session = StagedSession(preview_token, request.user)
+            files += [staged_session.open(staged_id) for staged_id in request.POST.getlist('staged_files[]')]
+        except StagingTokenInvalid:
+            return None, None, Response({
+                'error': 'La previsualización venció o no existe; vuelva a enviar los archivos.',
+                'code': 'PREVIEW_TOKEN_INVALID',
+            }, status=400)
+        return files, staged_session.known, None
 
-                auto_routed = False
-                preview_domain = ''
-                normalized_folder = requested_folder
-                preview_text = None
-                preview_codes = []
+    def _fail(self, request, outcome, exc):
+        import logging
+        logging.getLogger(__name__).error(f"✗ Error subiendo {outcome.file.name}: {exc}")
+        record_audit_event(
+            action='FILE_UPLOAD_FAILED',
+            resource_type='file',
+            resource_id=outcome.file.name,
+            request=request,
+            actor=request.user,
+            metadata={
+                'status_code': 500,
+                'filename': outcome.file.name,
+                'error': str(exc),
+            },
+        )
+        outcome.error = {'filename': outcome.file.name, 'error': str(exc)}
 
-                # FEAT-1: Determinar ruta según modo
-                if upload_mode == 'manual' and requested_folder:
-                    normalized_folder = requested_folder
-                    if not normalized_folder.endswith('/'):
-                        normalized_folder += '/'
-                    object_name = f"{normalized_folder}{file.name}"
-                    meta = extract_metadata(object_name)
-                    for hint_key, hint_value in hints.items():
-                        if str(hint_value or '').strip():
-                            meta[hint_key] = hint_value
-                elif normalized_folder:
-                    if not normalized_folder.endswith('/'):
-                        normalized_folder += '/'
-                    object_name = f"{normalized_folder}{file.name}"
-                    meta = extract_metadata(object_name)
-                    for hint_key, hint_value in hints.items():
-                        if str(hint_value or '').strip():
-                            meta[hint_key] = hint_value
-                elif auto_route_enabled:
-                    preview_text, preview_codes = extract_text_from_pdf_bytes(file_content)
-                    meta = infer_upload_metadata(file.name, preview_text, hints)
-                    preview_domain = meta.get('domain_code', '')
-                    auto_prefix = build_auto_storage_prefix(meta, preview_domain)
-                    object_name = f"{auto_prefix}/{file.name}"
-                    auto_routed = True
-                else:
-                    object_name = file.name
-                    meta = extract_metadata(object_name)
-
-                # Subir a MinIO
-                minio_client.put_object(
-                    settings.MINIO_BUCKET,
-                    object_name,
-                    BytesIO(file_content),
-                    length=file_size,
-                    content_type='application/pdf'
-                )
+    def _stage(self, request, pool, outcome, batch, requested_folder, upload_mode, auto_route_enabled, allow_duplicate):
+        """Hilo principal, en orden: duplicados y ruta destino; luego encola el put a MinIO."""
+        import logging
+        logger = logging.getLogger(__name__)
+        file = outcome.file
+        try:
+            prepared = outcome.pending.result()
+            outcome.digest = prepared.digest
+            outcome.text, outcome.codigos = prepared.text, prepared.codigos
+            file_size = prepared.digest.size
+            file_md5 = prepared.digest.md5
 
-                logger.info(f"✓ Archivo subido: {object_name}")
+            # Subidas reanudables: MD5 declarado por el cliente al crear la sesión
+            expected_md5 = getattr(file, 'expected_md5', None)
+            if expected_md5 and expected_md5 != file_md5:
+                raise ValueError('El MD5 del archivo no coincide con el declarado al crear la subida.')
 
-                stat = minio_client.stat_object(settings.MINIO_BUCKET, object_name)
-                object_etag = stat.etag.strip('"') if getattr(stat, 'etag', None) else file_md5
-                object_last_modified = getattr(stat, 'last_modified', None)
+            duplicate = _find_active_duplicate_by_hash_size(file_size, file_md5, prepared.digest.sha256)
 
-                if auto_routed and preview_text is not None:
-                    text, codigos = preview_text, preview_codes
-                else:
-                    text, codigos = extract_text_from_pdf(object_name)
-                indexed = bool(text)
-
-                ingest_result = upsert_document_from_upload(
-                    object_key=object_name,
-                    metadata=meta,
-                    size_bytes=file_size,
-                    etag=object_etag,
-                    last_modified=object_last_modified,
-                    employee_codes=codigos,
-                    is_indexed=indexed,
+            # FEAT-3: Si hay duplicado y no se permite override, bloquear
+            if duplicate is not None and not allow_duplicate:
+                record_audit_event(
+                    action='FILE_UPLOAD_DUPLICATE_BLOCKED',
+                    resource_type='file',
+                    resource_id=file.name,
+                    request=request,
                     actor=request.user,
-                    correction_reason=correction_reason,
-                    pdf_text=text,
+                    document=duplicate.document,
+                    metadata={
+                        'status_code': 409,
+                        'filename': file.name,
+                        'size_bytes': file_size,
+                        'md5_hash': file_md5,
+                        'existing_document_id': str(duplicate.document.id),
+                        'existing_object_key': duplicate.object_key,
+                    },
                 )
+                outcome.error = {
+                    'filename': file.name,
+                    'error': 'Archivo duplicado detectado (mismo hash y tamaño).',
+                    'code': 'DUPLICATE_FILE',
+                    'existing_document_id': str(duplicate.document.id),
+                    'existing_path': duplicate.object_key,
+                    'suggested_override': allow_duplicate,
+                }
+                return
 
-                legacy_synced = False
-                legacy_sync_error = ''
-                if dual_write_legacy:
-                    try:
-                        PDFIndex.objects.update_or_create(
-                            minio_object_name=object_name,
-                            defaults={
-                                'razon_social': meta['razon_social'],
-                                'banco': meta['banco'],
-                                'mes': meta['mes'],
-                                'año': meta['año'],
-                                'tipo_documento': meta['tipo_documento'],
-                                'size_bytes': file_size,
-                                'md5_hash': object_etag,
-                                'codigos_empleado': ','.join(codigos) if codigos else '',
-                                'last_modified': object_last_modified,
-                                'is_indexed': indexed,
-                            }
-                        )
-                        legacy_synced = True
-                    except Exception as legacy_error:
-                        legacy_sync_error = str(legacy_error)
-                        logger.warning(f"Legacy mirror sync failed for {object_name}: {legacy_error}")
-
+            # Mismo contenido repetido en esta petición: la consulta anterior no lo
+            # ve porque ningún archivo del lote se registra hasta _commit
+            content_key = (file_size, prepared.digest.sha256)
+            batch_twin = batch.contents.get(content_key)
+            if batch_twin is not None and not allow_duplicate:
                 record_audit_event(
-                    action='FILE_UPLOAD_SUCCEEDED',
+                    action='FILE_UPLOAD_DUPLICATE_BLOCKED',
                     resource_type='file',
-                    resource_id=object_name,
+                    resource_id=file.name,
                     request=request,
                     actor=request.user,
-                    document=ingest_result.document,
                     metadata={
-                        'status_code': 201,
-                        'object_key': object_name,
-                        'domain': ingest_result.domain_code,
-                        'domain_preview': preview_domain,
-                        'auto_routed': auto_routed,
-                        'requested_folder': requested_folder,
-                        'upload_mode': upload_mode,
-                        'allow_duplicate': allow_duplicate,
-                        'duplicate_replaced': duplicate_replaced,
-                        'correction_reason': correction_reason,
-                        'md5_hash': file_md5,
-                        'indexed': indexed,
+                        'status_code': 409,
+                        'filename': file.name,
                         'size_bytes': file_size,
-                        'legacy_sync_enabled': dual_write_legacy,
-                        'legacy_synced': legacy_synced,
-                        'legacy_sync_error': legacy_sync_error,
+                        'md5_hash': file_md5,
+                        'duplicate_in_request': batch_twin,
                     },
                 )
+                outcome.error = {
+                    'filename': file.name,
+                    'error': 'Archivo duplicado dentro de la misma subida (mismo hash y tamaño).',
+                    'code': 'DUPLICATE_FILE',
+                    'duplicate_in_request': batch_twin,
+                    'suggested_override': allow_duplicate,
+                }
+                return
+
+            # FEAT-3: Si allow_duplicate=true, continuar con upload (re-ingreso)
+            outcome.duplicate = duplicate
+            outcome.duplicate_replaced = None
+            if duplicate is not None and allow_duplicate:
+                # Registrar que estamos reemplazando un duplicado
+                outcome.duplicate_replaced = {
+                    'document_id': str(duplicate.document.id),
+                    'object_key': duplicate.object_key,
+                }
+                logger.info(f"Re-ingresando duplicado: {duplicate.object_key} → nuevo archivo")
 
-                if duplicate_replaced:
-                    record_audit_event(
-                        action='FILE_UPLOAD_DUPLICATE_OVERRIDDEN',
-                        resource_type='file',
-                        resource_id=object_name,
-                        request=request,
-                        actor=request.user,
-                        document=duplicate.document,
-                        metadata={
-                            'status_code': 201,
-                            'filename': file.name,
+            hints = _build_upload_hints(request)
+
+            outcome.auto_routed = False
+            outcome.preview_domain = ''
+            normalized_folder = requested_folder
+
+            # FEAT-1: Determinar ruta según modo
+            if upload_mode == 'manual' and requested_folder:
+                normalized_folder = requested_folder
+                if not normalized_folder.endswith('/'):
+                    normalized_folder += '/'
+                object_name = f"{normalized_folder}{file.name}"
+                meta = extract_metadata(object_name)
+                for hint_key, hint_value in hints.items():
+                    if str(hint_value or '').strip():
+                        meta[hint_key] = hint_value
+            elif normalized_folder:
+                if not normalized_folder.endswith('/'):
+                    normalized_folder += '/'
+                object_name = f"{normalized_folder}{file.name}"
+                meta = extract_metadata(object_name)
+                for hint_key, hint_value in hints.items():
+                    if str(hint_value or '').strip():
+                        meta[hint_key] = hint_value
+            elif auto_route_enabled:
+                meta = infer_upload_metadata(file.name, outcome.text, hints)
+                outcome.preview_domain = meta.get('domain_code', '')
+                auto_prefix = build_auto_storage_prefix(meta, outcome.preview_domain)
+                object_name = f"{auto_prefix}/{file.name}"
+                outcome.auto_routed = True
+            else:
+                object_name = file.name
+                meta = extract_metadata(object_name)
+
+            # Dos archivos del lote con la misma ruta competirían por el put a MinIO
+            if object_name in batch.object_names:
+                logger.warning(f"Ruta repetida en la subida: {object_name}")
+                outcome.error = {
+                    'filename': file.name,
+                    'error': 'Otro archivo de esta subida ya usa la misma ruta de destino.',
+                    'code': 'OBJECT_KEY_CONFLICT',
+                    'existing_path': object_name,
+                }
+                return
+            batch.contents.setdefault(content_key, file.name)
+            batch.object_names[object_name] = file.name
+
+            outcome.object_name = object_name
+            outcome.meta = meta
+            outcome.pending = pool.submit(_store_upload, object_name, file, file_size)
+        except Exception as e:
+            self._fail(request, outcome, e)
+
+    def _await_store(self, outcome):
+        try:
+            outcome.stat = outcome.pending.result()
+        except Exception as e:
+            outcome.stat = e
+
+    def _commit(self, request, outcome, requested_folder, upload_mode, allow_duplicate, correction_reason, dual_write_legacy):
+        """Hilo principal, en orden: docrepo, espejo legacy y auditoría."""
+        import logging
+        logger = logging.getLogger(__name__)
+        file = outcome.file
+        object_name = outcome.object_name
+        meta = outcome.meta
+        text, codigos = outcome.text, outcome.codigos
+        file_size = outcome.digest.size
+        file_md5 = outcome.digest.md5
+        duplicate_replaced = outcome.duplicate_replaced
+        try:
+            if isinstance(outcome.stat, Exception):
+                raise outcome.stat
+            logger.info(f"✓ Archivo subido: {object_name}")
+
+            stat = outcome.stat
+            object_etag = stat.etag.strip('"') if getattr(stat, 'etag', None) else file_md5
+            object_last_modified = getattr(stat, 'last_modified', None)
+
+            indexed = bool(text)
+            ingest_result = upsert_document_from_upload(
+                object_key=object_name,
+                metadata=meta,
+                size_bytes=file_size,
+                etag=object_etag,
+                last_modified=object_last_modified,
+                employee_codes=codigos,
+                is_indexed=indexed,
+                actor=request.user,
+                correction_reason=correction_reason,
+                pdf_text=text,
+                content_md5=file_md5,
+                checksum_sha256=outcome.digest.sha256,
+            )
+
+            legacy_synced = False
+            legacy_sync_error = ''
+            if dual_write_legacy:
+                try:
+                    PDFIndex.objects.update_or_create(
+                        minio_object_name=object_name,
+                        defaults={
+                            'razon_social': meta['razon_social'],
+                            'banco': meta['banco'],
+                            'mes': meta['mes'],
+                            'año': meta['año'],
+                            'tipo_documento': meta['tipo_documento'],
                             'size_bytes': file_size,
-                            'md5_hash': file_md5,
-                            'replaced_document_id': duplicate_replaced['document_id'],
-                            'replaced_object_key': duplicate_replaced['object_key'],
-                            'new_object_key': object_name,
-                        },
+                            'md5_hash': object_etag,
+                            'codigos_empleado': ','.join(codigos) if codigos else '',
+                            'last_modified': object_last_modified,
+                            'is_indexed': indexed,
+                        }
                     )
+                    legacy_synced = True
+                except Exception as legacy_error:
+                    legacy_sync_error = str(legacy_error)
+                    logger.warning(f"Legacy mirror sync failed for {object_name}: {legacy_error}")
 
-                uploaded.append({
-                    'filename': file.name,
-                    'path': object_name,
-                    'size': file_size,
-                    'indexed': indexed,
-                    'docrepo_document_id': str(ingest_result.document.id),
+            record_audit_event(
+                action='FILE_UPLOAD_SUCCEEDED',
+                resource_type='file',
+                resource_id=object_name,
+                request=request,
+                actor=request.user,
+                document=ingest_result.document,
+                metadata={
+                    'status_code': 201,
+                    'object_key': object_name,
                     'domain': ingest_result.domain_code,
-                    'domain_preview': preview_domain,
-                    'auto_routed': auto_routed,
+                    'domain_preview': outcome.preview_domain,
+                    'auto_routed': outcome.auto_routed,
+                    'requested_folder': requested_folder,
                     'upload_mode': upload_mode,
+                    'allow_duplicate': allow_duplicate,
                     'duplicate_replaced': duplicate_replaced,
+                    'correction_reason': correction_reason,
                     'md5_hash': file_md5,
+                    'indexed': indexed,
+                    'size_bytes': file_size,
                     'legacy_sync_enabled': dual_write_legacy,
                     'legacy_synced': legacy_synced,
                     'legacy_sync_error': legacy_sync_error,
-                })
+                },
+            )
 
-            except Exception as e:
-                logger.error(f"✗ Error subiendo {file.name}: {e}")
+            if duplicate_replaced:
                 record_audit_event(
-                    action='FILE_UPLOAD_FAILED',
+                    action='FILE_UPLOAD_DUPLICATE_OVERRIDDEN',
                     resource_type='file',
-                    resource_id=file.name,
+                    resource_id=object_name,
                     request=request,
                     actor=request.user,
+                    document=outcome.duplicate.document,
                     metadata={
-                        'status_code': 500,
+                        'status_code': 201,
                         'filename': file.name,
-                        'error': str(e),
+                        'size_bytes': file_size,
+                        'md5_hash': file_md5,
+                        'replaced_document_id': duplicate_replaced['document_id'],
+                        'replaced_object_key': duplicate_replaced['object_key'],
+                        'new_object_key': object_name,
                     },
                 )
-                errors.append({'filename': file.name, 'error': str(e)})
 
-        return Response({
-            'success': len(uploaded) > 0,
-            'uploaded': uploaded,
-            'errors': errors,
-            'total_uploaded': len(uploaded),
-            'total_indexed': sum(1 for u in uploaded if u['indexed']),
-            'total_errors': len(errors)
-        }, status=201 if uploaded else 400)
+            outcome.uploaded = {
+                'filename': file.name,
+                'path': object_name,
+                'size': file_size,
+                'indexed': indexed,
+                'docrepo_document_id': str(ingest_result.document.id),
+                'domain': ingest_result.domain_code,
+                'domain_preview': outcome.preview_domain,
+                'auto_routed': outcome.auto_routed,
+                'upload_mode': upload_mode,
+                'duplicate_replaced': duplicate_replaced,
+                'md5_hash': file_md5,
+                'legacy_sync_enabled': dual_write_legacy,
+                'legacy_synced': legacy_synced,
+                'legacy_sync_error': legacy_sync_error,
+            }
+        except Exception as e:
+            self._fail(request, outcome, e)
+
+
+class FilesResumableCreateView(APIView):
+    """
+    Crea una subida reanudable (documents/resumable.py).
+    POST /api/files/resumable {filename, size, md5?}
+    """
+    permission_classes = [CanManageFiles]
+    throttle_classes = [UploadChunkRateThrottle]
+
+    def post(self, request):
+        try:
+            upload = ResumableUpload.create(
+                request.user,
+                request.data.get('filename'),
+                request.data.get('size'),
+                md5=request.data.get('md5'),
+            )
+        except ResumableUploadError as e:
+            return Response({'error': str(e), 'code': e.code}, status=e.status)
+        return Response(upload.describe(), status=201)
+
+
+class FilesResumableChunkView(APIView):
+    """
+    Estado, tramos y cancelación de una subida reanudable.
+    GET/PUT/DELETE /api/files/resumable/<upload_id>
+    """
+    permission_classes = [CanManageFiles]
+    throttle_classes = [UploadChunkRateThrottle]
+
+    def get(self, request, upload_id):
+        try:
+            upload = ResumableUpload.load(upload_id, request.user)
+        except ResumableUploadError as e:
+            return Response({'error': str(e), 'code': e.code}, status=e.status)
+        return Response(upload.describe())
+
+    def put(self, request, upload_id):
+        try:
+            upload = ResumableUpload.load(upload_id, request.user)
+            start, end, total = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'))
+            if total != upload.size:
+                raise ResumableUploadError('El total de Content-Range no coincide con el tamaño declarado.', 'INVALID_CONTENT_RANGE')
+            offset = upload.append(start, request.stream, end - start + 1)
+        except ResumableUploadError as e:
+            payload = {'error': str(e), 'code': e.code}
+            if e.offset is not None:
+                payload['offset'] = e.offset
+            return Response(payload, status=e.status)
+        return Response({'upload_id': upload.upload_id, 'offset': offset, 'complete': offset == upload.size})
+
+    def delete(self, request, upload_id):
+        try:
+            ResumableUpload.load(upload_id, request.user).discard()
+        except ResumableUploadError as e:
+            return Response({'error': str(e), 'code': e.code}, status=e.status)
+        return Response(status=204)
+
+
+class FilesResumableFinalizeView(FilesUploadView):
+    """
+    Clasifica e ingesta subidas reanudables completas.
+    POST /api/files/resumable/finalize (upload_ids[] + campos de /api/files/upload,
+    o JSON {"upload_ids": [...], "folder": ...})
+
+    Las sesiones subidas se borran; las que fallan quedan para reintentar.
+    """
+
+    def _form_fields(self, request):
+        # Sin archivos en el cuerpo, el cliente puede enviar JSON en vez de un formulario
+        return request.data
+
+    def _collect_files(self, request):
+        files = []
+        if hasattr(request.data, 'getlist'):
+            upload_ids = request.data.getlist('upload_ids[]')
+        else:
+            upload_ids = request.data.get('upload_ids') or []
+            if not isinstance(upload_ids, list):
+                return None, None, Response({'error': 'upload_ids debe ser una lista.'}, status=400)
+        for upload_id in upload_ids:
+            upload_id = str(upload_id)
+            try:
+                upload = ResumableUpload.load(upload_id, request.user)
+            except ResumableUploadError as e:
+                for file in files:
+                    file.close()
+                return None, None, Response({'error': str(e), 'code': e.code, 'upload_id': upload_id}, status=e.status)
+            if not upload.complete:
+                for file in files:
+                    file.close()
+                return None, None, Response({
+                    'error': 'La subida aún no está completa.',
+                    'code': 'UPLOAD_INCOMPLETE',
+                    'upload_id': upload_id,
+                    'offset': upload.offset,
+                    'size': upload.size,
+                }, status=409)
+            files.append(upload.as_uploaded_file())
+        return files, None, None
 
 
 class CreateFolderView(APIView):
@@ -2298,6 +2597,7 @@ class FilesDeleteView(APIView):
         try:
             # Eliminar de MinIO
             minio_client.remove_object(settings.MINIO_BUCKET, file_path)
+            emit_invalidation_event(STORAGE_CHANGED)
             logger.info(f"✓ Archivo eliminado de MinIO: {file_path}")
 
             # Eliminar índice de PostgreSQL
@@ -2402,6 +2702,7 @@ class FoldersListView(APIView):
     """
     permission_classes = [CanManageFiles]
 
+    @conditional_on_index()
     def get(self, request):
         import re
         import time
@@ -2704,6 +3005,12 @@ class MergePdfsView(APIView):
     Combina múltiples PDFs en un único archivo o genera ZIP plano para descargar.
     POST /api/merge-pdfs
 
+    El ZIP se envía en streaming (entradas STORED, prefetch de los siguientes
+    objetos); los archivos que fallen a mitad del envío se listan en ERRORES.txt.
+    El PDF combinado se arma con entradas y salida en disco (ver pdfmerge).
+    Resultados completos se cachean por lista ordenada de (path, etag) y
+    formato (ver mergecache); X-Merge-Cache indica HIT o MISS.
+
     JSON body: {
         "paths": ["Planillas 2025/archivo1.pdf", "Planillas 2025/archivo2.pdf"],
         "output_name": "documentos_combinados" (opcional),
@@ -2713,145 +3020,107 @@ class MergePdfsView(APIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [MergeRateThrottle]
 
-    def post(self, request):
-        from io import BytesIO
-        from minio.error import S3Error
-        import os
-        import fitz  # PyMuPDF
-        import zipfile
-        import logging
-        logger = logging.getLogger(__name__)
-
-        data = request.data
+    @staticmethod
+    def parse_request(data):
+        """Valida el body. Devuelve (paths, output_format, safe_name, error); compartido con la vista async."""
         paths = data.get('paths', [])
         output_name = data.get('output_name', 'documentos_combinados').strip()
         output_format = str(data.get('output_format', 'pdf')).strip().lower()
 
         if not paths or len(paths) < 1:
-            return Response({'error': 'Debe proporcionar al menos un archivo PDF.'}, status=400)
+            return None, None, None, ({'error': 'Debe proporcionar al menos un archivo PDF.'}, 400)
 
         if len(paths) > 80:
-            return Response({'error': 'Máximo 80 archivos por descarga.'}, status=400)
+            return None, None, None, ({'error': 'Máximo 80 archivos por descarga.'}, 400)
 
         if output_format not in {'pdf', 'zip'}:
-            return Response({'error': "output_format debe ser 'pdf' o 'zip'."}, status=400)
+            return None, None, None, ({'error': "output_format debe ser 'pdf' o 'zip'."}, 400)
 
-        def download_one(path):
-            response = None
-            try:
-                response = minio_client.get_object(settings.MINIO_BUCKET, path)
-                return path, response.read(), None
-            except Exception as exc:
-                return path, None, exc
-            finally:
-                if response is not None:
-                    try:
-                        response.close()
-                        response.release_conn()
-                    except Exception:
-                        pass
+        safe_name = re.sub(r'[^\w\s\-]', '', output_name)[:50]
+        if not safe_name:
+            safe_name = 'documentos_combinados'
+        return paths, output_format, safe_name, None
+
+    def post(self, request):
+        import os
+        import logging
+        logger = logging.getLogger(__name__)
+
+        paths, output_format, safe_name, error = self.parse_request(request.data)
+        if error is not None:
+            return Response(error[0], status=error[1])
 
         try:
-            safe_name = re.sub(r'[^\w\s\-]', '', output_name)[:50]
-            if not safe_name:
-                safe_name = 'documentos_combinados'
+            # Misma lista ordenada de (path, etag) y formato => mismo resultado
+            cache_key = None
+            object_etags = object_versions(paths) if merge_cache_enabled() else None
+            if object_etags is not None:
+                cache_key = merge_cache_key(paths, object_etags, output_format)
+                cached = open_cached_merge(cache_key, output_format)
+                if cached is not None:
+                    logger.info(f"✓ Merge servido desde caché: {len(paths)} archivos ({output_format})")
+                    download_log = self.merge_download_log(request, output_format, safe_name, len(paths))
+                    return download_log.attach(self.cached_response(cached, output_format, safe_name, len(paths)))
 
             if output_format == 'zip':
-                output = BytesIO()
-                files_zipped = []
                 errors = []
-                used_names = set()
-                basename_counts = {}
-                basename_seen = {}
-                for path in paths:
-                    base_name = os.path.basename(str(path).strip('/')) or 'documento.pdf'
-                    basename_counts[base_name] = basename_counts.get(base_name, 0) + 1
-
-                with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
-                    for path in paths:
-                        try:
-                            response = minio_client.get_object(settings.MINIO_BUCKET, path)
-                            pdf_bytes = response.read()
-                            response.close()
-                            response.release_conn()
-
-                            base_name = os.path.basename(path.strip('/')) or 'documento.pdf'
-                            if basename_counts.get(base_name, 0) > 1:
-                                basename_seen[base_name] = basename_seen.get(base_name, 0) + 1
-                                arcname = f"{basename_seen[base_name]:03d}_{base_name}"
-                            else:
-                                arcname = base_name
-                            while arcname in used_names:
-                                basename_seen[base_name] = basename_seen.get(base_name, 0) + 1
-                                arcname = f"{basename_seen[base_name]:03d}_{base_name}"
-                            used_names.add(arcname)
-                            archive.writestr(arcname, pdf_bytes)
-                            files_zipped.append(path)
-                        except S3Error as e:
-                            logger.error(f"✗ Error descargando {path}: {e}")
-                            errors.append({'path': path, 'error': str(e)})
-                        except Exception as e:
-                            logger.error(f"✗ Error procesando {path}: {e}")
-                            errors.append({'path': path, 'error': str(e)})
-
-                if not files_zipped:
+                archive_names = build_archive_names(
+                    os.path.basename(str(path).strip('/')) or 'documento.pdf' for path in paths
+                )
+                results = prefetch_objects(
+                    (((path, name), path) for path, name in zip(paths, archive_names)),
+                    fetch=lambda object_key: fetch_minio_object(object_key, etag=(object_etags or {}).get(object_key)),
+                )
+
+                def next_member():
+                    for (path, archive_name), content, error in results:
+                        if error is None:
+                            return archive_name, content
+                        logger.error(f"✗ Error descargando {path}: {error}")
+                        errors.append({'path': path, 'error': str(error)})
+                    return None
+
+                # Se espera el primer archivo válido antes de responder, para poder devolver 400
+                first_member = next_member()
+                if first_member is None:
                     return Response({
                         'error': 'No se pudo procesar ningún archivo.',
                         'errors': errors
                     }, status=400)
 
-                try:
-                    DownloadLog.objects.create(
-                        user=request.user,
-                        filename=f"ZIP:{len(files_zipped)}_archivos_{safe_name}.zip",
-                        ip_address=request.META.get('REMOTE_ADDR', '')
-                    )
-                except Exception as log_error:
-                    logger.warning(f"No se pudo registrar descarga ZIP: {log_error}")
+                pre_stream_errors = len(errors)
+                files_zipped = 0
 
-                output.seek(0)
-                from django.http import HttpResponse
-                response = HttpResponse(output.read(), content_type='application/zip')
-                response['Content-Disposition'] = f'attachment; filename="{safe_name}.zip"'
-                response['X-Files-Zipped'] = str(len(files_zipped))
-                response['X-Zip-Errors'] = str(len(errors))
-                return response
-
-            downloaded_pdfs = {}
-            errors = []
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                future_to_path = {executor.submit(download_one, path): path for path in paths}
-                for future in concurrent.futures.as_completed(future_to_path):
-                    path, pdf_bytes, error = future.result()
-                    if error is not None:
-                        logger.error(f"✗ Error descargando {path}: {error}")
-                        errors.append({'path': path, 'error': str(error)})
-                        continue
+                def members():
+                    nonlocal files_zipped
+                    member = first_member
+                    while member is not None:
+                        yield member
+                        files_zipped += 1
+                        member = next_member()
 
-                    downloaded_pdfs[path] = pdf_bytes
-                    logger.info(f"✓ Descargado: {path}")
+                    if errors:
+                        yield ZIP_ERRORS_NAME, errors_manifest(errors)
 
-            # Crear documento PDF combinado preservando el orden original
-            merged_pdf = fitz.open()
-            files_merged = []
-            
-            for path in paths:
-                if path not in downloaded_pdfs:
-                    continue
+                # Se registra al cerrar la respuesta, también si el cliente corta la descarga
+                download_log = DownloadLogBatch(request)
+                download_log.add(lambda: f"ZIP:{files_zipped}_archivos_{safe_name}.zip")
 
-                try:
-                    # Abrir y añadir al documento combinado
-                    src_pdf = fitz.open(stream=downloaded_pdfs[path], filetype="pdf")
-                    merged_pdf.insert_pdf(src_pdf)
-                    src_pdf.close()
-                    
-                    files_merged.append(path)
-                    logger.info(f"✓ Añadido al merge: {path}")
-                    
-                except Exception as e:
-                    logger.error(f"✗ Error procesando {path}: {e}")
-                    errors.append({'path': path, 'error': str(e)})
+                body = stream_zip(members())
+                if cache_key:
+                    body = tee_to_merge_cache(cache_key, 'zip', body, is_complete=lambda: not errors)
+
+                response = StreamingHttpResponse(body, content_type='application/zip')
+                response['Content-Disposition'] = f'attachment; filename="{safe_name}.zip"'
+                # Conteos conocidos al iniciar el stream; fallos posteriores se listan en ERRORES.txt
+                response['X-Files-Zipped'] = str(len(paths) - pre_stream_errors)
+                response['X-Zip-Errors'] = str(pre_stream_errors)
+                if cache_key:
+                    response['X-Merge-Cache'] = 'MISS'
+                return download_log.attach(response)
+
+            # Entradas y salida se manejan en disco: memoria acotada por fusión
+            output, files_merged, errors = merge_pdfs_to_file(paths, etags=object_etags)
             
             if not files_merged:
                 return Response({
@@ -2859,35 +3128,52 @@ class MergePdfsView(APIView):
                     'errors': errors
                 }, status=400)
             
-            # Exportar PDF combinado a bytes
-            output = BytesIO()
-            merged_pdf.save(output)
-            merged_pdf.close()
-            output.seek(0)
-            
-            # Registrar descarga
-            try:
-                DownloadLog.objects.create(
-                    user=request.user,
-                    filename=f"MERGED:{len(files_merged)}_archivos_{safe_name}.pdf",
-                    ip_address=request.META.get('REMOTE_ADDR', '')
-                )
-            except Exception as log_error:
-                logger.warning(f"No se pudo registrar descarga: {log_error}")
-            
+            # Registrar descarga (al terminar la transferencia)
+            download_log = self.merge_download_log(request, 'pdf', safe_name, len(files_merged))
+
             logger.info(f"✓ PDF combinado: {len(files_merged)} archivos, {len(errors)} errores")
+
+            if cache_key and not errors:
+                store_merge_result(cache_key, 'pdf', output)
             
-            from django.http import HttpResponse
-            response = HttpResponse(
-                output.read(),
-                content_type='application/pdf'
+            response = FileResponse(
+                output,
+                content_type='application/pdf',
+                as_attachment=True,
+                filename=f"{safe_name}.pdf",
             )
-            response['Content-Disposition'] = f'attachment; filename="{safe_name}.pdf"'
             response['X-Files-Merged'] = str(len(files_merged))
             response['X-Merge-Errors'] = str(len(errors))
+            if cache_key:
+                response['X-Merge-Cache'] = 'MISS'
             
-            return response
+            return download_log.attach(response)
             
         except Exception as e:
             logger.error(f"✗ Error fusionando PDFs: {e}")
             return Response({'error': f'Error al fusionar PDFs: {str(e)}'}, status=500)
+
+    @staticmethod
+    def merge_download_log(request, output_format, safe_name, files_count):
+        """Lote de DownloadLog de un merge/ZIP; se escribe con `attach` al cerrar la respuesta."""
+        prefix = 'ZIP' if output_format == 'zip' else 'MERGED'
+        download_log = DownloadLogBatch(request)
+        download_log.add(f"{prefix}:{files_count}_archivos_{safe_name}.{output_format}")
+        return download_log
+
+    @staticmethod
+    def cached_response(cached, output_format, safe_name, files_count):
+        response = FileResponse(
+            cached,
+            content_type='application/zip' if output_format == 'zip' else 'application/pdf',
+            as_attachment=True,
+            filename=f"{safe_name}.{output_format}",
+        )
+        if output_format == 'zip':
+            response['X-Files-Zipped'] = str(files_count)
+            response['X-Zip-Errors'] = '0'
+        else:
+            response['X-Files-Merged'] = str(files_count)
+            response['X-Merge-Errors'] = '0'
+        response['X-Merge-Cache'] = 'HIT'
+        return response
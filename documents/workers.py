@@ -0,0 +1,95 @@
+"""
+Pools de trabajo compartidos por proceso web.
+
+- Pool de procesos para el trabajo de CPU con PyMuPDF (miniaturas, extracción
+  de texto de subidas grandes). PyMuPDF no admite varios hilos a la vez, así
+  que con PDF_WORKER_PROCESSES=0 las llamadas se ejecutan en el propio proceso
+  de a una.
+- upload_workers(): tamaño del pool de hilos que procesa en paralelo los
+  archivos de una misma subida.
+"""
+
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+_inline_lock = threading.Lock()
+
+
+def pdf_worker_processes():
+    return max(0, int(getattr(settings, 'PDF_WORKER_PROCESSES', 2)))
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if pdf_worker_processes() <= 0:
+        return None
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=pdf_worker_processes())
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool, terminate=False):
+    """
+    Saca `pool` de servicio (la próxima llamada crea uno nuevo). Con
+    `terminate=True` mata sus procesos: una tarea vencida no se puede cancelar
+    una vez en marcha y seguiría ocupando el worker. Las demás tareas de ese
+    pool fallan con BrokenProcessPool y se reintentan en el nuevo.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    if terminate:
+        # ProcessPoolExecutor no expone cómo matar un worker ocupado
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pdf_task(function, *args, timeout=None, inline=False):
+    """
+    Ejecuta `function(*args)` en el pool de procesos y espera el resultado.
+    `function` y sus argumentos deben poder serializarse; con `inline=True`
+    (o sin pool) corre aquí, serializada con las demás llamadas en línea.
+
+    Si el pool se rompe (un worker murió) se reemplaza y la tarea se reintenta
+    una vez; si vence `timeout` se recicla el pool y se propaga TimeoutError.
+    """
+    pool = None if inline else _get_pdf_pool()
+    if pool is None:
+        with _inline_lock:
+            return function(*args)
+
+    for attempt in range(2):
+        try:
+            future = pool.submit(function, *args)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                if not future.cancel():
+                    logger.warning(f"Tarea PDF excedió {timeout}s; reciclando el pool de procesos")
+                    _discard_pdf_pool(pool, terminate=True)
+                raise
+        except BrokenProcessPool:
+            _discard_pdf_pool(pool)
+            if attempt:
+                raise
+            logger.warning("Pool de procesos PDF roto; se reintenta en uno nuevo")
+            pool = _get_pdf_pool()
+            if pool is None:
+                with _inline_lock:
+                    return function(*args)
+
+
+def upload_workers():
+    return max(1, int(getattr(settings, 'UPLOAD_WORKERS', 4)))
@@ -16,6 +16,7 @@ Beneficios:
 from pathlib import Path
 import os
 import json
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -107,7 +108,8 @@ LOGGING = {
 # =============================================================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication que aplica los permisos embebidos en el token (documents/tokens.py)
+        'documents.tokens.PermissionClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -124,7 +126,9 @@ REST_FRAMEWORK = {
         'login': '5/minute',      # Intentos de login: 5/min (CRÍTICO)
         'search': '60/minute',    # Búsquedas: 60/min
         'bulk_search': '10/minute',  # Búsquedas masivas: 10/min (más pesado)
-        'merge': '2/minute',      # Merge PDFs: 2/min (operación pesada)
+        'merge': os.environ.get('MERGE_THROTTLE_RATE', '6/minute'),  # Merge PDFs: memoria acotada (spool a disco)
+        'preview': os.environ.get('PREVIEW_THROTTLE_RATE', '600/minute'),  # Miniaturas de resultados
+        'upload_chunk': os.environ.get('UPLOAD_CHUNK_THROTTLE_RATE', '600/minute'),  # Tramos de subidas reanudables
     }
 }
 
@@ -139,6 +143,9 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # El access token lleva el claim 'perms' (dominios permitidos y gestión de archivos)
+    'TOKEN_OBTAIN_SERIALIZER': 'documents.tokens.PermissionTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'documents.tokens.PermissionTokenRefreshSerializer',
 }
 
 
@@ -152,6 +159,18 @@ MINIO_BUCKET = os.environ.get('MINIO_BUCKET', 'planillas-pdfs')
 MINIO_USE_SSL = os.environ.get('MINIO_USE_SSL', 'False').lower() == 'true'
 MINIO_REGION = os.environ.get('MINIO_REGION', None)
 
+# Descargas: 'proxy' (Django transmite), 'presigned' (302 a URL firmada) o 'accel' (X-Accel-Redirect de nginx)
+DOWNLOAD_DELIVERY_MODE = os.environ.get('DOWNLOAD_DELIVERY_MODE', 'proxy').lower()
+DOWNLOAD_PRESIGNED_TTL_SECONDS = int(os.environ.get('DOWNLOAD_PRESIGNED_TTL_SECONDS', '300'))
+# Host:puerto de MinIO visto por el navegador (modo 'presigned'); vacío = MINIO_ENDPOINT
+MINIO_PUBLIC_ENDPOINT = os.environ.get('MINIO_PUBLIC_ENDPOINT', '')
+MINIO_PUBLIC_USE_SSL = os.environ.get('MINIO_PUBLIC_USE_SSL', 'True').lower() == 'true'
+# Location interna de nginx que hace proxy a MinIO (modo 'accel')
+DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/_minio_internal')
+# Vistas async de descarga/ZIP/merge (requiere servidor ASGI y aiobotocore)
+ASYNC_STORAGE_VIEWS = os.environ.get('ASYNC_STORAGE_VIEWS', 'False').lower() == 'true'
+ASYNC_S3_MAX_CONNECTIONS = int(os.environ.get('ASYNC_S3_MAX_CONNECTIONS', '100'))
+
 
 # =============================================================================
 # DOCREPO V2 FEATURES
@@ -160,6 +179,42 @@ DOCREPO_DUAL_READ_ENABLED = os.environ.get('DOCREPO_DUAL_READ_ENABLED', 'False')
 DOCREPO_DUAL_WRITE_LEGACY_ENABLED = os.environ.get('DOCREPO_DUAL_WRITE_LEGACY_ENABLED', 'True').lower() == 'true'
 DOCREPO_AUTO_ROUTE_UPLOAD_ENABLED = os.environ.get('DOCREPO_AUTO_ROUTE_UPLOAD_ENABLED', 'True').lower() == 'true'
 DOCREPO_MAX_RESULTS = int(os.environ.get('DOCREPO_MAX_RESULTS', '500'))
+DOCREPO_FOLDER_OPTIONS_CACHE_TIMEOUT = int(os.environ.get('DOCREPO_FOLDER_OPTIONS_CACHE_TIMEOUT', '900'))
+ZIP_PREFETCH_WINDOW = int(os.environ.get('ZIP_PREFETCH_WINDOW', '4'))
+MERGE_SPOOL_DIR = os.environ.get('MERGE_SPOOL_DIR') or None
+# Tamaño de parte para subidas multiparte a MinIO (mínimo 5 MiB)
+UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', str(16 * 1024 * 1024)))
+# Archivos de una misma subida procesados en paralelo (hash, extracción, put a MinIO)
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '4'))
+# Procesos para trabajo de CPU con PyMuPDF (miniaturas, texto de subidas grandes); 0 = en el proceso web
+PDF_WORKER_PROCESSES = int(os.environ.get('PDF_WORKER_PROCESSES', '2'))
+# Traspaso classify-preview -> upload por token (documents/uploadstage.py); 0 = desactivado
+UPLOAD_STAGING_TTL_SECONDS = int(os.environ.get('UPLOAD_STAGING_TTL_SECONDS', '900'))
+UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_upload_staging')
+# Subidas reanudables por tramos (documents/resumable.py)
+UPLOAD_RESUMABLE_DIR = os.environ.get('UPLOAD_RESUMABLE_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_upload_resumable')
+UPLOAD_RESUMABLE_CHUNK_SIZE = int(os.environ.get('UPLOAD_RESUMABLE_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_RESUMABLE_MAX_BYTES = int(os.environ.get('UPLOAD_RESUMABLE_MAX_BYTES', str(1024 * 1024 * 1024)))
+UPLOAD_RESUMABLE_TTL_SECONDS = int(os.environ.get('UPLOAD_RESUMABLE_TTL_SECONDS', str(24 * 3600)))
+# Caché local LRU de objetos de MinIO (documents/objectcache.py); 0 = desactivado
+OBJECT_CACHE_MAX_BYTES = int(os.environ.get('OBJECT_CACHE_MAX_BYTES', '0'))
+OBJECT_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('OBJECT_CACHE_MAX_ENTRY_BYTES', '0'))
+OBJECT_CACHE_DIR = os.environ.get('OBJECT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_object_cache')
+# Sin ETag del llamador se reutiliza el último visto para la clave durante estos segundos
+OBJECT_CACHE_ETAG_TTL_SECONDS = int(os.environ.get('OBJECT_CACHE_ETAG_TTL_SECONDS', '30'))
+# Caché de resultados de merge/ZIP (documents/mergecache.py); 0 = desactivado
+MERGE_CACHE_MAX_BYTES = int(os.environ.get('MERGE_CACHE_MAX_BYTES', '0'))
+MERGE_CACHE_TTL_SECONDS = int(os.environ.get('MERGE_CACHE_TTL_SECONDS', '600'))
+MERGE_CACHE_DIR = os.environ.get('MERGE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_merge_cache')
+# Miniaturas de vista previa (documents/previews.py); 0 = sin caché en disco
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+PREVIEW_CACHE_DIR = os.environ.get('PREVIEW_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_preview_cache')
+PREVIEW_RENDER_TIMEOUT_SECONDS = int(os.environ.get('PREVIEW_RENDER_TIMEOUT_SECONDS', '30'))
+DOCREPO_CACHE_REGION_TIMEOUTS = {
+    'folder_options': DOCREPO_FOLDER_OPTIONS_CACHE_TIMEOUT,
+    'filter_options': int(os.environ.get('DOCREPO_FILTER_OPTIONS_CACHE_TIMEOUT', '3600')),
+    'minio_listing': int(os.environ.get('DOCREPO_MINIO_LISTING_CACHE_TIMEOUT', '60')),
+}
 
 
 # =============================================================================
@@ -227,6 +282,57 @@ DATABASES = {
 }
 
 
+# =============================================================================
+# CACHE
+# Compartido entre workers de gunicorn: archivo por defecto, o cualquier
+# backend de Django vía entorno (p. ej. django.core.cache.backends.redis.RedisCache).
+# =============================================================================
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'pdf_search_cache')),
+        'TIMEOUT': int(os.environ.get('DJANGO_CACHE_TIMEOUT', '900')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', '5000'))},
+    },
+    # Contadores de invalidación de docrepo (docrepo/cache.py): deben ser los mismos en
+    # todos los workers y no compiten por espacio con las entradas del cache general
+    'docrepo_state': {
+        'BACKEND': os.environ.get('DOCREPO_STATE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DOCREPO_STATE_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'pdf_search_state')),
+        'TIMEOUT': None,
+    },
+    # Contadores de IPRateLimitMiddleware: una clave por IP y ventana, aparte para no
+    # desalojar entradas del cache general. Solo se comparten entre workers con
+    # Redis/Memcached (incr atómico); con otro backend el límite es por proceso
+    'ratelimit': {
+        'BACKEND': os.environ.get('RATE_LIMIT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RATE_LIMIT_CACHE_LOCATION', 'pdf_search_ratelimit'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RATE_LIMIT_CACHE_MAX_ENTRIES', '20000'))},
+    },
+}
+DOCREPO_STATE_CACHE_ALIAS = 'docrepo_state'
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit'
+
+# Límite por IP de IPRateLimitMiddleware (documents/ratelimit.py): 'cache' lo comparte
+# entre workers usando CACHES['ratelimit'] si es Redis/Memcached (si no, cae a 'local'); 'local' es por proceso
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'cache')
+RATE_LIMIT_LOCAL_MAX_ENTRIES = int(os.environ.get('RATE_LIMIT_LOCAL_MAX_ENTRIES', '10000'))
+# RequestSanitizationMiddleware: tope de cuerpos JSON/texto inspeccionados (multipart y binarios no se leen)
+SANITIZATION_MAX_BODY_BYTES = int(os.environ.get('SANITIZATION_MAX_BODY_BYTES', str(64 * 1024)))
+# Auditoría (auditlog/writer.py): fuera de transacciones los eventos se encolan y un hilo
+# los escribe con bulk_create cada AUDIT_BATCH_SIZE eventos o AUDIT_FLUSH_INTERVAL_SECONDS
+AUDIT_ASYNC_ENABLED = os.environ.get('AUDIT_ASYNC_ENABLED', 'True').lower() == 'true'
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', '1.0'))
+AUDIT_QUEUE_MAX_EVENTS = int(os.environ.get('AUDIT_QUEUE_MAX_EVENTS', '10000'))
+# Retención de audit_event (archive_audit_events): meses completos que quedan en la tabla;
+# los anteriores se exportan a MinIO (jsonl.gz) y se borran (en Postgres, su partición)
+AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', '12'))
+AUDIT_ARCHIVE_BUCKET = os.environ.get('AUDIT_ARCHIVE_BUCKET', 'audit-archive')
+AUDIT_ARCHIVE_PREFIX = os.environ.get('AUDIT_ARCHIVE_PREFIX', 'audit_event/')
+
+
 # =============================================================================
 # PASSWORD VALIDATION
 # 🎓 LECCIÓN: Estas reglas aseguran contraseñas fuertes
@@ -119,3 +119,13 @@ SECURE_SSL_REDIRECT = True
 # WHITENOISE (producción)
 # =============================================================================
 WHITENOISE_AUTOREFRESH = False  # No buscar archivos nuevos constantemente
+
+
+# =============================================================================
+# CACHÉS LOCALES DE OBJETOS Y MERGES (producción)
+# Las planillas del mes se descargan, fusionan y reindexan muchas veces al día;
+# en producción se mantiene una copia local LRU de 2 GiB por defecto y hasta
+# 1 GiB de resultados de merge/ZIP repetidos.
+# =============================================================================
+OBJECT_CACHE_MAX_BYTES = int(os.environ.get('OBJECT_CACHE_MAX_BYTES', str(2 * 1024**3)))
+MERGE_CACHE_MAX_BYTES = int(os.environ.get('MERGE_CACHE_MAX_BYTES', str(1024**3)))
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pdf_search_project.settings')
 
 application = get_wsgi_application()
+
+# Bajo WSGI cada vista async ocupa un worker sync durante toda la descarga;
+# runserver (DEBUG) se permite para desarrollo.
+if settings.ASYNC_STORAGE_VIEWS and not settings.DEBUG:
+    raise ImproperlyConfigured(
+        'ASYNC_STORAGE_VIEWS=True requiere servir la app por ASGI '
+        '(pdf_search_project.asgi:application con workers de uvicorn).'
+    )